@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.auth import get_current_user_claims
+from app.db.database import model_rollup_collection
+from app.core.dates import as_datetime
+from app.db.rollups import GRANULARITIES, rollup_pipeline, to_period_doc
+from app.schemas.analytics import ModelRollupPeriod
+
+router = APIRouter()
+
+# Widest range one request may aggregate, in hourly buckets
+MAX_RANGE = timedelta(days=366)
+
+
+@router.get("/models", response_model=List[ModelRollupPeriod])
+async def get_model_rollups(
+        model: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        granularity: str = Query("day", pattern=f"^({'|'.join(GRANULARITIES)})$"),
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """Query counts, latency and ratings per model, read from the hourly rollups.
+
+    Defaults to the last 7 days. Periods are in UTC and keyed by the time
+    the rated queries were created.
+    """
+    until = as_datetime(until) or datetime.utcnow()
+    since = as_datetime(since) or until - timedelta(days=7)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if until - since > MAX_RANGE:
+        raise HTTPException(status_code=400, detail="Range is limited to 366 days")
+
+    pipeline = rollup_pipeline(model, since, until, granularity)
+    return [to_period_doc(group) async for group in model_rollup_collection.aggregate(pipeline)]
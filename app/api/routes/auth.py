@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import secrets
 import string
 from typing import Dict
@@ -12,42 +16,47 @@ from app.core.auth import (
     verify_password,
     get_password_hash,
     create_access_token,
+    build_token_claims,
+    remember_token_version,
     get_current_user,
+    get_current_user_claims,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
 router = APIRouter()
 
 
+def duplicate_user_detail(error: DuplicateKeyError) -> str:
+    """Map a duplicate-key error on the user collection to the API message"""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    if "email" in key_pattern or "email_1" in str(error):
+        return "Email already registered"
+    return "Username already registered"
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user: UserCreate):
     """Register a new user"""
-    # Check if username already exists
-    existing_user = await user_collection.find_one({"username": user.username})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
+    # Hash the password off the event loop; bcrypt is deliberately slow
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
 
-    # Check if email already exists
-    existing_user = await user_collection.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+    # Generate the id client-side so the response and the default history
+    # can be built without reading the user back
+    user_oid = ObjectId()
+    user_id = str(user_oid)
 
-    # Hash the password
-    hashed_password = get_password_hash(user.password)
+    # BSON dates have millisecond precision, match what a read-back would return
+    created_at = datetime.utcnow()
+    created_at = created_at.replace(microsecond=created_at.microsecond // 1000 * 1000)
 
     # Create user in DB
     new_user = {
+        "_id": user_oid,
         "username": user.username,
         "email": user.email,
         "name": user.name,
         "hashed_password": hashed_password,
-        "created_at": datetime.utcnow()
+        "created_at": created_at
     }
 
     # Add optional fields if they exist
@@ -56,12 +65,7 @@ async def register_user(user: UserCreate):
     if user.gender is not None:
         new_user["gender"] = user.gender
 
-    result = await user_collection.insert_one(new_user)
-
-    created_user = await user_collection.find_one({"_id": result.inserted_id})
-
     # Create a default history for the user
-    user_id = str(created_user["_id"])
     default_history_id = f"hist_{user_id}_default"
 
     default_history = {
@@ -71,17 +75,38 @@ async def register_user(user: UserCreate):
         "history_id": default_history_id
     }
 
-    # Insert the default history into the history collection
-    await history_collection.insert_one(default_history)
+    # Both inserts go out together; the unique indexes on username and email
+    # reject duplicates atomically, so no pre-check round trips are needed
+    user_result, history_result = await asyncio.gather(
+        user_collection.insert_one(new_user),
+        history_collection.insert_one(default_history),
+        return_exceptions=True
+    )
+
+    if isinstance(user_result, Exception):
+        # Roll back the default history of the user that was not created
+        if not isinstance(history_result, Exception):
+            await history_collection.delete_one({"history_id": default_history_id})
+
+        if isinstance(user_result, DuplicateKeyError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=duplicate_user_detail(user_result)
+            )
+        raise user_result
+
+    if isinstance(history_result, Exception):
+        await user_collection.delete_one({"_id": user_oid})
+        raise history_result
 
     return {
         "id": user_id,
-        "username": created_user["username"],
-        "email": created_user["email"],
-        "name": created_user["name"],
-        "age": created_user.get("age"),
-        "gender": created_user.get("gender"),
-        "created_at": created_user["created_at"]
+        "username": new_user["username"],
+        "email": new_user["email"],
+        "name": new_user["name"],
+        "age": new_user.get("age"),
+        "gender": new_user.get("gender"),
+        "created_at": new_user["created_at"]
     }
 
 
@@ -99,9 +124,9 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create access token with user ID as subject
+    # Create access token with user ID as subject and the claims read-only routes need
     access_token, expires_at = create_access_token(
-        data={"sub": str(user["_id"])},
+        data=build_token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -116,7 +141,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 async def refresh_access_token(current_user: dict = Depends(get_current_user)):
     """Refresh access token"""
     access_token, expires_at = create_access_token(
-        data={"sub": current_user["id"]},
+        data=build_token_claims(current_user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -143,19 +168,34 @@ async def change_password(
     # Hash new password
     hashed_password = get_password_hash(password_data.new_password)
 
-    # Update password in database
-    result = await user_collection.update_one(
+    # Update password in database and revoke every token issued before the change
+    updated_user = await user_collection.find_one_and_update(
         {"_id": ObjectId(current_user["id"])},
-        {"$set": {"hashed_password": hashed_password}}
+        {"$set": {"hashed_password": hashed_password}, "$inc": {"token_version": 1}},
+        projection={"username": 1, "token_version": 1},
+        return_document=ReturnDocument.AFTER
     )
 
-    if result.modified_count == 0:
+    if updated_user is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update password"
         )
 
-    return {"message": "Password updated successfully"}
+    remember_token_version(current_user["id"], updated_user["token_version"])
+
+    # The caller's token is now revoked, so hand back a fresh one
+    access_token, expires_at = create_access_token(
+        data=build_token_claims(updated_user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+    return {
+        "message": "Password updated successfully",
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_at": expires_at
+    }
 
 
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
@@ -188,13 +228,13 @@ async def reset_password(reset_data: PasswordReset):
 
 
 @router.get("/verify-token", response_model=Dict[str, bool])
-async def verify_token(current_user: dict = Depends(get_current_user)):
+async def verify_token(current_user: dict = Depends(get_current_user_claims)):
     """Verify if a token is valid"""
     return {"valid": True}
 
 
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user)):
+async def logout(current_user: dict = Depends(get_current_user_claims)):
     """Logout endpoint - this is stateless since we're using JWT,
     but we can use this endpoint for client-side logout actions"""
     return {"message": "Successfully logged out"}
\ No newline at end of file
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.core.auth import claims_from_token
+from app.core.config import settings
+from app.core.pubsub import Subscriber, forum_topic, pubsub, queries_topic, question_topic
+from app.core.streaming import json_default
+
+router = APIRouter()
+
+
+def resolve_topic(topic: str, current_user: dict) -> Optional[str]:
+    """Map a client topic name to a broker topic the user may read.
+
+    "forum" and "question:<question_id>" are public; "queries" is always
+    the caller's own query jobs.
+    """
+    if topic == "forum":
+        return forum_topic()
+    if topic == "queries":
+        return queries_topic(current_user["id"])
+    if topic.startswith("question:") and len(topic) > len("question:"):
+        return question_topic(topic[len("question:"):])
+    return None
+
+
+def subscribe_all(subscriber: Subscriber, topics: List[str], current_user: dict):
+    for topic in topics:
+        resolved = resolve_topic(topic, current_user)
+        if resolved is None:
+            raise HTTPException(status_code=400, detail=f"Unknown topic: {topic}")
+        if not subscriber.subscribe(resolved):
+            raise HTTPException(status_code=400, detail="Too many topics for one connection")
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[len("bearer "):]
+    return None
+
+
+def to_message(event: dict) -> str:
+    return json.dumps(event, default=json_default)
+
+
+@router.get("/events")
+async def stream_events(
+        request: Request,
+        topic: List[str] = Query(...),
+        token: Optional[str] = None
+):
+    """Server-sent events for the given topics.
+
+    EventSource can't send headers, so the access token may also be passed
+    as ?token=. Each event's name is its type and its data the JSON delta;
+    on "resync" the client should re-fetch the listings it shows.
+    """
+    token = bearer_token(request.headers.get("authorization")) or token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    current_user = await claims_from_token(token)
+
+    # Validate before the response starts so errors get a proper status code
+    subscriber = pubsub.subscriber()
+    try:
+        subscribe_all(subscriber, topic, current_user)
+    finally:
+        subscriber.close()
+
+    async def event_stream():
+        subscriber = pubsub.subscriber()
+        try:
+            subscribe_all(subscriber, topic, current_user)
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscriber.get(settings.event_keepalive_seconds)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {to_message(event)}\n\n"
+        finally:
+            subscriber.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket, token: str, topic: List[str] = Query([])):
+    """WebSocket push channel.
+
+    Authenticate with ?token=. Topics can be given as ?topic= and changed
+    later by sending {"action": "subscribe" | "unsubscribe", "topic": ...}.
+    """
+    try:
+        current_user = await claims_from_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscriber = pubsub.subscriber()
+    try:
+        subscribe_all(subscriber, topic, current_user)
+    except HTTPException as e:
+        subscriber.close()
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+
+    async def receive_commands():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            action = message.get("action") if isinstance(message, dict) else None
+            resolved = resolve_topic(str(message.get("topic", "")), current_user) if action else None
+            if action not in ("subscribe", "unsubscribe") or resolved is None:
+                subscriber.notify({"type": "error", "detail": "Invalid command"})
+            elif action == "unsubscribe":
+                subscriber.unsubscribe(resolved)
+                subscriber.notify({"type": "unsubscribed", "topic": message["topic"]})
+            elif subscriber.subscribe(resolved):
+                subscriber.notify({"type": "subscribed", "topic": message["topic"]})
+            else:
+                subscriber.notify({"type": "error", "detail": "Too many topics for one connection"})
+
+    async def send_events():
+        # The only task that writes to the socket
+        while True:
+            event = await subscriber.get(settings.event_keepalive_seconds)
+            await websocket.send_text(to_message(event or {"type": "ping"}))
+
+    tasks = [asyncio.create_task(receive_commands()), asyncio.create_task(send_events())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscriber.close()
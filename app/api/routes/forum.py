@@ -1,97 +1,203 @@
 # === api/routes/forum.py ===
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
 from app.db.database import forum_question_collection, forum_answer_collection
-from app.schemas.forum import ForumQuestionCreate, ForumAnswerCreate, ForumQuestionResponse, ForumAnswerResponse
-from app.core.auth import get_current_user
+from app.schemas.forum import ForumQuestionCreate, ForumAnswerCreate, ForumQuestionResponse, ForumAnswerResponse, ForumThreadResponse, ForumSearchHit, ForumQuestionCreateResponse, ForumDuplicateHint, ForumTrendingQuestion
+from app.core.auth import get_current_user_claims
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, created_between, decode_sort_cursor, encode_cursor, encode_sort_cursor, keyset_filter, paginate, set_next_cursor, sort_spec
+from app.core.search import forum_search
+from app.core.dedup import duplicate_index
+from app.core.pubsub import forum_topic, pubsub, question_topic
+from app.core.trending import ANSWER_WEIGHT, QUESTION_WEIGHT, trending
+from app.core.etag import check_etag, compute_etag
+from app.core.ids import generate_id
+from app.core.fields import FIELDS_DESCRIPTION, fields_projection, parse_fields, sparse_dump, sparse_response, wants_field
+from app.db.user_stats import record_created, record_deleted
+from app.db.cascade import cascade_worker, register_delete_hook
+from app.db.database import database
+from app.core.streaming import stream_ndjson, wants_ndjson
+from app.core.feed_cache import FeedCache
+from app.core.config import settings
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from typing import List, Dict
+from typing import List, Dict, Optional
+from collections import Counter
+import asyncio
 from datetime import datetime
 from app.db.database import forum_question_collection, forum_answer_collection, user_collection
 router = APIRouter()
 
+# Materialized per-question counters returned after an answer is added or removed
+QUESTION_ACTIVITY_FIELDS = {"_id": 0, "answer_count": 1, "last_answer_at": 1, "last_activity_at": 1}
+
+# Feed orderings: "newest" by creation, "activity" by the latest answer or creation
+FEED_SORT_FIELDS = {"newest": None, "activity": "last_activity_at"}
+
+# Newest questions, rendered with usernames, served by get_all_questions
+feed_cache = FeedCache(
+    max_items=settings.feed_cache_size,
+    ttl=settings.feed_cache_ttl_seconds,
+    max_stale=settings.feed_cache_max_stale_seconds
+)
+
+
+def _forget_questions(docs: List[dict]):
+    for doc in docs:
+        feed_cache.remove("question_id", doc["question_id"])
+        forum_search.remove_question(doc["question_id"])
+        duplicate_index.remove(doc["question_id"])
+        trending.remove(doc["question_id"])
+
+
+def _forget_answers(docs: List[dict]):
+    for doc in docs:
+        forum_search.remove_answer(doc["answer_id"])
+
+
+async def _count_deleted_answers(docs: List[dict]):
+    """Take a batch of cascade-deleted answers off their questions' and authors' counters,
+    as delete_answer does for one; last_answer_at is left to app.db.reconcile"""
+    per_question = Counter(doc["question_id"] for doc in docs if doc.get("question_id"))
+    for question_id, count in per_question.items():
+        activity = await forum_question_collection.find_one_and_update(
+            {"question_id": question_id, "answer_count": {"$gte": count}},
+            {"$inc": {"answer_count": -count}},
+            projection=QUESTION_ACTIVITY_FIELDS,
+            return_document=ReturnDocument.AFTER
+        )
+        if activity:
+            feed_cache.update("question_id", question_id, activity)
+
+    per_author = Counter(doc["user_id"] for doc in docs if doc.get("user_id"))
+    for user_id, count in per_author.items():
+        await record_deleted(user_id, "answer_count", count)
+
+
+# Questions and answers removed by cascade deletion jobs on this worker
+register_delete_hook("forum-question", ["question_id"], _forget_questions)
+register_delete_hook("forum-answer", ["answer_id"], _forget_answers)
+register_delete_hook("forum-answer", ["question_id", "user_id"], _count_deleted_answers)
+
+
+# Fallback username for authors that can't be found
+def placeholder_username(user_id) -> str:
+    if not isinstance(user_id, str) or not user_id:
+        return "Unknown User"
+    if user_id.startswith("a_") or user_id.startswith("q_"):
+        parts = user_id.split("_")
+        if len(parts) >= 2:
+            return f"User {parts[1][:8]}"
+    return f"User {user_id[:8]}"
+
 
 # Helper function to add username to a document
 async def add_username_to_doc(doc):
     if doc and "user_id" in doc:
+        user_id = doc["user_id"]
         try:
             user = None
-            user_id = doc["user_id"]
+            # Try the ObjectId, then legacy string ids and usernames
+            if ObjectId.is_valid(user_id):
+                user = await user_collection.find_one({"_id": ObjectId(user_id)}, {"username": 1})
+            if not user:
+                user = await user_collection.find_one({"id": user_id}, {"username": 1})
+            if not user:
+                user = await user_collection.find_one({"username": user_id}, {"username": 1})
+            doc["username"] = user["username"] if user and "username" in user else placeholder_username(user_id)
+        except Exception as e:
+            print(f"Error looking up username for user_id {user_id}: {e}")
+            doc["username"] = placeholder_username(user_id)
+    return doc
 
-            # First method: Try to look up by direct ID
-            print(f"Looking up username for user_id: {user_id}")
 
-            # Try with ObjectId
-            if ObjectId.is_valid(user_id):
-                user = await user_collection.find_one({"_id": ObjectId(user_id)})
-                if user:
-                    print(f"Found user by ObjectId: {user.get('username')}")
+# Add usernames to many documents with one $in query; legacy ids fall back to add_username_to_doc
+async def add_usernames(docs):
+    user_ids = {doc["user_id"] for doc in docs if ObjectId.is_valid(doc.get("user_id"))}
+    usernames = {}
+    if user_ids:
+        async for user in user_collection.find(
+                {"_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}}, {"username": 1}):
+            usernames[str(user["_id"])] = user["username"]
+    for doc in docs:
+        if doc.get("user_id") in usernames:
+            doc["username"] = usernames[doc["user_id"]]
+        else:
+            await add_username_to_doc(doc)
+    return docs
+
+
+# Shape a stored document for the API, resolving its author's username
+async def to_response_doc(doc):
+    doc["id"] = str(doc["_id"])
+    del doc["_id"]
+    return await add_username_to_doc(doc)
 
-            # If not found, try with string ID
-            if not user:
-                user = await user_collection.find_one({"id": user_id})
-                if user:
-                    print(f"Found user by string id: {user.get('username')}")
 
-            # If still not found, try as username
-            if not user:
-                user = await user_collection.find_one({"username": user_id})
-                if user:
-                    print(f"Found user by username: {user.get('username')}")
-
-            # If found a user, add username
-            if user and "username" in user:
-                doc["username"] = user["username"]
-                print(f"Added username '{user['username']}' to document")
-            else:
-                print(f"No user found for user_id: {user_id}")
-
-                # If the user ID is in a specific format like "a_123456_timestamp",
-                # extract a friendly name from it
-                if user_id and isinstance(user_id, str):
-                    if user_id.startswith("a_") or user_id.startswith("q_"):
-                        parts = user_id.split("_")
-                        if len(parts) >= 2:
-                            # Use "User" followed by the first few chars of the ID
-                            doc["username"] = f"User {parts[1][:8]}"
-                            print(f"Created friendly name from ID: {doc['username']}")
-                    else:
-                        # Ensure we have some username even if lookup failed
-                        doc["username"] = f"User {user_id[:8]}"
-                        print(f"Using shortened ID as username: {doc['username']}")
-
-                # Debug - print user collection info
-                count = await user_collection.count_documents({})
-                print(f"Total users in database: {count}")
-
-                # Sample first user
-                if count > 0:
-                    sample_user = await user_collection.find_one({})
-                    if sample_user:
-                        print(f"Sample user structure: {sample_user.keys()}")
+# Shape many stored documents, resolving their authors with one $in query
+async def to_response_docs(docs):
+    for doc in docs:
+        doc["id"] = str(doc["_id"])
+        del doc["_id"]
+    return await add_usernames(docs)
 
-        except Exception as e:
-            print(f"Error looking up username for user_id {doc['user_id']}: {e}")
-            # Fallback username on error
-            doc["username"] = f"User {doc['user_id'][:8]}" if isinstance(doc['user_id'], str) else "Unknown User"
+
+# Shape a document written by the current user
+def to_own_response_doc(doc, username):
+    doc["id"] = str(doc["_id"])
+    del doc["_id"]
+    doc["username"] = username
     return doc
 
+
+# Projection for ?fields= on lists whose usernames are looked up per document
+def listing_projection(selected):
+    return fields_projection(selected, ["user_id"] if wants_field(selected, "username") else [])
+
+
+# NDJSON transform for ?fields=: usernames are only looked up when asked for
+def sparse_transform(model, selected):
+    dump = sparse_dump(model, selected)
+
+    async def transform(doc):
+        doc["id"] = str(doc["_id"])
+        del doc["_id"]
+        if "username" in selected:
+            await add_username_to_doc(doc)
+        return dump(doc)
+    return transform
+
+
+# Load the head of the question feed for the feed cache
+async def load_feed(count):
+    docs = await forum_question_collection.find({}).sort("_id", DESCENDING).limit(count).to_list(count)
+    for doc in docs:
+        doc["id"] = str(doc["_id"])
+    return await add_usernames(docs)
+
 # === Forum Questions ===
 
 # === Forum Questions ===
-@router.post("/forum/question/", response_model=ForumQuestionResponse)
+@router.post("/forum/question/", response_model=ForumQuestionCreateResponse)
 async def create_question(
         question: ForumQuestionCreate,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
-    question_id = question.question_id or f"q_{current_user['id']}_{int(datetime.utcnow().timestamp())}"
+    question_id = question.question_id or generate_id("q", current_user["id"])
 
     # Add user ID from the authenticated user
     new_entry = question.model_dump()
     new_entry["user_id"] = current_user["id"]
     new_entry["question_id"] = question_id
-    new_entry["creation_date"] = datetime.utcnow().isoformat()
+    now = datetime.utcnow()
+    new_entry["creation_date"] = now
+    new_entry["answer_count"] = 0
+    new_entry["last_answer_at"] = None
+    new_entry["last_activity_at"] = now
 
-    res = await forum_question_collection.insert_one(new_entry)
+    try:
+        res = await forum_question_collection.insert_one(new_entry)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Question id already exists")
     created = await forum_question_collection.find_one({"_id": res.inserted_id})
 
     if created and "_id" in created:
@@ -100,28 +206,74 @@ async def create_question(
 
     # Add username from current user
     created["username"] = current_user["username"]
+    feed_cache.add(res.inserted_id, created)
+    forum_search.add_question(created)
+    duplicate_index.add(created)
+    trending.record(question_id, QUESTION_WEIGHT, now)
+    await record_created(current_user["id"], "question_count", now)
+    pubsub.publish(forum_topic(), {"type": "question_created", "question": dict(created)})
+
+    created["possible_duplicates"] = duplicate_index.find_similar_to(question_id)
     return created
 
 
 
 # Add new endpoint to get all questions - placing it before specific routes
 @router.get("/forum/question/all")
-async def get_all_questions(current_user: dict = Depends(get_current_user)):
+async def get_all_questions(
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        sort: str = Query("newest", pattern="^(newest|activity)$"),
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
+):
+    sort_field = FEED_SORT_FIELDS[sort]
+    query = created_between({}, since, until)
+    selected = parse_fields(fields, ForumQuestionResponse)
+    projection = listing_projection(selected)
+
+    # NDJSON streams every question after the cursor instead of one page
+    if wants_ndjson(request):
+        return stream_ndjson(
+            forum_question_collection.find(keyset_filter(query, cursor, DESCENDING, sort_field), projection).sort(sort_spec(DESCENDING, sort_field)),
+            sparse_transform(ForumQuestionResponse, selected) if selected else to_response_doc
+        )
+
     try:
         print(f"Fetching all questions for user: {current_user['id']}")
 
+        # Most requests are for the first pages of the newest feed, which live in memory
+        if sort_field is None and not query:
+            cached = await feed_cache.get_page(limit, cursor, load_feed)
+            if cached is not None:
+                questions, next_cursor = cached
+                set_next_cursor(response, next_cursor)
+                if selected:
+                    return sparse_response(ForumQuestionResponse, questions, selected, response)
+                return questions
+
         questions = []
-        cursor = forum_question_collection.find({})
+        docs, next_cursor = await paginate(forum_question_collection, query, limit, cursor, DESCENDING, sort_field, projection)
+        set_next_cursor(response, next_cursor)
 
-        async for doc in cursor:
+        for doc in docs:
             doc["id"] = str(doc["_id"])
             del doc["_id"]
-            # Add username to each question
-            doc = await add_username_to_doc(doc)
             questions.append(doc)
+        # Add usernames to the page
+        if wants_field(selected, "username"):
+            await add_usernames(questions)
 
         print(f"Returning {len(questions)} questions")
+        if selected:
+            return sparse_response(ForumQuestionResponse, questions, selected, response)
         return questions
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_all_questions: {str(e)}")
         import traceback
@@ -130,41 +282,218 @@ async def get_all_questions(current_user: dict = Depends(get_current_user)):
         return []
 
 
+@router.get("/forum/question/similar", response_model=List[ForumDuplicateHint])
+async def get_similar_questions(
+        question_header: str = Query(..., min_length=1),
+        question: str = "",
+        limit: int = Query(5, ge=1, le=20),
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """Near-duplicates of a question the user is about to post"""
+    return duplicate_index.find_similar(f"{question_header} {question}", limit=limit)
+
+
+@router.get("/forum/search", response_model=List[ForumSearchHit])
+async def search_forum(
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """BM25-ranked search over question headers, questions and answers"""
+    if not forum_search.ready:
+        raise HTTPException(status_code=503, detail="Search index is still loading")
+
+    after = decode_sort_cursor(cursor) if cursor else None
+    hits = forum_search.search(q, limit + 1, after)
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_sort_cursor(hits[-1][1], hits[-1][0])
+    set_next_cursor(response, next_cursor)
+
+    question_ids = [key[2:] for key, _ in hits if key.startswith("q:")]
+    answer_ids = [key[2:] for key, _ in hits if key.startswith("a:")]
+    questions, answers = await asyncio.gather(
+        forum_question_collection.find({"question_id": {"$in": question_ids}}).to_list(len(question_ids)),
+        forum_answer_collection.find({"answer_id": {"$in": answer_ids}}).to_list(len(answer_ids))
+    )
+    await to_response_docs(questions + answers)
+    docs = {f"q:{doc['question_id']}": doc for doc in questions}
+    docs.update({f"a:{doc['answer_id']}": doc for doc in answers})
+
+    results = []
+    for key, score in hits:
+        doc = docs.get(key)
+        if doc is None:
+            continue
+        kind = "question" if key.startswith("q:") else "answer"
+        results.append({"type": kind, "score": score, kind: doc})
+    return results
+
+
+@router.get("/forum/trending", response_model=List[ForumTrendingQuestion])
+async def get_trending_questions(
+        limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """Questions with the most recent activity, weighted by recency"""
+    if not trending.ready:
+        raise HTTPException(status_code=503, detail="Trending ranking is still loading")
+
+    top = trending.top(limit)
+    question_ids = [question_id for question_id, _ in top]
+    docs = await forum_question_collection.find({"question_id": {"$in": question_ids}}).to_list(len(question_ids))
+    by_id = {doc["question_id"]: doc for doc in await to_response_docs(docs)}
+
+    results = []
+    for question_id, score in top:
+        doc = by_id.get(question_id)
+        # Deleted through another worker
+        if doc is None:
+            continue
+        doc["trending_score"] = score
+        results.append(doc)
+    return results
+
+
 @router.get("/forum/question/{question_id}", response_model=ForumQuestionResponse)
 async def get_question(
         question_id: str,
-        current_user: dict = Depends(get_current_user)
+        request: Request,
+        response: Response,
+        current_user: dict = Depends(get_current_user_claims)
 ):
     doc = await forum_question_collection.find_one({"question_id": question_id})
     if not doc:
         raise HTTPException(status_code=404, detail="Question not found")
 
+    not_modified = check_etag(request, response, compute_etag([doc]))
+    if not_modified:
+        return not_modified
+
     doc["id"] = str(doc["_id"])
     del doc["_id"]
     # Add username
     doc = await add_username_to_doc(doc)
     return doc
 
+# Pipeline stages that resolve the author of each document into "_author"
+AUTHOR_LOOKUP_STAGES = [
+    {"$addFields": {"_author_oid": {
+        "$convert": {"input": "$user_id", "to": "objectId", "onError": None, "onNull": None}
+    }}},
+    {"$lookup": {
+        "from": "user",
+        "localField": "_author_oid",
+        "foreignField": "_id",
+        "pipeline": [{"$project": {"_id": 0, "username": 1}}],
+        "as": "_author"
+    }},
+]
+
+
+# Shape an aggregated document, falling back to add_username_to_doc for legacy ids
+async def thread_doc(doc):
+    author = doc.pop("_author", [])
+    doc.pop("_author_oid", None)
+    doc["id"] = str(doc["_id"])
+    del doc["_id"]
+    if author:
+        doc["username"] = author[0]["username"]
+        return doc
+    return await add_username_to_doc(doc)
+
+
+@router.get("/forum/question/{question_id}/thread", response_model=ForumThreadResponse)
+async def get_question_thread(
+        question_id: str,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """The question, a page of its answers and their authors in one aggregation"""
+    answer_match = keyset_filter({}, cursor, ASCENDING)
+    pipeline = [
+        {"$match": {"question_id": question_id}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "forum-answer",
+            "localField": "question_id",
+            "foreignField": "question_id",
+            "pipeline": [
+                {"$match": answer_match},
+                {"$sort": {"_id": ASCENDING}},
+                {"$limit": limit + 1},
+                *AUTHOR_LOOKUP_STAGES
+            ],
+            "as": "answers"
+        }},
+        *AUTHOR_LOOKUP_STAGES
+    ]
+
+    docs = await forum_question_collection.aggregate(pipeline).to_list(1)
+    if not docs:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    question = docs[0]
+    answers = question.pop("answers")
+
+    next_cursor = None
+    if len(answers) > limit:
+        answers = answers[:limit]
+        next_cursor = encode_cursor(answers[-1]["_id"])
+    set_next_cursor(response, next_cursor)
+
+    return {
+        "question": await thread_doc(question),
+        "answers": [await thread_doc(answer) for answer in answers],
+        "next_cursor": next_cursor
+    }
+
+
 @router.get("/forum/my-questions/", response_model=List[ForumQuestionResponse])
 async def get_user_questions(
-        current_user: dict = Depends(get_current_user)
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
 ):
+    query = created_between({"user_id": current_user["id"]}, since, until)
+    selected = parse_fields(fields, ForumQuestionResponse)
+    projection = fields_projection(selected)
+    if wants_ndjson(request):
+        dump = sparse_dump(ForumQuestionResponse, selected) if selected else (lambda doc: doc)
+        return stream_ndjson(
+            forum_question_collection.find(keyset_filter(query, cursor), projection).sort("_id", DESCENDING),
+            lambda doc: dump(to_own_response_doc(doc, current_user["username"]))
+        )
+
     questions = []
-    cursor = forum_question_collection.find({"user_id": current_user["id"]})
-    async for doc in cursor:
+    docs, next_cursor = await paginate(forum_question_collection, query, limit, cursor, projection=projection)
+    set_next_cursor(response, next_cursor)
+    for doc in docs:
         doc["id"] = str(doc["_id"])
         del doc["_id"]
         # Add username - for my questions, we know it's the current user
         doc["username"] = current_user["username"]
         questions.append(doc)
 
+    if selected:
+        return sparse_response(ForumQuestionResponse, questions, selected, response)
     return questions
 
 
 @router.delete("/forum/question/{question_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_question(
         question_id: str,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # Check if the question exists and belongs to the current user
     question = await forum_question_collection.find_one({"question_id": question_id})
@@ -181,6 +510,18 @@ async def delete_question(
     if result.deleted_count == 0:
         raise HTTPException(status_code=500, detail="Failed to delete question")
 
+    feed_cache.remove("question_id", question_id)
+    forum_search.remove_question(question_id)
+    duplicate_index.remove(question_id)
+    trending.remove(question_id)
+    await record_deleted(current_user["id"], "question_count")
+    # Its answers are removed in the background
+    await cascade_worker.enqueue(database, "question", question_id, current_user["id"])
+    pubsub.publish_many(
+        [forum_topic(), question_topic(question_id)],
+        {"type": "question_deleted", "question_id": question_id}
+    )
+
     return None
 
 
@@ -188,37 +529,60 @@ async def delete_question(
 @router.post("/forum/answer/", response_model=ForumAnswerResponse)
 async def create_answer(
         answer: ForumAnswerCreate,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # Check if the question exists
     question = await forum_question_collection.find_one({"question_id": answer.question_id})
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    answer_id = answer.answer_id or f"a_{current_user['id']}_{int(datetime.utcnow().timestamp())}"
+    answer_id = answer.answer_id or generate_id("a", current_user["id"])
 
     # Add user ID from the authenticated user
     new_entry = answer.model_dump()
     new_entry["user_id"] = current_user["id"]
     new_entry["answer_id"] = answer_id
-    new_entry["creation_date"] = datetime.utcnow().isoformat()
+    now = datetime.utcnow()
+    new_entry["creation_date"] = now
 
-    res = await forum_answer_collection.insert_one(new_entry)
+    try:
+        res = await forum_answer_collection.insert_one(new_entry)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Answer id already exists")
     created = await forum_answer_collection.find_one({"_id": res.inserted_id})
 
+    # Keep the question's materialized answer count and activity time current
+    activity = await forum_question_collection.find_one_and_update(
+        {"question_id": answer.question_id},
+        {"$inc": {"answer_count": 1}, "$max": {"last_answer_at": now, "last_activity_at": now}},
+        projection=QUESTION_ACTIVITY_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    if activity:
+        feed_cache.update("question_id", answer.question_id, activity)
+    forum_search.add_answer(created)
+    trending.record(answer.question_id, ANSWER_WEIGHT, now)
+    await record_created(current_user["id"], "answer_count", now)
+
     if created and "_id" in created:
         created["id"] = str(created["_id"])
         del created["_id"]
 
     # Add username from current user
     created["username"] = current_user["username"]
+    pubsub.publish(question_topic(answer.question_id), {
+        "type": "answer_created",
+        "question_id": answer.question_id,
+        "answer": created,
+        "answer_count": activity["answer_count"] if activity else None,
+    })
     return created
 
 
 @router.get("/forum/answer/{answer_id}", response_model=ForumAnswerResponse)
 async def get_answer(
         answer_id: str,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     doc = await forum_answer_collection.find_one({"answer_id": answer_id})
     if not doc:
@@ -234,45 +598,88 @@ async def get_answer(
 @router.get("/forum/question/{question_id}/answers", response_model=List[ForumAnswerResponse])
 async def get_question_answers(
         question_id: str,
-        current_user: dict = Depends(get_current_user)
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # Check if the question exists
-    question = await forum_question_collection.find_one({"question_id": question_id})
+    question = await forum_question_collection.find_one({"question_id": question_id}, {"_id": 1})
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
+    selected = parse_fields(fields, ForumAnswerResponse)
+    projection = listing_projection(selected)
+    if wants_ndjson(request):
+        return stream_ndjson(
+            forum_answer_collection.find(keyset_filter({"question_id": question_id}, cursor, ASCENDING), projection).sort("_id", ASCENDING),
+            sparse_transform(ForumAnswerResponse, selected) if selected else to_response_doc
+        )
+
+    # Answers read top to bottom, oldest first
     answers = []
-    cursor = forum_answer_collection.find({"question_id": question_id})
-    async for doc in cursor:
+    docs, next_cursor = await paginate(forum_answer_collection, {"question_id": question_id}, limit, cursor, ASCENDING, projection=projection)
+    extra = [",".join(sorted(selected))] if selected else []
+    not_modified = check_etag(request, response, compute_etag(docs, next_cursor, *extra))
+    if not_modified:
+        set_next_cursor(not_modified, next_cursor)
+        return not_modified
+    set_next_cursor(response, next_cursor)
+    for doc in docs:
         doc["id"] = str(doc["_id"])
         del doc["_id"]
-        # Add username
-        doc = await add_username_to_doc(doc)
         answers.append(doc)
+    # Add usernames to the page
+    if wants_field(selected, "username"):
+        await add_usernames(answers)
 
+    if selected:
+        return sparse_response(ForumAnswerResponse, answers, selected, response)
     return answers
 
 
 @router.get("/forum/my-answers/", response_model=List[ForumAnswerResponse])
 async def get_user_answers(
-        current_user: dict = Depends(get_current_user)
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
 ):
+    query = created_between({"user_id": current_user["id"]}, since, until)
+    selected = parse_fields(fields, ForumAnswerResponse)
+    projection = fields_projection(selected)
+    if wants_ndjson(request):
+        dump = sparse_dump(ForumAnswerResponse, selected) if selected else (lambda doc: doc)
+        return stream_ndjson(
+            forum_answer_collection.find(keyset_filter(query, cursor), projection).sort("_id", DESCENDING),
+            lambda doc: dump(to_own_response_doc(doc, current_user["username"]))
+        )
+
     answers = []
-    cursor = forum_answer_collection.find({"user_id": current_user["id"]})
-    async for doc in cursor:
+    docs, next_cursor = await paginate(forum_answer_collection, query, limit, cursor, projection=projection)
+    set_next_cursor(response, next_cursor)
+    for doc in docs:
         doc["id"] = str(doc["_id"])
         del doc["_id"]
         # Add username - for my answers, we know it's the current user
         doc["username"] = current_user["username"]
         answers.append(doc)
 
+    if selected:
+        return sparse_response(ForumAnswerResponse, answers, selected, response)
     return answers
 
 
 @router.delete("/forum/answer/{answer_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_answer(
         answer_id: str,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # Check if the answer exists and belongs to the current user
     answer = await forum_answer_collection.find_one({"answer_id": answer_id})
@@ -289,18 +696,46 @@ async def delete_answer(
     if result.deleted_count == 0:
         raise HTTPException(status_code=500, detail="Failed to delete answer")
 
+    # last_answer_at is left as is; app.db.reconcile recomputes it
+    activity = await forum_question_collection.find_one_and_update(
+        {"question_id": answer["question_id"], "answer_count": {"$gt": 0}},
+        {"$inc": {"answer_count": -1}},
+        projection=QUESTION_ACTIVITY_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    if activity:
+        feed_cache.update("question_id", answer["question_id"], activity)
+    forum_search.remove_answer(answer_id)
+    await record_deleted(current_user["id"], "answer_count")
+    pubsub.publish(question_topic(answer["question_id"]), {
+        "type": "answer_deleted",
+        "question_id": answer["question_id"],
+        "answer_id": answer_id,
+        "answer_count": activity["answer_count"] if activity else None,
+    })
+
     return None
 
 # Add new endpoint to get answers for a specific question - placing it before specific routes
 
 @router.get("/forum/answer/question/{question_id}")
-async def get_question_answers_alt(question_id: str, current_user: dict = Depends(get_current_user)):
+async def get_question_answers_alt(
+        question_id: str,
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        current_user: dict = Depends(get_current_user_claims)
+):
     answers = []
-    cursor = forum_answer_collection.find({"question_id": question_id})
-    async for doc in cursor:
+    docs, next_cursor = await paginate(forum_answer_collection, {"question_id": question_id}, limit, cursor, ASCENDING)
+    not_modified = check_etag(request, response, compute_etag(docs, next_cursor))
+    if not_modified:
+        set_next_cursor(not_modified, next_cursor)
+        return not_modified
+    set_next_cursor(response, next_cursor)
+    for doc in docs:
         doc["id"] = str(doc["_id"])
         del doc["_id"]
-        # Add username
-        doc = await add_username_to_doc(doc)
         answers.append(doc)
-    return answers
\ No newline at end of file
+    return await add_usernames(answers)
\ No newline at end of file
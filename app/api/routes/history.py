@@ -1,27 +1,78 @@
 # === api/routes/history.py ===
-from fastapi import APIRouter, HTTPException, FastAPI, Depends
-from app.db.database import history_collection
-from app.schemas.history import HistoryCreate, HistoryResponse, HistoryUpdate
-from typing import List
+from fastapi import APIRouter, HTTPException, FastAPI, Depends, Request, Response
+from app.db.database import get_client, history_collection, query_collection
+from app.schemas.history import HistoryBulkResult, HistoryBulkUpdate, HistoryCreate, HistoryMove, HistoryResponse, HistoryUpdate
+from typing import List, Optional
 from bson import ObjectId
 from fastapi import Body
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user_claims
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, set_next_cursor
+from app.core.etag import check_etag, compute_etag
+from app.core.ids import generate_id
+from pymongo.errors import DuplicateKeyError
+from app.core.fields import FIELDS_DESCRIPTION, fields_projection, parse_fields, sparse_response
 from datetime import datetime
 import logging
 from fastapi import Query
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Attempts at a bulk update when the history changes between read and write
+BULK_UPDATE_ATTEMPTS = 5
+
+
+def plan_add(query_set: List[str], query_ids: List[str]) -> List[str]:
+    """The requested ids not in the history yet, once each, in request order"""
+    existing = set(query_set)
+    return [query_id for query_id in dict.fromkeys(query_ids) if query_id not in existing]
+
+
+def plan_remove(query_set: List[str], query_ids: List[str]):
+    """(ids to $pullAll, how many entries that takes out of query_set)"""
+    requested = set(query_ids)
+    present = [query_id for query_id in dict.fromkeys(query_set) if query_id in requested]
+    removed = sum(1 for query_id in query_set if query_id in requested)
+    return present, removed
+
+
+async def get_owned_history(history_id: str, user_id: str, session=None) -> dict:
+    history = await history_collection.find_one({"history_id": history_id}, session=session)
+    if not history:
+        raise HTTPException(status_code=404, detail="History not found")
+    if history["user_id"] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this history")
+    return history
+
+
+async def update_query_set(history: dict, plan) -> int:
+    """Apply the update `plan(query_set)` returns as (update, count) to the
+    query_set it was planned on, re-reading and re-planning if the history
+    changed in between. Returns count."""
+    for _ in range(BULK_UPDATE_ATTEMPTS):
+        update, count = plan(history["query_set"])
+        if not count:
+            return 0
+        result = await history_collection.update_one(
+            {"_id": history["_id"], "query_set": history["query_set"]}, update
+        )
+        if result.modified_count:
+            return count
+        history = await history_collection.find_one({"_id": history["_id"]})
+        if not history:
+            raise HTTPException(status_code=404, detail="History not found")
+    raise HTTPException(status_code=409, detail="History is being changed concurrently, try again")
+
 
 @router.post("/history/", response_model=HistoryResponse)
 async def create_history(
         entry: HistoryCreate,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # Generate a unique history_id if not provided
-    history_id = entry.history_id or f"hist_{current_user['id']}_{int(datetime.now().timestamp())}"
+    history_id = entry.history_id or generate_id("hist", current_user["id"])
     logger.info("Generated history_id: %s", history_id)
 
     new_entry = {
@@ -31,7 +82,10 @@ async def create_history(
         #"assistant_name": entry.assistant_name,
         "history_id": history_id
     }
-    res = await history_collection.insert_one(new_entry)
+    try:
+        res = await history_collection.insert_one(new_entry)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="History id already exists")
     new_entry["_id"] = res.inserted_id
     return {**new_entry, "id": str(new_entry["_id"])}
 
@@ -39,21 +93,34 @@ async def create_history(
 @router.get("/history/user/", response_model=List[HistoryResponse])
 async def get_user_histories(
         user_id: str,
-        current_user: dict = Depends(get_current_user)
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
 ):
-
-    docs = await history_collection.find({"user_id": current_user["id"]}).to_list(100)
+    selected = parse_fields(fields, HistoryResponse)
+    docs, next_cursor = await paginate(
+        history_collection, {"user_id": current_user["id"]}, limit, cursor, projection=fields_projection(selected)
+    )
+    set_next_cursor(response, next_cursor)
     for doc in docs:
         doc["id"] = str(doc["_id"])
+    if selected:
+        return sparse_response(HistoryResponse, docs, selected, response)
     return docs
 
 
 @router.get("/history/{history_id}", response_model=HistoryResponse)
 async def get_history(
         history_id: str,
-        current_user: dict = Depends(get_current_user)
+        request: Request,
+        response: Response,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
 ):
-    doc = await history_collection.find_one({"history_id": history_id})
+    selected = parse_fields(fields, HistoryResponse)
+    doc = await history_collection.find_one({"history_id": history_id}, fields_projection(selected, ["user_id"]))
     if not doc:
         raise HTTPException(status_code=404, detail="History not found")
 
@@ -61,7 +128,14 @@ async def get_history(
     if doc["user_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to access this history")
 
+    extra = [",".join(sorted(selected))] if selected else []
+    not_modified = check_etag(request, response, compute_etag([doc], *extra))
+    if not_modified:
+        return not_modified
+
     doc["id"] = str(doc["_id"])
+    if selected:
+        return sparse_response(HistoryResponse, doc, selected, response)
     return doc
 
 
@@ -69,7 +143,7 @@ async def get_history(
 async def add_query_to_history(
         history_id: str,
         update: HistoryUpdate,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # First check if the history belongs to the current user
     history = await history_collection.find_one({"history_id": history_id})
@@ -94,7 +168,7 @@ async def add_query_to_history(
 async def remove_query_from_history(
         history_id: str,
         query_id: str= Query(...),
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # First check if the history belongs to the current user
     history = await history_collection.find_one({"history_id": history_id})
@@ -115,10 +189,85 @@ async def remove_query_from_history(
     return {"message": f"Query '{query_id}' removed from history '{history_id}'"}
 
 
+@router.put("/history/{history_id}/add-queries", response_model=HistoryBulkResult)
+async def add_queries_to_history(
+        history_id: str,
+        update: HistoryBulkUpdate,
+        current_user: dict = Depends(get_current_user_claims)
+):
+    history = await get_owned_history(history_id, current_user["id"])
+
+    def plan(query_set):
+        new_ids = plan_add(query_set, update.query_ids)
+        return {"$push": {"query_set": {"$each": new_ids}}, "$inc": {"query_number": len(new_ids)}}, len(new_ids)
+
+    added = await update_query_set(history, plan)
+    return {"message": f"{added} queries added", "added": added}
+
+
+@router.put("/history/{history_id}/remove-queries", response_model=HistoryBulkResult)
+async def remove_queries_from_history(
+        history_id: str,
+        update: HistoryBulkUpdate,
+        current_user: dict = Depends(get_current_user_claims)
+):
+    history = await get_owned_history(history_id, current_user["id"])
+
+    def plan(query_set):
+        present, removed = plan_remove(query_set, update.query_ids)
+        return {"$pullAll": {"query_set": present}, "$inc": {"query_number": -removed}}, removed
+
+    removed = await update_query_set(history, plan)
+    return {"message": f"{removed} queries removed", "removed": removed}
+
+
+@router.post("/history/move-queries", response_model=HistoryBulkResult)
+async def move_queries_between_histories(
+        move: HistoryMove,
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """Move queries from one of the user's histories to another in one transaction"""
+    if move.source_history_id == move.target_history_id:
+        raise HTTPException(status_code=400, detail="Source and target history are the same")
+
+    async def transfer(session):
+        source = await get_owned_history(move.source_history_id, current_user["id"], session)
+        target = await get_owned_history(move.target_history_id, current_user["id"], session)
+
+        present, removed = plan_remove(source["query_set"], move.query_ids)
+        added = plan_add(target["query_set"], present)
+        if removed:
+            await history_collection.update_one(
+                {"_id": source["_id"]},
+                {"$pullAll": {"query_set": present}, "$inc": {"query_number": -removed}},
+                session=session
+            )
+        if added:
+            await history_collection.update_one(
+                {"_id": target["_id"]},
+                {"$push": {"query_set": {"$each": added}}, "$inc": {"query_number": len(added)}},
+                session=session
+            )
+        if present:
+            await query_collection.update_many(
+                {"query_id": {"$in": present}, "user_id": current_user["id"]},
+                {"$set": {"history_id": move.target_history_id}},
+                session=session
+            )
+        return removed, len(added)
+
+    # with_transaction retries the whole transfer on transient write conflicts
+    async with await get_client().start_session() as session:
+        removed, added = await session.with_transaction(transfer)
+
+    logger.info("Moved %d queries from %s to %s", added, move.source_history_id, move.target_history_id)
+    return {"message": f"{added} queries moved", "added": added, "removed": removed}
+
+
 @router.delete("/history/{history_id}")
 async def delete_history(
         history_id: str,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # First check if the history belongs to the current user
     history = await history_collection.find_one({"history_id": history_id})
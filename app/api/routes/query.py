@@ -1,12 +1,25 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
-from app.db.database import query_collection, history_collection
+from fastapi import APIRouter, HTTPException, Body, Depends, Query, Request, Response
+from app.db.database import database, query_collection, history_collection
+from app.db.archive import archive
 from app.schemas.query import QueryCreate, QueryResponse, QueryUpdate
 from app.schemas.history import HistoryUpdate
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user_claims
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, created_between, keyset_filter, paginate, set_next_cursor
+from app.core.streaming import stream_ndjson, wants_ndjson
+from app.core.pubsub import pubsub, queries_topic
+from app.core.etag import check_etag, compute_etag
+from app.core.fields import FIELDS_DESCRIPTION, fields_projection, parse_fields, sparse_dump, sparse_response
+from app.db.user_stats import record_created, record_deleted
+from app.db.rollups import record_query, record_rating, remove_query
+from app.core.quota import quota_tracker
+from app.core.ids import generate_id
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 import ollama
-from typing import List
+from typing import List, Optional
+from pymongo import DESCENDING
 import logging
+import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,11 +27,24 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Friendly-to-Ollama model mapping
+MODEL_ALIASES = {
+    "emotiondetection": "emotiondetection",
+    "textSimplification": "textSimplification",
+    "socialNorm": "socialNorm"
+}
+
+
+def to_response_doc(doc):
+    doc["id"] = str(doc["_id"])
+    del doc["_id"]
+    return doc
+
 
 @router.post("/", response_model=QueryResponse)
 async def create_query(
         query_data: QueryCreate,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     logger.info("Received query request from user %s: %s", current_user["id"], query_data.dict())
 
@@ -55,30 +81,39 @@ async def create_query(
 
     logger.info("Using history_id: %s", history_id)
 
-    # Friendly-to-Ollama model mapping
-    model_aliases = {
-        "emotiondetection": "emotiondetection",
-        "textSimplification": "textSimplification",
-        "socialNorm": "socialNorm"
-    }
-
     # Validate model name and map it
-    if model_name not in model_aliases:
+    if model_name not in MODEL_ALIASES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid model name. Choose from: {', '.join(model_aliases.keys())}"
+            detail=f"Invalid model name. Choose from: {', '.join(MODEL_ALIASES.keys())}"
         )
 
-    actual_model = model_aliases[model_name]
+    actual_model = MODEL_ALIASES[model_name]
+
+    # Refuse over-quota users from memory, before any model or database work
+    retry_after = quota_tracker.acquire(user_id, current_user.get("tier"))
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="LLM usage quota exceeded, try again later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    # A client-supplied id that is taken would only fail after the model call
+    if query_data.query_id and await query_collection.find_one({"query_id": query_data.query_id}, {"_id": 1}):
+        quota_tracker.release(user_id)
+        raise HTTPException(status_code=409, detail="Query id already exists")
 
     # Generate a unique query_id
-    query_id = query_data.query_id or f"qry_{user_id}_{int(datetime.now().timestamp())}"
+    query_id = query_data.query_id or generate_id("qry", user_id)
     logger.info("Generated query_id: %s", query_id)
 
     # Call the selected Ollama model to get the response
     logger.info("Calling Ollama model: %s", actual_model)
+    started = time.perf_counter()
     try:
         response = ollama.generate(model=actual_model, prompt=query)
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
         logger.info("Full Ollama response: %s", response)
         response_text = response.get('response', '').strip()
         if not response_text:
@@ -87,23 +122,31 @@ async def create_query(
         logger.info("Ollama response text: %s", response_text)
     except Exception as e:
         logger.error("Ollama error: %s", str(e))
+        quota_tracker.release(user_id)
         raise HTTPException(status_code=500, detail=f"Error processing query with model {actual_model}: {str(e)}")
 
+    quota_tracker.record_tokens(user_id, (response.get("prompt_eval_count") or 0) + (response.get("eval_count") or 0))
+
     # Prepare the query entry
-    creation_date = datetime.now().isoformat()
+    creation_date = datetime.utcnow()
     query_entry = {
         "query_id": query_id,
         "user_id": user_id,
         "query": query,
         "response": response_text,
         "creation_date": creation_date,
-        "history_id": history_id
+        "history_id": history_id,
+        "model_name": model_name,
+        "latency_ms": latency_ms
     }
     logger.info("Prepared query entry: %s", query_entry)
 
     # Insert into query collection
     logger.info("Inserting into query collection")
-    res = await query_collection.insert_one(query_entry)
+    try:
+        res = await query_collection.insert_one(query_entry)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Query id already exists")
     created = await query_collection.find_one({"_id": res.inserted_id})
     logger.info("Inserted query, created: %s", created)
 
@@ -130,14 +173,27 @@ async def create_query(
         raise HTTPException(status_code=404, detail="History not found")
 
     logger.info("Query creation successful")
+    await record_created(user_id, "query_count", creation_date)
+    await record_query(query_entry)
+    pubsub.publish(queries_topic(user_id), {"type": "query_completed", "query": created})
     return created
 
 
 
 @router.get("/{query_id}", response_model=QueryResponse)
-async def get_query(query_id: str, current_user: dict = Depends(get_current_user)):
-    # Find the query
-    doc = await query_collection.find_one({"query_id": query_id})
+async def get_query(
+        query_id: str,
+        request: Request,
+        response: Response,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
+):
+    selected = parse_fields(fields, QueryResponse)
+
+    # Find the query, falling back to cold storage for old ones
+    doc = await query_collection.find_one({"query_id": query_id}, fields_projection(selected, ["user_id"]))
+    if not doc:
+        doc = await archive.find_query(database, query_id)
 
     if not doc:
         raise HTTPException(status_code=404, detail="Query not found")
@@ -146,8 +202,15 @@ async def get_query(query_id: str, current_user: dict = Depends(get_current_user
     if doc["user_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Access forbidden: This query belongs to another user")
 
+    extra = [",".join(sorted(selected))] if selected else []
+    not_modified = check_etag(request, response, compute_etag([doc], *extra))
+    if not_modified:
+        return not_modified
+
     doc["id"] = str(doc["_id"])
     del doc["_id"]
+    if selected:
+        return sparse_response(QueryResponse, doc, selected, response)
     return doc
 
 
@@ -155,10 +218,12 @@ async def get_query(query_id: str, current_user: dict = Depends(get_current_user
 async def update_query(
         query_id: str,
         update: QueryUpdate,
-        current_user: dict = Depends(get_current_user)
+        current_user: dict = Depends(get_current_user_claims)
 ):
     # Find the query first to check ownership
     doc = await query_collection.find_one({"query_id": query_id})
+    if not doc:
+        doc = await archive.find_query(database, query_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Query not found")
 
@@ -170,21 +235,31 @@ async def update_query(
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
 
+    # An archived query that is being rated again comes back to the hot collection
+    if not await query_collection.find_one({"_id": doc["_id"]}, {"_id": 1}):
+        await archive.restore(database, query_id)
+
     result = await query_collection.update_one(
         {"query_id": query_id},
         {"$set": update_data}
     )
+    await record_rating(doc, update_data)
 
     updated = await query_collection.find_one({"query_id": query_id})
     updated["id"] = str(updated["_id"])
     del updated["_id"]
+    pubsub.publish(queries_topic(current_user["id"]), {"type": "query_updated", "query": updated})
     return updated
 
 
 @router.delete("/{query_id}")
-async def delete_query(query_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_query(query_id: str, current_user: dict = Depends(get_current_user_claims)):
     # Find the query first to check ownership
     doc = await query_collection.find_one({"query_id": query_id})
+    archived = False
+    if not doc:
+        doc = await archive.find_query(database, query_id)
+        archived = doc is not None
     if not doc:
         raise HTTPException(status_code=404, detail="Query not found")
 
@@ -200,19 +275,53 @@ async def delete_query(query_id: str, current_user: dict = Depends(get_current_u
             {"$pull": {"query_set": query_id}, "$inc": {"query_number": -1}}
         )
 
-    # Delete the query
-    result = await query_collection.delete_one({"query_id": query_id})
+    # Delete the query (archived ones just leave the archive index)
+    if archived:
+        deleted = await archive.forget(database, query_id)
+    else:
+        deleted = (await query_collection.delete_one({"query_id": query_id})).deleted_count
+    if deleted:
+        await record_deleted(current_user["id"], "query_count")
+        await remove_query(doc)
+    pubsub.publish(queries_topic(current_user["id"]), {"type": "query_deleted", "query_id": query_id})
     return {"message": "Query deleted successfully"}
 
 
 @router.get("/user/me", response_model=List[QueryResponse])
-async def get_my_queries(current_user: dict = Depends(get_current_user)):
-    # Get queries for the current user (from token)
+async def get_my_queries(
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: dict = Depends(get_current_user_claims)
+):
+    # Get queries for the current user (from token), newest first
     user_id = current_user["id"]
-    docs = await query_collection.find({"user_id": user_id}).to_list(100)
+    query = created_between({"user_id": user_id}, since, until)
+    selected = parse_fields(fields, QueryResponse)
+    projection = fields_projection(selected)
+
+    # NDJSON streams every query after the cursor instead of one page
+    if wants_ndjson(request):
+        transform = to_response_doc
+        if selected:
+            dump = sparse_dump(QueryResponse, selected)
+            transform = lambda doc: dump(to_response_doc(doc))
+        return stream_ndjson(
+            query_collection.find(keyset_filter(query, cursor), projection).sort("_id", DESCENDING),
+            transform
+        )
+
+    docs, next_cursor = await paginate(query_collection, query, limit, cursor, projection=projection)
+    set_next_cursor(response, next_cursor)
 
     for doc in docs:
         doc["id"] = str(doc["_id"])
         del doc["_id"]
 
+    if selected:
+        return sparse_response(QueryResponse, docs, selected, response)
     return docs
@@ -1,9 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from app.db.database import user_collection
-from app.models.user import UserResponse, UserUpdate
-from app.core.auth import get_current_user
+from app.db.database import database, user_collection, user_stats_collection
+from app.db.cascade import JOBS_COLLECTION, cascade_worker, to_job_response
+from app.db.user_stats import to_stats_response
+from app.db.export import GZIP_MEDIA_TYPE, decode_export_cursor, export_records, gzip_lines
+from app.core.config import settings
+from app.models.user import DeletionJob, UserResponse, UserStats, UserUpdate, UserUpdateResponse
+from app.api.routes.auth import duplicate_user_detail
+from app.core.auth import ACCESS_TOKEN_EXPIRE_MINUTES, build_token_claims, create_access_token, get_current_user, get_current_user_claims, remember_token_version
 
 router = APIRouter()
 
@@ -22,7 +31,49 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     }
 
 
-@router.put("/update", response_model=UserResponse)
+@router.get("/stats", response_model=UserStats)
+async def get_user_stats(current_user: dict = Depends(get_current_user_claims)):
+    """Question, answer and query counts for the current user.
+
+    Read from the counters document kept by the forum and query handlers,
+    so this is a single _id lookup.
+    """
+    doc = await user_stats_collection.find_one({"_id": current_user["id"]})
+    return to_stats_response(current_user["id"], doc)
+
+
+@router.get("/deletion-jobs", response_model=List[DeletionJob])
+async def get_deletion_jobs(current_user: dict = Depends(get_current_user_claims)):
+    """Progress of the background cleanups started by the current user's deletions"""
+    cursor = database[JOBS_COLLECTION].find({"requested_by": current_user["id"]}).sort("_id", -1).limit(20)
+    return [to_job_response(job) async for job in cursor]
+
+
+@router.get("/export")
+async def export_user_data(
+        cursor: Optional[str] = None,
+        current_user: dict = Depends(get_current_user_claims)
+):
+    """Everything stored for the current user as gzip-compressed JSON lines.
+
+    Pass the `cursor` of the last line received to continue an
+    interrupted download.
+    """
+    if cursor:
+        try:
+            decode_export_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    records = export_records(database, current_user["id"], cursor)
+    return StreamingResponse(
+        gzip_lines(records, settings.stream_batch_size),
+        media_type=GZIP_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="export-{current_user["id"]}.jsonl.gz"'}
+    )
+
+
+@router.put("/update", response_model=UserUpdateResponse)
 async def update_user(
         user_update: UserUpdate,
         current_user: dict = Depends(get_current_user)
@@ -55,23 +106,43 @@ async def update_user(
                 detail="Email already taken"
             )
 
-    # Update the user in the database
-    result = await user_collection.update_one(
-        {"_id": ObjectId(current_user["id"])},
-        {"$set": update_data}
-    )
+    # Tokens carry the username as a signed claim, so a rename revokes them
+    renamed = update_data.get("username", current_user["username"]) != current_user["username"]
+    update = {"$set": update_data}
+    if renamed:
+        update["$inc"] = {"token_version": 1}
+
+    # Update the user in the database; the unique indexes settle a race with another rename
+    try:
+        updated_user = await user_collection.find_one_and_update(
+            {"_id": ObjectId(current_user["id"])},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_user_detail(e)
+        )
 
-    if result.modified_count == 0:
+    if updated_user is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update user"
         )
 
-    # Fetch the updated user
-    updated_user = await user_collection.find_one({"_id": ObjectId(current_user["id"])})
+    token = {}
+    if renamed:
+        remember_token_version(current_user["id"], updated_user["token_version"])
+        access_token, expires_at = create_access_token(
+            data=build_token_claims(updated_user),
+            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+        token = {"access_token": access_token, "token_type": "bearer", "expires_at": expires_at}
 
     # Return the updated user information
     return {
+        **token,
         "id": str(updated_user["_id"]),
         "username": updated_user["username"],
         "email": updated_user["email"],
@@ -93,4 +164,9 @@ async def delete_user(current_user: dict = Depends(get_current_user)):
             detail="Failed to delete user"
         )
 
+    # Outstanding tokens for this account must stop working right away
+    remember_token_version(current_user["id"], None)
+    # Their questions, answers, histories, queries and counters go in the background
+    await cascade_worker.enqueue(database, "user", current_user["id"], current_user["id"])
+
     return None
\ No newline at end of file
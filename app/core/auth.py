@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -8,12 +9,23 @@ import os
 from bson import ObjectId
 
 from app.models.user import TokenData
+from app.core.token_cache import TokenCache
+from app.core.quota import DEFAULT_TIER
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-jwt-should-be-kept-secure")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# How long a worker trusts its cached copy of a user's token_version before
+# re-reading it. Revocations made on this worker apply immediately; revocations
+# made on another worker are picked up within this window.
+TOKEN_VERSION_TTL_SECONDS = int(os.getenv("TOKEN_VERSION_TTL_SECONDS", "60"))
+
+# Verified claims of recently seen tokens, shared with app.core.security.
+# Set TOKEN_CACHE_SIZE=0 to verify the signature on every request.
+token_cache = TokenCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "4096")))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -47,6 +59,60 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt, expires_at
 
 
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT and return its claims, reusing earlier verifications.
+
+    Raises JWTError for invalid or expired tokens. The returned dict is shared
+    with the cache and must not be modified.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(token, claims)
+    return claims
+
+
+def build_token_claims(user: dict) -> dict:
+    """Build the signed claims for a user document (raw or with "id")"""
+    user_id = user.get("id") or str(user["_id"])
+    return {
+        "sub": user_id,
+        "username": user["username"],
+        "ver": user.get("token_version", 0),
+        "tier": user.get("tier", DEFAULT_TIER),
+    }
+
+
+# user_id -> (token_version, cached_at); a None version marks a deleted user
+_token_versions: Dict[str, Tuple[Optional[int], float]] = {}
+
+
+def remember_token_version(user_id: str, token_version: Optional[int]):
+    """Record the current token_version of a user in this worker"""
+    _token_versions[user_id] = (token_version, time.monotonic())
+
+
+async def get_token_version(user_id: str) -> Optional[int]:
+    """Return the current token_version of a user, or None if the user is gone"""
+    from app.db.database import user_collection
+
+    cached = _token_versions.get(user_id)
+    if cached and time.monotonic() - cached[1] < TOKEN_VERSION_TTL_SECONDS:
+        return cached[0]
+
+    user = await user_collection.find_one(
+        {"_id": ObjectId(user_id)},
+        projection={"token_version": 1},
+    )
+    if user is None:
+        remember_token_version(user_id, None)
+        return None
+
+    token_version = user.get("token_version", 0)
+    remember_token_version(user_id, token_version)
+    return token_version
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Dependency to get the current user from the token"""
     from app.db.database import user_collection
@@ -58,11 +124,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-        token_data = TokenData(user_id=user_id)
+        token_data = TokenData(user_id=user_id, token_version=payload.get("ver", 0))
     except JWTError:
         raise credentials_exception
 
@@ -70,8 +136,71 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if user is None:
         raise credentials_exception
 
+    # Reject tokens issued before the last password change
+    if token_data.token_version != user.get("token_version", 0):
+        raise credentials_exception
+    remember_token_version(token_data.user_id, user.get("token_version", 0))
+
     # Convert ObjectId to string
     user["id"] = str(user["_id"])
     del user["_id"]
 
-    return user
\ No newline at end of file
+    return user
+
+
+async def get_current_user_claims(token: str = Depends(oauth2_scheme)):
+    """Lightweight dependency that trusts the signed token claims.
+
+    Returns {"id", "username", "token_version", "tier"} without loading the user
+    document. Use it on routes that don't need the full profile or
+    hashed_password; use get_current_user everywhere else.
+    """
+    return await claims_from_token(token)
+
+
+async def claims_from_token(token: str):
+    """get_current_user_claims for callers that get the token some other way
+    (WebSocket and EventSource clients can't send an Authorization header)"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    try:
+        payload = decode_access_token(token)
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise credentials_exception
+        token_data = TokenData(
+            user_id=user_id,
+            username=payload.get("username"),
+            token_version=payload.get("ver", 0),
+            tier=payload.get("tier"),
+        )
+    except JWTError:
+        raise credentials_exception
+
+    # Tokens issued before claims were added carry only "sub"
+    if token_data.username is None:
+        user = await get_current_user(token)
+        return {
+            "id": user["id"],
+            "username": user["username"],
+            "token_version": user.get("token_version", 0),
+            "tier": user.get("tier", DEFAULT_TIER),
+        }
+
+    if not ObjectId.is_valid(token_data.user_id):
+        raise credentials_exception
+
+    # Revoked by a password change or account deletion
+    if await get_token_version(token_data.user_id) != token_data.token_version:
+        raise credentials_exception
+
+    return {
+        "id": token_data.user_id,
+        "username": token_data.username,
+        "token_version": token_data.token_version,
+        "tier": token_data.tier or DEFAULT_TIER,
+    }
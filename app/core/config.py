@@ -0,0 +1,70 @@
+from typing import Dict, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings read from the environment (or a local .env file)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # MongoDB connection
+    mongo_uri: str = "mongodb://localhost:27017"
+    db_name: str = "SocialSense2"
+
+    # Connection pool, sized per worker process
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+
+    # Documents fetched per getMore when streaming NDJSON listings
+    stream_batch_size: int = 500
+
+    # In-memory forum feed (see app/core/feed_cache.py); 0 disables it
+    feed_cache_size: int = 500
+    feed_cache_ttl_seconds: float = 30
+    feed_cache_max_stale_seconds: float = 300
+
+    # Forum search index: built at startup, then rebuilt every interval
+    # to pick up writes made on other workers (0 builds it once)
+    search_rebuild_interval_seconds: float = 0
+
+    # How often each worker runs app.db.reconcile; 0 leaves it to the CLI after the one-time backfill at startup
+    reconcile_interval_seconds: float = 0
+
+    # Trending questions (see app/core/trending.py)
+    trending_half_life_hours: float = 6
+    trending_max_questions: int = 10000
+    trending_persist_interval_seconds: float = 60
+
+    # LLM quotas per user tier (see app/core/quota.py), e.g. as JSON in .env:
+    # QUOTA_TIERS='{"default": {"generations": 60}, "premium": {}}'
+    quota_window_seconds: float = 3600
+    quota_flush_interval_seconds: float = 10
+    quota_tiers: Dict[str, Dict[str, int]] = {
+        "default": {"generations": 60, "tokens": 100000},
+        "premium": {"generations": 600, "tokens": 1000000},
+        "internal": {},
+    }
+
+    # Push updates (see app/core/pubsub.py): events buffered per connection
+    # before it is told to resync, topics per connection, keepalive period
+    event_queue_size: int = 100
+    event_max_topics: int = 50
+    event_keepalive_seconds: float = 15
+
+    # Cascade deletion (see app/db/cascade.py): ids per delete_many, pause
+    # between batches, how often idle workers look for jobs, job lease
+    cascade_batch_size: int = 500
+    cascade_pause_seconds: float = 0.1
+    cascade_poll_interval_seconds: float = 30
+    cascade_lease_seconds: float = 120
+
+    # Cold storage for old queries (see app/db/archive.py)
+    archive_dir: str = "archive"
+    archive_after_days: float = 180
+    archive_segment_max_bytes: int = 256 * 1024 * 1024
+
+
+settings = Settings()
@@ -0,0 +1,14 @@
+"""Reading the creation dates stored by older and newer code alike"""
+from datetime import datetime
+from typing import Optional
+
+
+def as_datetime(value) -> Optional[datetime]:
+    """Read a stored date (BSON date or ISO string) with BSON's millisecond precision"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
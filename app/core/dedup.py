@@ -0,0 +1,250 @@
+"""Near-duplicate detection for forum questions with MinHash + LSH.
+
+Each question is reduced to a 64-value MinHash signature over its word
+unigrams and bigrams. The signature uses one-permutation hashing: each
+shingle is hashed once, the low bits pick one of 64 bins and each bin
+keeps its smallest value. An empty bin borrows from the first filled bin
+in its own fixed random order of the others, so the rows of one band
+rarely copy the same bin. A signature costs one hash per shingle, not 64
+(see benchmarks/bench_dedup.py). Signatures are split into 16 bands of 4 rows; two
+questions become candidates when any band matches, which catches pairs
+with a Jaccard similarity of roughly 0.5 and above. Candidates are then
+ranked by the share of matching signature values.
+
+The index lives in memory, is built at startup and is updated by
+create_question/delete_question. To list duplicate clusters already in
+the database:
+
+    python -m app.core.dedup [--threshold 0.6]
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import random
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.search import question_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+# Low bits of a shingle hash pick its bin; NUM_PERMUTATIONS is a power of two
+_BIN_BITS = NUM_PERMUTATIONS.bit_length() - 1
+_BIN_MASK = NUM_PERMUTATIONS - 1
+# For each bin, the other bins in the order it borrows from them when empty
+_rng = random.Random(1234)
+_BORROW_ORDER = [
+    _rng.sample([other for other in range(NUM_PERMUTATIONS) if other != slot], NUM_PERMUTATIONS - 1)
+    for slot in range(NUM_PERMUTATIONS)
+]
+
+DEFAULT_THRESHOLD = 0.5
+
+# Questions signed between yields to the event loop during a rebuild (about 20 ms)
+_YIELD_EVERY = 100
+
+
+_MASK64 = (1 << 64) - 1
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+def _pair_hash(first: int, second: int) -> int:
+    """A bigram's hash from its words' hashes (splitmix64 finalizer)"""
+    z = (first * 0x9E3779B97F4A7C15 + second) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+def shingles(text: str) -> Set[int]:
+    """Hashed word unigrams and bigrams of a text"""
+    hashes = [_token_hash(token) for token in tokenize(text)]
+    hashed = set(hashes)
+    hashed.update(_pair_hash(a, b) for a, b in zip(hashes, hashes[1:]))
+    return hashed
+
+
+def signature(text: str) -> Optional[Tuple[int, ...]]:
+    hashed = shingles(text)
+    if not hashed:
+        return None
+    bins: List[Optional[int]] = [None] * NUM_PERMUTATIONS
+    for value in hashed:
+        slot, rank = value & _BIN_MASK, value >> _BIN_BITS
+        if bins[slot] is None or rank < bins[slot]:
+            bins[slot] = rank
+
+    # Densify: an empty bin copies the first filled bin in its borrow order
+    sig = list(bins)
+    for slot, value in enumerate(bins):
+        if value is None:
+            sig[slot] = next(bins[other] for other in _BORROW_ORDER[slot] if bins[other] is not None)
+    return tuple(sig)
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERMUTATIONS
+
+
+class DuplicateIndex:
+    """LSH index from question_id to MinHash signature"""
+
+    def __init__(self):
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._headers: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = defaultdict(set)
+        self.ready = False
+        # Writes seen while a rebuild is running, replayed onto the new index
+        self._pending: Optional[List[Tuple[str, dict]]] = None
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @staticmethod
+    def _bands(sig: Tuple[int, ...]):
+        for band in range(BANDS):
+            yield band, sig[band * ROWS:(band + 1) * ROWS]
+
+    def add(self, doc: dict):
+        if self._pending is not None:
+            self._pending.append(("add", doc))
+        question_id = doc["question_id"]
+        self._discard(question_id)
+        sig = signature(question_text(doc))
+        if sig is None:
+            return
+        self._signatures[question_id] = sig
+        self._headers[question_id] = doc.get("question_header", "")
+        for bucket in self._bands(sig):
+            self._buckets[bucket].add(question_id)
+
+    def remove(self, question_id: str):
+        if self._pending is not None:
+            self._pending.append(("remove", {"question_id": question_id}))
+        self._discard(question_id)
+
+    def _discard(self, question_id: str):
+        sig = self._signatures.pop(question_id, None)
+        if sig is None:
+            return
+        self._headers.pop(question_id, None)
+        for bucket in self._bands(sig):
+            members = self._buckets.get(bucket)
+            if members is not None:
+                members.discard(question_id)
+                if not members:
+                    del self._buckets[bucket]
+
+    def _candidates(self, sig: Tuple[int, ...], exclude: Optional[str], threshold: float, limit: int):
+        candidates = set()
+        for bucket in self._bands(sig):
+            candidates.update(self._buckets.get(bucket, ()))
+        candidates.discard(exclude)
+
+        scored = [(similarity(sig, self._signatures[qid]), qid) for qid in candidates]
+        scored = [(score, qid) for score, qid in scored if score >= threshold]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            {"question_id": qid, "question_header": self._headers[qid], "similarity": score}
+            for score, qid in scored[:limit]
+        ]
+
+    def find_similar(self, text: str, exclude: Optional[str] = None,
+                     threshold: float = DEFAULT_THRESHOLD, limit: int = 5) -> List[dict]:
+        """Likely duplicates of a text, most similar first"""
+        sig = signature(text)
+        if sig is None:
+            return []
+        return self._candidates(sig, exclude, threshold, limit)
+
+    def find_similar_to(self, question_id: str, threshold: float = DEFAULT_THRESHOLD, limit: int = 5) -> List[dict]:
+        """Likely duplicates of an indexed question"""
+        sig = self._signatures.get(question_id)
+        if sig is None:
+            return []
+        return self._candidates(sig, question_id, threshold, limit)
+
+    def clusters(self, threshold: float = DEFAULT_THRESHOLD):
+        """Yield (question_id, header, duplicates) for each group of near-duplicates"""
+        seen = set()
+        for question_id in sorted(self._signatures):
+            if question_id in seen:
+                continue
+            similar = self.find_similar_to(question_id, threshold, limit=50)
+            if similar:
+                seen.add(question_id)
+                seen.update(hit["question_id"] for hit in similar)
+                yield question_id, self._headers[question_id], similar
+
+    async def rebuild(self, database, batch_size: int = 1000):
+        """Build a fresh index from every stored question and swap it in"""
+        if self._pending is not None:
+            return
+        self._pending = []
+        try:
+            fresh = DuplicateIndex()
+            cursor = database["forum-question"].find(
+                {}, {"_id": 0, "question_id": 1, "question_header": 1, "question": 1}
+            ).batch_size(batch_size)
+            async for doc in cursor:
+                fresh.add(doc)
+                if len(fresh) % _YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+
+            for op, doc in self._pending:
+                if op == "add":
+                    fresh.add(doc)
+                else:
+                    fresh.remove(doc["question_id"])
+
+            self._signatures = fresh._signatures
+            self._headers = fresh._headers
+            self._buckets = fresh._buckets
+            self.ready = True
+            logger.info("Duplicate index built with %d questions", len(self))
+        finally:
+            self._pending = None
+
+
+duplicate_index = DuplicateIndex()
+
+
+async def build_duplicate_index(database):
+    """Startup task used by the app lifespan"""
+    try:
+        await duplicate_index.rebuild(database)
+    except Exception as e:
+        logger.error("Duplicate index build failed: %s", e)
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report near-duplicate forum questions")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+
+    await duplicate_index.rebuild(database)
+    clusters = 0
+    for question_id, header, similar in duplicate_index.clusters(args.threshold):
+        clusters += 1
+        print(f"{question_id}: {header!r}")
+        for hit in similar:
+            print(f"    {hit['similarity']:.2f} {hit['question_id']}: {hit['question_header']!r}")
+    print(f"{clusters} duplicate clusters among {len(duplicate_index)} questions")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
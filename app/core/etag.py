@@ -0,0 +1,51 @@
+"""Strong ETags and If-None-Match handling for read endpoints.
+
+The tag is a hash of the stored documents as read from MongoDB, taken
+before usernames are resolved and the response model is built, so a
+matching request is answered with an empty 304 and skips that work.
+Author usernames are not part of the tag: a renamed author shows up once
+the resource itself changes.
+"""
+import hashlib
+from typing import Iterable, Optional
+
+import bson
+from fastapi import Request, Response
+
+ETAG_HEADER = "ETag"
+
+# Let clients keep a copy but revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+# Stored fields that change without changing the API representation
+VOLATILE_FIELDS = frozenset({"trending_score"})
+
+
+def compute_etag(docs: Iterable[dict], *extra: Optional[str]) -> str:
+    """Strong ETag over stored documents plus any extra strings (e.g. the next cursor)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for doc in docs:
+        digest.update(bson.encode({k: v for k, v in doc.items() if k not in VOLATILE_FIELDS}))
+    for value in extra:
+        digest.update(b"\0" + (value or "").encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set the ETag on the response; return a 304 to send instead if the client's copy is current"""
+    headers = {ETAG_HEADER: etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
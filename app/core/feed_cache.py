@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Loads up to `n` rendered feed documents, newest first, each still carrying its _id
+FeedLoader = Callable[[int], Awaitable[List[dict]]]
+
+
+class FeedCache:
+    """In-memory copy of the newest rendered documents of a feed.
+
+    Pages that fall inside the cached window are served from memory. Writers
+    call add()/remove() so the window stays current without a reload. Each
+    worker keeps its own copy, so writes made on other workers show up after
+    at most `ttl` seconds: once the copy is older than `ttl` it is still served
+    while a background reload runs (stale-while-revalidate), and once it is
+    older than `max_stale` the request waits for the reload. Concurrent
+    requests share one reload.
+    """
+
+    def __init__(self, max_items: int = 500, ttl: float = 30, max_stale: float = 300):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: List[Tuple[ObjectId, dict]] = []
+        # True when the window holds every document in the feed
+        self._exhausted = False
+        self._loaded_at: Optional[float] = None
+        self._version = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh(self, loader: FeedLoader):
+        version = self._version
+        docs = await loader(self.max_items + 1)
+        entries = [(doc.pop("_id"), doc) for doc in docs]
+
+        self._exhausted = len(entries) <= self.max_items
+        self._entries = entries[:self.max_items]
+        now = time.monotonic()
+        # A write that raced with the load may be missing: serve it as stale,
+        # so the next request revalidates in the background instead of waiting
+        self._loaded_at = now if version == self._version else now - self.ttl
+
+    def _shared_refresh(self, loader: FeedLoader) -> asyncio.Task:
+        """The reload in flight, or a new one"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return self._refresh_task
+
+        def done(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is not None:
+                logger.error("Feed cache refresh failed: %s", task.exception())
+
+        self._refresh_task = asyncio.create_task(self.refresh(loader))
+        self._refresh_task.add_done_callback(done)
+        return self._refresh_task
+
+    async def get_page(self, limit: int, cursor: Optional[str], loader: FeedLoader) -> Optional[Tuple[List[dict], Optional[str]]]:
+        """Return (docs, next_cursor) from memory, or None if the page isn't cached"""
+        if self.max_items <= 0:
+            return None
+
+        age = None if self._loaded_at is None else time.monotonic() - self._loaded_at
+        if age is None or age > self.max_stale:
+            # Shielded: a cancelled request doesn't cancel the reload others wait on
+            await asyncio.shield(self._shared_refresh(loader))
+        elif age > self.ttl:
+            self._shared_refresh(loader)
+
+        start = 0
+        if cursor:
+            after = decode_cursor(cursor)
+            positions = [i for i, (oid, _) in enumerate(self._entries) if oid == after]
+            if not positions:
+                return None
+            start = positions[0] + 1
+
+        window = self._entries[start:start + limit]
+        has_more = start + limit < len(self._entries) or not self._exhausted
+        if len(window) < limit and not self._exhausted:
+            # The page runs past the cached window
+            return None
+
+        next_cursor = encode_cursor(window[-1][0]) if window and has_more else None
+        return [dict(doc) for _, doc in window], next_cursor
+
+    def add(self, oid: ObjectId, doc: dict):
+        """Insert a newly created document at the head of the window"""
+        self._version += 1
+        if self._loaded_at is None:
+            return
+        self._entries.insert(0, (oid, dict(doc)))
+        if len(self._entries) > self.max_items:
+            del self._entries[self.max_items:]
+            self._exhausted = False
+
+    def update(self, key: str, value, changes: dict):
+        """Apply field changes to the cached document whose `key` equals `value`"""
+        self._version += 1
+        for _, doc in self._entries:
+            if doc.get(key) == value:
+                doc.update(changes)
+                return
+
+    def remove(self, key: str, value):
+        """Drop the cached document whose `key` equals `value`"""
+        self._version += 1
+        self._entries = [(oid, doc) for oid, doc in self._entries if doc.get(key) != value]
+
+    def clear(self):
+        self._version += 1
+        self._entries = []
+        self._exhausted = False
+        self._loaded_at = None
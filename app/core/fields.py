@@ -0,0 +1,64 @@
+"""Sparse fieldsets: `?fields=query_id,creation_date` on read endpoints.
+
+The requested fields become a MongoDB projection, so large unrequested
+fields (a query's response, a question's body) are neither read from
+Atlas nor sent to the client. The response is built from a copy of the
+route's response model holding only those fields; `id` is always
+included. Routes add to the projection whatever they need themselves,
+such as user_id for ownership checks or the field a cursor sorts on.
+"""
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, Optional, Type
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. query_id,creation_date (default: all)"
+
+# Always returned; it is the stored _id, which every projection keeps
+ID_FIELD = "id"
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[FrozenSet[str]]:
+    """The requested field names, or None for the full representation"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return frozenset(requested | {ID_FIELD})
+
+
+def wants_field(fields: Optional[FrozenSet[str]], name: str) -> bool:
+    return fields is None or name in fields
+
+
+def fields_projection(fields: Optional[FrozenSet[str]], required: Iterable[str] = ()) -> Optional[dict]:
+    """MongoDB projection for the requested fields plus the stored fields the route needs"""
+    if fields is None:
+        return None
+    return {name: 1 for name in (fields - {ID_FIELD}) | set(required)}
+
+
+@lru_cache(maxsize=256)
+def sparse_model(model: Type[BaseModel], fields: FrozenSet[str]) -> Type[BaseModel]:
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (info.annotation, info) for name, info in model.model_fields.items() if name in fields}
+    )
+
+
+def sparse_dump(model: Type[BaseModel], fields: FrozenSet[str]) -> Callable[[dict], dict]:
+    """Shape one response document with only the requested fields"""
+    trimmed = sparse_model(model, fields)
+    return lambda doc: trimmed.model_validate(doc).model_dump()
+
+
+def sparse_response(model: Type[BaseModel], docs, fields: FrozenSet[str], response: Response) -> JSONResponse:
+    """A JSON response of one document or a list, keeping headers set on `response`"""
+    dump = sparse_dump(model, fields)
+    content = [dump(doc) for doc in docs] if isinstance(docs, list) else dump(docs)
+    return JSONResponse(jsonable_encoder(content), headers=dict(response.headers))
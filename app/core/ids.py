@@ -0,0 +1,13 @@
+"""Ids generated for questions, answers, queries and histories"""
+import secrets
+import time
+
+
+def generate_id(prefix: str, user_id: str) -> str:
+    """`<prefix>_<user_id>_<unix seconds>_<random hex>`.
+
+    The ids keep their old readable prefix, but the random suffix keeps
+    several documents created by one user in the same second from
+    colliding on the unique id indexes.
+    """
+    return f"{prefix}_{user_id}_{int(time.time())}_{secrets.token_hex(4)}"
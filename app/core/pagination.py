@@ -0,0 +1,123 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from bson.errors import BSONError, InvalidId
+from fastapi import HTTPException, Response
+from pymongo import DESCENDING
+
+from app.core.dates import as_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 200
+
+# List endpoints keep returning a JSON array; the cursor for the next page
+# travels in this header and is absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(oid: ObjectId) -> str:
+    """Turn the _id of the last returned document into an opaque cursor"""
+    return base64.urlsafe_b64encode(oid.binary).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return ObjectId(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_sort_cursor(sort_value, oid: ObjectId) -> str:
+    """Cursor for pages ordered by (sort_value, _id)"""
+    return base64.urlsafe_b64encode(bson.encode({"v": sort_value, "id": oid})).decode().rstrip("=")
+
+
+def decode_sort_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = bson.decode(base64.urlsafe_b64decode(padded))
+        return decoded["v"], decoded["id"]
+    except (binascii.Error, BSONError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def sort_spec(direction: int = DESCENDING, sort_field: Optional[str] = None) -> List[Tuple[str, int]]:
+    """Sort order matching keyset_filter; _id breaks ties"""
+    if sort_field:
+        return [(sort_field, direction), ("_id", direction)]
+    return [("_id", direction)]
+
+
+def keyset_filter(query: dict, cursor: Optional[str], direction: int = DESCENDING, sort_field: Optional[str] = None) -> dict:
+    """Restrict a filter to the documents after the cursor in sort_spec order"""
+    if not cursor:
+        return dict(query)
+
+    op = "$lt" if direction == DESCENDING else "$gt"
+    if not sort_field:
+        page_query = dict(query)
+        page_query["_id"] = {op: decode_cursor(cursor)}
+        return page_query
+
+    sort_value, oid = decode_sort_cursor(cursor)
+    after = {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "_id": {op: oid}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+async def paginate(
+        collection,
+        query: dict,
+        limit: int,
+        cursor: Optional[str] = None,
+        direction: int = DESCENDING,
+        sort_field: Optional[str] = None,
+        projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one keyset page and return (docs, next_cursor).
+
+    Pages are ordered by _id, or by (sort_field, _id) when sort_field is
+    given. Backed by a compound index on the filter key and the sort keys,
+    each page is a bounded index range scan no matter how deep the client
+    has paged. A projection always keeps the sort field the cursor needs.
+    """
+    page_query = keyset_filter(query, cursor, direction, sort_field)
+    if projection is not None and sort_field:
+        projection = {**projection, sort_field: 1}
+    docs = await collection.find(page_query, projection).sort(sort_spec(direction, sort_field)).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        if sort_field:
+            next_cursor = encode_sort_cursor(last.get(sort_field), last["_id"])
+        else:
+            next_cursor = encode_cursor(last["_id"])
+    return docs, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+
+def created_between(query: dict, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    field: str = "creation_date") -> dict:
+    """Add a [since, until) range on a BSON date field to a list query"""
+    bounds = {}
+    if since is not None:
+        bounds["$gte"] = as_datetime(since)
+    if until is not None:
+        bounds["$lt"] = as_datetime(until)
+    if not bounds:
+        return query
+    return {**query, field: bounds}
@@ -0,0 +1,123 @@
+"""In-process publish/subscribe for pushing forum and query updates.
+
+Route handlers publish small delta events to topics:
+
+    forum                    question_created / question_deleted
+    question:<question_id>   answer_created / answer_deleted / question_deleted
+    queries:<user_id>        query_completed / query_updated / query_deleted
+
+Each connection owns one Subscriber with a bounded queue. publish() never
+blocks: when a slow client's queue is full its backlog is dropped and
+replaced with a single "resync" event, telling the client to re-fetch the
+listing once instead of letting memory grow.
+
+Events only reach clients connected to the worker that handled the write,
+so multi-worker deployments need sticky connections or an external broker.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+def forum_topic() -> str:
+    return "forum"
+
+
+def question_topic(question_id: str) -> str:
+    return f"question:{question_id}"
+
+
+def queries_topic(user_id: str) -> str:
+    return f"queries:{user_id}"
+
+
+class Subscriber:
+    """One connection's subscriptions and pending events"""
+
+    def __init__(self, broker: "PubSub", max_queue: int, max_topics: int):
+        self._broker = broker
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.max_topics = max_topics
+        self.topics: Set[str] = set()
+        self.dropped = 0
+
+    def subscribe(self, topic: str) -> bool:
+        """Subscribe to a topic; False when the per-connection limit is reached"""
+        if topic in self.topics:
+            return True
+        if len(self.topics) >= self.max_topics:
+            return False
+        self.topics.add(topic)
+        self._broker._subscribers[topic].add(self)
+        return True
+
+    def unsubscribe(self, topic: str):
+        self.topics.discard(topic)
+        members = self._broker._subscribers.get(topic)
+        if members is not None:
+            members.discard(self)
+            if not members:
+                del self._broker._subscribers[topic]
+
+    def close(self):
+        for topic in list(self.topics):
+            self.unsubscribe(topic)
+
+    def deliver(self, topic: str, event: dict):
+        self.notify({"topic": topic, **event})
+
+    def notify(self, event: dict):
+        """Queue an event for this connection only, without blocking"""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Replace the backlog with a single resync marker
+            self.dropped += self._queue.qsize()
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, or None if nothing arrives within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PubSub:
+    """Topic -> subscribers fan-out within one worker"""
+
+    def __init__(self, max_queue: int = 100, max_topics: int = 50):
+        self.max_queue = max_queue
+        self.max_topics = max_topics
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+
+    def subscriber(self) -> Subscriber:
+        return Subscriber(self, self.max_queue, self.max_topics)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+    def publish(self, topic: str, event: dict) -> int:
+        """Fan an event out to the topic's subscribers; returns how many got it"""
+        members = self._subscribers.get(topic)
+        if not members:
+            return 0
+        for subscriber in list(members):
+            subscriber.deliver(topic, event)
+        return len(members)
+
+    def publish_many(self, topics: Iterable[str], event: dict):
+        for topic in topics:
+            self.publish(topic, event)
+
+
+pubsub = PubSub(max_queue=settings.event_queue_size, max_topics=settings.event_max_topics)
@@ -0,0 +1,180 @@
+"""Per-user LLM quotas over a rolling window.
+
+Each user's tier (a token claim) maps to limits on generations and model
+tokens per QUOTA_WINDOW_SECONDS (see Settings.quota_tiers; a missing limit
+means unlimited). The window slides: usage is counted in fixed windows and
+the previous window is weighted by how much of it still overlaps, so each
+user needs only two counters.
+
+Counters live in memory so create_query can refuse an over-quota user
+before any database or model call. Every QUOTA_FLUSH_INTERVAL_SECONDS the
+increments are written to the llm-usage collection with one bulk $inc.
+The totals read back there include usage on other workers, so workers
+agree on a user's usage within one flush interval.
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+USAGE_COLLECTION = "llm-usage"
+
+DEFAULT_TIER = "default"
+
+METRICS = ("generations", "tokens")
+
+
+class _Window:
+    """Usage of one user in one fixed window"""
+
+    __slots__ = ("flushed", "pending")
+
+    def __init__(self):
+        # Totals as of the last flush (all workers), and increments since
+        self.flushed = {metric: 0 for metric in METRICS}
+        self.pending = {metric: 0 for metric in METRICS}
+
+    def total(self, metric: str) -> int:
+        return self.flushed[metric] + self.pending[metric]
+
+
+class QuotaTracker:
+    def __init__(self, window_seconds: float, tiers: Dict[str, Dict[str, int]]):
+        self.window = window_seconds
+        self.tiers = tiers
+        self._windows: Dict[Tuple[str, int], _Window] = {}
+
+    def limits(self, tier: Optional[str]) -> Dict[str, int]:
+        return self.tiers.get(tier or DEFAULT_TIER, self.tiers.get(DEFAULT_TIER, {}))
+
+    def _window_start(self, now: float) -> int:
+        return int(now // self.window * self.window)
+
+    def _get(self, user_id: str, start: int) -> _Window:
+        key = (user_id, start)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window()
+        return window
+
+    def usage(self, user_id: str, now: Optional[float] = None) -> Dict[str, float]:
+        """Estimated usage over the last window_seconds"""
+        now = time.time() if now is None else now
+        start = self._window_start(now)
+        current = self._windows.get((user_id, start))
+        previous = self._windows.get((user_id, int(start - self.window)))
+        overlap = 1 - (now - start) / self.window
+        return {
+            metric: (current.total(metric) if current else 0)
+                    + (previous.total(metric) * overlap if previous else 0)
+            for metric in METRICS
+        }
+
+    def retry_after(self, user_id: str, tier: Optional[str], now: Optional[float] = None) -> Optional[int]:
+        """None if the user is under quota, otherwise seconds until they should be again"""
+        now = time.time() if now is None else now
+        limits = self.limits(tier)
+        usage = self.usage(user_id, now)
+        start = self._window_start(now)
+        waits = []
+        for metric, limit in limits.items():
+            if limit is None or usage.get(metric, 0) < limit:
+                continue
+            current = self._windows.get((user_id, start))
+            previous = self._windows.get((user_id, int(start - self.window)))
+            current_total = current.total(metric) if current else 0
+            previous_total = previous.total(metric) if previous else 0
+            if current_total >= limit or previous_total == 0:
+                # Only the next window brings usage back under the limit
+                waits.append(start + self.window - now)
+            else:
+                # Wait for the previous window's weight to decay enough
+                overlap_needed = (limit - current_total) / previous_total
+                waits.append(start + self.window * (1 - overlap_needed) - now)
+        if not waits:
+            return None
+        return max(1, math.ceil(max(waits)))
+
+    def acquire(self, user_id: str, tier: Optional[str], now: Optional[float] = None) -> Optional[int]:
+        """Charge one generation unless over quota; returns retry_after when refused"""
+        now = time.time() if now is None else now
+        wait = self.retry_after(user_id, tier, now)
+        if wait is None:
+            self._get(user_id, self._window_start(now)).pending["generations"] += 1
+        return wait
+
+    def release(self, user_id: str, now: Optional[float] = None):
+        """Give back a generation whose model call failed"""
+        now = time.time() if now is None else now
+        window = self._windows.get((user_id, self._window_start(now)))
+        if window is not None:
+            window.pending["generations"] -= 1
+
+    def record_tokens(self, user_id: str, tokens: int, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._get(user_id, self._window_start(now)).pending["tokens"] += tokens
+
+    async def flush(self, database, now: Optional[float] = None) -> int:
+        """Persist pending increments and pick up other workers' usage"""
+        now = time.time() if now is None else now
+        oldest = self._window_start(now) - self.window
+        for key in [key for key in self._windows if key[1] < oldest]:
+            del self._windows[key]
+
+        snapshot: List[Tuple[Tuple[str, int], Dict[str, int]]] = [
+            (key, dict(window.pending)) for key, window in self._windows.items()
+            if any(window.pending.values())
+        ]
+        if not snapshot:
+            return 0
+
+        collection = database[USAGE_COLLECTION]
+        operations = []
+        for (user_id, start), pending in snapshot:
+            operations.append(UpdateOne(
+                {"_id": f"{user_id}:{start}"},
+                {
+                    "$inc": pending,
+                    "$setOnInsert": {
+                        "user_id": user_id,
+                        "window_start": datetime.utcfromtimestamp(start),
+                        # TTL index removes windows once they can't count any more
+                        "expires_at": datetime.utcfromtimestamp(start + 2 * self.window),
+                    },
+                },
+                upsert=True
+            ))
+        await collection.bulk_write(operations, ordered=False)
+
+        totals = {}
+        async for doc in collection.find({"_id": {"$in": [f"{u}:{s}" for (u, s), _ in snapshot]}}):
+            totals[doc["_id"]] = doc
+        for (user_id, start), pending in snapshot:
+            window = self._get(user_id, start)
+            doc = totals.get(f"{user_id}:{start}", {})
+            for metric in METRICS:
+                # Increments made while the write was in flight stay pending
+                window.pending[metric] -= pending[metric]
+                window.flushed[metric] = doc.get(metric, window.flushed[metric] + pending[metric])
+        return len(operations)
+
+
+quota_tracker = QuotaTracker(settings.quota_window_seconds, settings.quota_tiers)
+
+
+async def flush_quota_forever(database, interval: float):
+    """Background task used by the app lifespan"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await quota_tracker.flush(database)
+        except Exception as e:
+            logger.error("Flushing LLM usage failed: %s", e)
@@ -0,0 +1,307 @@
+"""In-process BM25 search over forum questions and answers.
+
+Each worker holds an inverted index built from MongoDB at startup and kept
+current by the forum create/delete handlers. Postings are stored in compact
+arrays (about 6 bytes each) so a million posts fit comfortably in memory;
+deletions are tombstoned and compacted once they pile up.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Words too common in forum posts to carry any ranking signal
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from have how i if in is it me my
+of on or so that the this to was what when where which who why with you your
+""".split())
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Compact the postings when this share of indexed documents is deleted
+COMPACT_RATIO = 0.25
+
+# Terms found in more than this share of documents only rescore candidates,
+# unless their upper bound says a document matching only them could rank
+COMMON_TERM_RATIO = 0.05
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class SearchIndex:
+    """BM25 inverted index keyed by opaque document keys"""
+
+    def __init__(self):
+        # term -> (doc numbers, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._keys: List[Optional[str]] = []
+        self._numbers: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        self._deleted: Set[int] = set()
+        # Upper-bound inputs: highest term frequency per term, shortest indexed document
+        self._max_frequency: Dict[str, int] = {}
+        self._min_length: Optional[int] = None
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def add(self, key: str, text: str):
+        if key in self._numbers:
+            self.remove(key)
+
+        tokens = tokenize(text)
+        number = len(self._keys)
+        self._keys.append(key)
+        self._numbers[key] = number
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        if tokens and (self._min_length is None or len(tokens) < self._min_length):
+            self._min_length = len(tokens)
+
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, frequency in frequencies.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = (array("I"), array("H"))
+            postings[0].append(number)
+            postings[1].append(min(frequency, 65535))
+            if frequency > self._max_frequency.get(token, 0):
+                self._max_frequency[token] = min(frequency, 65535)
+
+    def remove(self, key: str):
+        number = self._numbers.pop(key, None)
+        if number is None:
+            return
+        self._deleted.add(number)
+        self._total_length -= self._lengths[number]
+        self._keys[number] = None
+        if len(self._deleted) > COMPACT_RATIO * len(self._keys):
+            self.compact()
+
+    def compact(self):
+        """Rebuild the postings without tombstoned documents"""
+        remap = array("I", [0]) * len(self._keys)
+        keys, lengths = [], array("I")
+        for number, key in enumerate(self._keys):
+            if key is not None:
+                remap[number] = len(keys)
+                keys.append(key)
+                lengths.append(self._lengths[number])
+
+        postings = {}
+        for token, (numbers, frequencies) in self._postings.items():
+            new_numbers, new_frequencies = array("I"), array("H")
+            for number, frequency in zip(numbers, frequencies):
+                if number not in self._deleted:
+                    new_numbers.append(remap[number])
+                    new_frequencies.append(frequency)
+            if new_numbers:
+                postings[token] = (new_numbers, new_frequencies)
+
+        # Bounds only ever loosen between compactions; tighten them again
+        self._max_frequency = {token: max(frequencies) for token, (_, frequencies) in postings.items()}
+        self._min_length = min((length for length in lengths if length), default=None)
+        self._postings = postings
+        self._keys = keys
+        self._numbers = {key: number for number, key in enumerate(keys)}
+        self._lengths = lengths
+        self._deleted = set()
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, str]] = None) -> List[Tuple[str, float]]:
+        """Return up to `limit` (key, score) pairs, best first.
+
+        `after` is the (score, key) of the last hit of the previous page;
+        ties are broken by key so paging is stable while the index is unchanged.
+        """
+        live_documents = len(self._numbers)
+        if not live_documents:
+            return []
+        average_length = self._total_length / live_documents or 1.0
+
+        terms = []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                terms.append((term, postings))
+        if not terms:
+            return []
+        terms.sort(key=lambda term: len(term[1][0]))
+
+        lengths = self._lengths
+
+        def idf(document_frequency):
+            return math.log(1 + (live_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        def contribution(document_frequency, number, frequency):
+            norm = K1 * (1 - B + B * lengths[number] / average_length)
+            return idf(document_frequency) * frequency * (K1 + 1) / (frequency + norm)
+
+        def upper_bound(term, numbers):
+            # The highest frequency in the shortest document bounds every posting
+            frequency = self._max_frequency.get(term, 1)
+            norm = K1 * (1 - B + B * (self._min_length or 0) / average_length)
+            return idf(len(numbers)) * frequency * (K1 + 1) / (frequency + norm)
+
+        def eligible(scored):
+            hits = ((score, self._keys[number]) for number, score in scored if number not in self._deleted)
+            if after is None:
+                return hits
+            after_score, after_key = after
+            return (
+                (score, key) for score, key in hits
+                if score < after_score or (score == after_score and key > after_key)
+            )
+
+        def top(scores):
+            return heapq.nsmallest(limit, eligible(scores.items()), key=lambda hit: (-hit[0], hit[1]))
+
+        # MaxScore with two groups: the matches of the rarer terms are the
+        # candidates and the very common terms are only looked up for them.
+        # A document matching nothing but common terms scores below the sum
+        # of their upper bounds; it is scored too unless the candidates
+        # already fill the page above that sum.
+        common_df = COMMON_TERM_RATIO * live_documents
+        rare_count = sum(1 for _, (numbers, _) in terms if len(numbers) <= common_df) or len(terms)
+        rare, common = terms[:rare_count], terms[rare_count:]
+
+        scores: Dict[int, float] = {}
+        for _, (numbers, frequencies) in rare:
+            document_frequency = len(numbers)
+            for number, frequency in zip(numbers, frequencies):
+                scores[number] = scores.get(number, 0.0) + contribution(document_frequency, number, frequency)
+
+        for _, (numbers, frequencies) in common:
+            document_frequency = len(numbers)
+            for number in scores:
+                # Postings are appended in document order, so they stay sorted
+                position = bisect_left(numbers, number)
+                if position < len(numbers) and numbers[position] == number:
+                    scores[number] += contribution(document_frequency, number, frequencies[position])
+
+        best = top(scores)
+        if common:
+            common_bound = sum(upper_bound(term, numbers) for term, (numbers, _) in common)
+            if len(best) < limit or best[-1][0] < common_bound:
+                common_only: Dict[int, float] = {}
+                for _, (numbers, frequencies) in common:
+                    document_frequency = len(numbers)
+                    for number, frequency in zip(numbers, frequencies):
+                        if number not in scores:
+                            common_only[number] = common_only.get(number, 0.0) + contribution(
+                                document_frequency, number, frequency)
+                scores.update(common_only)
+                best = top(scores)
+
+        return [(key, score) for score, key in best]
+
+
+def question_key(question_id: str) -> str:
+    return f"q:{question_id}"
+
+
+def answer_key(answer_id: str) -> str:
+    return f"a:{answer_id}"
+
+
+def question_text(doc: dict) -> str:
+    return f"{doc.get('question_header', '')} {doc.get('question', '')}"
+
+
+class ForumSearch:
+    """The forum's search index plus the bookkeeping to rebuild it live"""
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self.ready = False
+        # Writes seen while a rebuild is running, replayed onto the new index
+        self._pending: Optional[List[Tuple[str, str, Optional[str]]]] = None
+
+    def _apply(self, index: SearchIndex, op: str, key: str, text: Optional[str]):
+        if op == "add":
+            index.add(key, text)
+        else:
+            index.remove(key)
+
+    def _write(self, op: str, key: str, text: Optional[str] = None):
+        self._apply(self.index, op, key, text)
+        if self._pending is not None:
+            self._pending.append((op, key, text))
+
+    def add_question(self, doc: dict):
+        self._write("add", question_key(doc["question_id"]), question_text(doc))
+
+    def add_answer(self, doc: dict):
+        self._write("add", answer_key(doc["answer_id"]), doc.get("answer", ""))
+
+    def remove_question(self, question_id: str):
+        self._write("remove", question_key(question_id))
+
+    def remove_answer(self, answer_id: str):
+        self._write("remove", answer_key(answer_id))
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, str]] = None):
+        return self.index.search(query, limit, after)
+
+    async def rebuild(self, database, batch_size: int = 1000):
+        """Build a fresh index from MongoDB and swap it in"""
+        if self._pending is not None:
+            return
+        self._pending = []
+        try:
+            index = SearchIndex()
+            cursor = database["forum-question"].find(
+                {}, {"_id": 0, "question_id": 1, "question_header": 1, "question": 1}
+            ).batch_size(batch_size)
+            async for doc in cursor:
+                index.add(question_key(doc["question_id"]), question_text(doc))
+                if len(index) % batch_size == 0:
+                    await asyncio.sleep(0)
+
+            cursor = database["forum-answer"].find(
+                {}, {"_id": 0, "answer_id": 1, "answer": 1}
+            ).batch_size(batch_size)
+            async for doc in cursor:
+                index.add(answer_key(doc["answer_id"]), doc.get("answer", ""))
+                if len(index) % batch_size == 0:
+                    await asyncio.sleep(0)
+
+            for op, key, text in self._pending:
+                self._apply(index, op, key, text)
+            self.index = index
+            self.ready = True
+            logger.info("Forum search index built with %d documents", len(index))
+        finally:
+            self._pending = None
+
+
+forum_search = ForumSearch()
+
+
+async def rebuild_forever(database, interval: float):
+    """Background task used by the app lifespan"""
+    while True:
+        try:
+            await forum_search.rebuild(database)
+        except Exception as e:
+            logger.error("Forum search index rebuild failed: %s", e)
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
@@ -1,10 +1,10 @@
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+from jose import JWTError
 import os
 from datetime import datetime
 
-from app.core.auth import SECRET_KEY, ALGORITHM
+from app.core.auth import decode_access_token
 
 
 class JWTBearer(HTTPBearer):
@@ -37,11 +37,7 @@ class JWTBearer(HTTPBearer):
         is_token_valid = False
 
         try:
-            payload = jwt.decode(
-                jwt_token,
-                SECRET_KEY,
-                algorithms=[ALGORITHM]
-            )
+            payload = decode_access_token(jwt_token)
 
             # Check if token is expired
             if 'exp' in payload:
@@ -59,7 +55,7 @@ class JWTBearer(HTTPBearer):
 def validate_token(token: str):
     """Validate token and return payload if valid"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         return payload
     except JWTError:
         return None
\ No newline at end of file
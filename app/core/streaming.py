@@ -0,0 +1,47 @@
+import inspect
+import json
+from datetime import datetime
+from typing import Callable, Optional
+
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    """True if the client asked for NDJSON via ?format=ndjson or the Accept header"""
+    if request.query_params.get("format") == "ndjson":
+        return True
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def _ndjson_lines(cursor, transform: Optional[Callable]):
+    async for doc in cursor:
+        if transform is not None:
+            doc = transform(doc)
+            if inspect.isawaitable(doc):
+                doc = await doc
+        yield json.dumps(doc, default=json_default).encode() + b"\n"
+
+
+def stream_ndjson(cursor, transform: Optional[Callable] = None, batch_size: Optional[int] = None) -> StreamingResponse:
+    """Stream a Motor cursor as one JSON object per line.
+
+    Documents are serialized as each batch arrives, so peak memory is one
+    batch regardless of how many documents match. `transform` (sync or async)
+    shapes each document before it is written.
+    """
+    cursor = cursor.batch_size(batch_size or settings.stream_batch_size)
+    return StreamingResponse(_ndjson_lines(cursor, transform), media_type=NDJSON_MEDIA_TYPE)
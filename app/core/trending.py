@@ -0,0 +1,168 @@
+"""Trending questions ranked by exponentially decayed activity.
+
+A question's score is the sum of its events (creation, answers), each
+halving in weight every half-life. Rather than decaying every score on a
+clock, each event is stored pre-scaled by 2 ** (t / half_life): relative
+order never changes as time passes, so only the question an event touches
+moves in the ranking. Scores are kept as log2 to stay in float range.
+
+The ranking is a sorted list capped at `max_items`, so the top K is a
+slice. Scores are written to forum-question.trending_score periodically
+and read back at startup. Each worker ranks the events it handles itself;
+persistence uses $max, so a restarted worker starts from the highest score
+any worker saved.
+"""
+import asyncio
+import logging
+import math
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of the events that make a question trend
+QUESTION_WEIGHT = 1.0
+ANSWER_WEIGHT = 2.0
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _log_add(a: float, b: float) -> float:
+    """log2(2 ** a + 2 ** b) without overflow"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+class TrendingIndex:
+    def __init__(self, half_life_seconds: float, max_items: int):
+        self.half_life = half_life_seconds
+        self.max_items = max_items
+        self._scores: Dict[str, float] = {}
+        # (-log score, question_id), best first
+        self._ranking: List[Tuple[float, str]] = []
+        self._dirty: Set[str] = set()
+        # Seeded by load() so far, so a retried load doesn't count them twice
+        self._loaded: Set[str] = set()
+        self.ready = False
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _scaled(self, at: datetime) -> float:
+        return (at - _EPOCH).total_seconds() / self.half_life
+
+    def _add(self, question_id: str, log_score: float):
+        old = self._scores.get(question_id)
+        if old is not None:
+            position = bisect_left(self._ranking, (-old, question_id))
+            del self._ranking[position]
+            log_score = _log_add(old, log_score)
+        elif len(self._ranking) >= self.max_items:
+            # Full: the new entry has to beat the current last place
+            if (-log_score, question_id) >= self._ranking[-1]:
+                return
+            _, evicted = self._ranking.pop()
+            del self._scores[evicted]
+            self._dirty.discard(evicted)
+
+        self._scores[question_id] = log_score
+        insort(self._ranking, (-log_score, question_id))
+        self._dirty.add(question_id)
+
+    def record(self, question_id: str, weight: float, at: Optional[datetime] = None):
+        """Count an event of the given weight on a question"""
+        self._add(question_id, math.log2(weight) + self._scaled(at or datetime.utcnow()))
+
+    def remove(self, question_id: str):
+        old = self._scores.pop(question_id, None)
+        if old is None:
+            return
+        position = bisect_left(self._ranking, (-old, question_id))
+        del self._ranking[position]
+        self._dirty.discard(question_id)
+
+    def score(self, question_id: str, now: Optional[datetime] = None) -> float:
+        log_score = self._scores.get(question_id)
+        if log_score is None:
+            return 0.0
+        return 2 ** (log_score - self._scaled(now or datetime.utcnow()))
+
+    def top(self, k: int, now: Optional[datetime] = None) -> List[Tuple[str, float]]:
+        """The k hottest (question_id, decayed score) pairs"""
+        scaled_now = self._scaled(now or datetime.utcnow())
+        return [
+            (question_id, 2 ** (-negative - scaled_now))
+            for negative, question_id in self._ranking[:k]
+        ]
+
+    async def load(self, database):
+        """Seed the ranking from the most recently active questions"""
+        cursor = database["forum-question"].find(
+            {},
+            {"_id": 0, "question_id": 1, "trending_score": 1, "answer_count": 1, "last_activity_at": 1}
+        ).sort("last_activity_at", DESCENDING).limit(self.max_items)
+
+        async for doc in cursor:
+            log_score = doc.get("trending_score")
+            if log_score is None:
+                # Never persisted: assume its activity happened at last_activity_at
+                last_activity_at = doc.get("last_activity_at")
+                if last_activity_at is None:
+                    continue
+                weight = QUESTION_WEIGHT + ANSWER_WEIGHT * doc.get("answer_count", 0)
+                log_score = math.log2(weight) + self._scaled(last_activity_at)
+            question_id = doc["question_id"]
+            if question_id in self._loaded:
+                # Seeded by an earlier attempt that failed part-way
+                continue
+            recorded = question_id in self._scores
+            self._add(question_id, log_score)
+            self._loaded.add(question_id)
+            if not recorded:
+                # Exactly what is stored; events recorded meanwhile keep theirs dirty
+                self._dirty.discard(question_id)
+        self._loaded.clear()
+        self.ready = True
+        logger.info("Trending ranking loaded with %d questions", len(self))
+
+    async def persist(self, database) -> int:
+        """Write the scores changed since the last call"""
+        dirty, self._dirty = self._dirty, set()
+        operations = [
+            UpdateOne({"question_id": question_id}, {"$max": {"trending_score": self._scores[question_id]}})
+            for question_id in dirty if question_id in self._scores
+        ]
+        if not operations:
+            return 0
+        try:
+            await database["forum-question"].bulk_write(operations, ordered=False)
+        except Exception:
+            self._dirty.update(dirty)
+            raise
+        return len(operations)
+
+
+trending = TrendingIndex(
+    half_life_seconds=settings.trending_half_life_hours * 3600,
+    max_items=settings.trending_max_questions
+)
+
+
+async def trending_forever(database, interval: float):
+    """Background task used by the app lifespan; retries loading every interval until it succeeds"""
+    while True:
+        if not trending.ready:
+            try:
+                await trending.load(database)
+            except Exception as e:
+                logger.error("Loading trending scores failed, retrying in %ss: %s", interval, e)
+        await asyncio.sleep(interval)
+        try:
+            await trending.persist(database)
+        except Exception as e:
+            logger.error("Saving trending scores failed: %s", e)
@@ -0,0 +1,326 @@
+"""Cold storage for old queries.
+
+Queries created more than ARCHIVE_AFTER_DAYS ago are moved out of the
+query collection into append-only segment files under ARCHIVE_DIR:
+
+    python -m app.db.archive [--older-than-days 180] [--batch-size 500]
+    python -m app.db.archive --compact-only
+
+A segment is a series of blocks, each an independent gzip member holding
+up to --batch-size queries as extended-JSON lines, so `zcat` reads a whole
+segment and a single block can be read with one seek. Every archived
+query gets an entry in "query-archive":
+
+    {"_id": query_id, "user_id", "segment", "offset", "length", "creation_date"}
+
+get_query reads through to the archive when a query is not in the hot
+collection, and update_query moves it back first. Each run writes new
+segment files only, and a batch is written and fsynced before it is
+indexed and then deleted from the hot collection, so an interrupted run
+loses nothing; at worst a block is left unreferenced and its queries are
+archived again by the next run. Each delete is conditional on the fields
+update_query can change still holding the archived values; a query
+updated in between keeps its hot copy, loses its new index entry and is
+archived again in a later batch.
+
+Deleting a query (delete_query, or the cascade after an account
+deletion) only drops its index entry; a query without one is garbage.
+"query-archive-segments" counts the queries written to each segment, and
+after archiving, every run compacts the segments holding fewer indexed
+queries than that: their live queries are copied into a new segment,
+the entries are repointed and the old file is removed. Deleted archived
+queries are therefore kept on disk until the next archive run (daily
+from cron), not indefinitely. A query deleted while its segment is being
+compacted is left in the new segment and purged by the following run.
+
+Every worker reading through must see ARCHIVE_DIR (a shared volume when
+there are several hosts).
+"""
+import argparse
+import asyncio
+import copy
+import gzip
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from bson import json_util
+from pymongo import DeleteOne, UpdateOne
+
+from app.core.config import settings
+from app.schemas.query import QueryUpdate
+
+logger = logging.getLogger(__name__)
+
+INDEX_COLLECTION = "query-archive"
+
+# {"_id": segment, "queries": number written to it}
+SEGMENTS_COLLECTION = "query-archive-segments"
+
+BATCH_SIZE = 500
+
+# Decompressed blocks kept per worker for repeated reads
+_BLOCK_CACHE_SIZE = 32
+
+# A query is only deleted from the hot collection if these still match its archived copy
+UPDATABLE_FIELDS = tuple(QueryUpdate.model_fields)
+
+# Batches a query that keeps changing is retried in before the run leaves it hot
+MAX_ATTEMPTS = 3
+
+
+def encode_block(docs: List[dict]) -> bytes:
+    lines = "".join(json_util.dumps(doc) + "\n" for doc in docs)
+    return gzip.compress(lines.encode("utf-8"))
+
+
+def decode_block(data: bytes) -> List[dict]:
+    return [json_util.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines() if line]
+
+
+class Archive:
+    def __init__(self, directory: str, segment_max_bytes: int):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._blocks: "OrderedDict[Tuple[str, int], List[dict]]" = OrderedDict()
+
+    def _path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment)
+
+    def append_block(self, segment: str, docs: List[dict]) -> Tuple[int, int]:
+        """Append one block to a segment and return its (offset, length)"""
+        os.makedirs(self.directory, exist_ok=True)
+        data = encode_block(docs)
+        with open(self._path(segment), "ab") as f:
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return offset, len(data)
+
+    def read_block(self, segment: str, offset: int, length: int) -> List[dict]:
+        key = (segment, offset)
+        docs = self._blocks.get(key)
+        if docs is not None:
+            self._blocks.move_to_end(key)
+            return docs
+        with open(self._path(segment), "rb") as f:
+            f.seek(offset)
+            docs = decode_block(f.read(length))
+        self._blocks[key] = docs
+        if len(self._blocks) > _BLOCK_CACHE_SIZE:
+            self._blocks.popitem(last=False)
+        return docs
+
+    def remove_segment(self, segment: str):
+        for key in [key for key in self._blocks if key[0] == segment]:
+            del self._blocks[key]
+        try:
+            os.remove(self._path(segment))
+        except FileNotFoundError:
+            pass
+
+    def segment_files(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith(".jsonl.gz"))
+        except FileNotFoundError:
+            return []
+
+    def segment_size(self, segment: str) -> int:
+        try:
+            return os.path.getsize(self._path(segment))
+        except FileNotFoundError:
+            return 0
+
+    async def find_query(self, database, query_id: str) -> Optional[dict]:
+        """The archived query document, or None if it was never archived"""
+        entry = await database[INDEX_COLLECTION].find_one({"_id": query_id})
+        if entry is None:
+            return None
+        try:
+            docs = await asyncio.to_thread(self.read_block, entry["segment"], entry["offset"], entry["length"])
+        except FileNotFoundError:
+            # Compacted since the entry was read; it now points at the new segment
+            entry = await database[INDEX_COLLECTION].find_one({"_id": query_id})
+            if entry is None:
+                return None
+            docs = await asyncio.to_thread(self.read_block, entry["segment"], entry["offset"], entry["length"])
+        for doc in docs:
+            if doc.get("query_id") == query_id:
+                # The block stays cached; callers reshape what they get
+                return copy.deepcopy(doc)
+        logger.error("Archive index points %s at a block without it", query_id)
+        return None
+
+    async def forget(self, database, query_id: str) -> bool:
+        """Drop a query from the index; compact() purges its bytes from the segment"""
+        result = await database[INDEX_COLLECTION].delete_one({"_id": query_id})
+        return result.deleted_count > 0
+
+    async def restore(self, database, query_id: str) -> Optional[dict]:
+        """Move an archived query back into the query collection"""
+        doc = await self.find_query(database, query_id)
+        if doc is None:
+            return None
+        await database["query"].update_one({"_id": doc["_id"]}, {"$setOnInsert": doc}, upsert=True)
+        await self.forget(database, query_id)
+        return await database["query"].find_one({"_id": doc["_id"]})
+
+    async def archive_older_than(self, database, cutoff: datetime, batch_size: int = BATCH_SIZE) -> dict:
+        """Move every query created before `cutoff` into new segments"""
+        run = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        number, archived = 1, 0
+        segment = f"query-{run}-{number:04d}.jsonl.gz"
+        attempts: dict = {}
+        skipped: List = []
+
+        while True:
+            query = {"creation_date": {"$lt": cutoff}}
+            if skipped:
+                query["_id"] = {"$nin": skipped}
+            docs = await database["query"].find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+
+            if self.segment_size(segment) >= self.segment_max_bytes:
+                number += 1
+                segment = f"query-{run}-{number:04d}.jsonl.gz"
+            offset, length = await asyncio.to_thread(self.append_block, segment, docs)
+
+            await database[INDEX_COLLECTION].bulk_write([
+                UpdateOne(
+                    {"_id": doc["query_id"]},
+                    {"$set": {
+                        "user_id": doc.get("user_id"),
+                        "segment": segment,
+                        "offset": offset,
+                        "length": length,
+                        "creation_date": doc.get("creation_date"),
+                    }},
+                    upsert=True
+                )
+                for doc in docs
+            ], ordered=False)
+            await database[SEGMENTS_COLLECTION].update_one(
+                {"_id": segment}, {"$inc": {"queries": len(docs)}}, upsert=True
+            )
+            result = await database["query"].bulk_write([
+                DeleteOne({"_id": doc["_id"], **{field: doc.get(field) for field in UPDATABLE_FIELDS}})
+                for doc in docs
+            ], ordered=False)
+
+            if result.deleted_count < len(docs):
+                # Updated since they were read: drop the entries pointing at the stale copy
+                kept = await database["query"].find(
+                    {"_id": {"$in": [doc["_id"] for doc in docs]}}, {"query_id": 1}
+                ).to_list(None)
+                await database[INDEX_COLLECTION].delete_many({
+                    "_id": {"$in": [doc["query_id"] for doc in kept]},
+                    "segment": segment,
+                    "offset": offset,
+                })
+                for doc in kept:
+                    attempts[doc["_id"]] = attempts.get(doc["_id"], 0) + 1
+                    if attempts[doc["_id"]] >= MAX_ATTEMPTS:
+                        skipped.append(doc["_id"])
+                logger.info("%d queries changed while being archived", len(kept))
+
+            archived += result.deleted_count
+            logger.info("Archived %d queries (segment %s)", archived, segment)
+
+        return {"archived": archived, "segments": number if archived else 0, "left_hot": len(skipped)}
+
+    async def _garbage_segments(self, database) -> List[str]:
+        """Segments holding queries that no index entry points to any more"""
+        written = {}
+        async for doc in database[SEGMENTS_COLLECTION].find({}):
+            written[doc["_id"]] = doc["queries"]
+        indexed = {}
+        async for group in database[INDEX_COLLECTION].aggregate([
+            {"$group": {"_id": "$segment", "count": {"$sum": 1}}}
+        ]):
+            indexed[group["_id"]] = group["count"]
+
+        # Files written before segments were counted are compacted once
+        return [
+            segment for segment in self.segment_files()
+            if segment not in written or indexed.get(segment, 0) < written[segment]
+        ]
+
+    async def compact(self, database, batch_size: int = BATCH_SIZE) -> dict:
+        """Rewrite the segments holding deleted queries without them"""
+        run = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        number, kept, compacted = 0, 0, 0
+        target, target_count = None, 0
+
+        async def flush(pending):
+            nonlocal number, target, target_count
+            if target is None or self.segment_size(target) >= self.segment_max_bytes:
+                number += 1
+                target, target_count = f"compact-{run}-{number:04d}.jsonl.gz", 0
+            offset, length = await asyncio.to_thread(self.append_block, target, [doc for doc, _ in pending])
+            await database[SEGMENTS_COLLECTION].update_one(
+                {"_id": target}, {"$inc": {"queries": len(pending)}}, upsert=True
+            )
+            # Only entries still pointing at the old copy move; a query
+            # deleted meanwhile stays garbage in the new segment
+            await database[INDEX_COLLECTION].bulk_write([
+                UpdateOne(
+                    {"_id": doc["query_id"], "segment": entry["segment"], "offset": entry["offset"]},
+                    {"$set": {"segment": target, "offset": offset, "length": length}}
+                )
+                for doc, entry in pending
+            ], ordered=False)
+
+        for segment in await self._garbage_segments(database):
+            entries = await database[INDEX_COLLECTION].find({"segment": segment}).sort("offset", 1).to_list(None)
+            blocks = OrderedDict()
+            for entry in entries:
+                blocks.setdefault((entry["offset"], entry["length"]), {})[entry["_id"]] = entry
+
+            pending = []
+            for (offset, length), wanted in blocks.items():
+                for doc in await asyncio.to_thread(self.read_block, segment, offset, length):
+                    entry = wanted.get(doc.get("query_id"))
+                    if entry is not None:
+                        pending.append((doc, entry))
+                if len(pending) >= batch_size:
+                    await flush(pending)
+                    kept += len(pending)
+                    pending = []
+            if pending:
+                await flush(pending)
+                kept += len(pending)
+
+            self.remove_segment(segment)
+            await database[SEGMENTS_COLLECTION].delete_one({"_id": segment})
+            compacted += 1
+            logger.info("Compacted segment %s (%d queries kept)", segment, len(entries))
+
+        return {"compacted": compacted, "kept": kept}
+
+
+archive = Archive(settings.archive_dir, settings.archive_segment_max_bytes)
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old queries into compressed archive segments")
+    parser.add_argument("--older-than-days", type=float, default=settings.archive_after_days)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--compact-only", action="store_true",
+                        help="only purge deleted queries from existing segments")
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+
+    if not args.compact_only:
+        cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+        print(await archive.archive_older_than(database, cutoff, args.batch_size))
+    print(await archive.compact(database, args.batch_size))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,231 @@
+"""Background cascade deletion of the documents a deleted entity leaves behind.
+
+Deleting a user or a question removes only that document in the request;
+the rest is queued as a job in "deletion-jobs":
+
+    user      -> their questions (and every answer to them), their answers,
+                 histories, queries (and their archive index entries; the
+                 archived bytes go at the next app.db.archive compaction),
+                 user-stats and llm-usage documents
+    question  -> its answers
+
+Workers claim jobs with a lease, delete in batches of CASCADE_BATCH_SIZE
+ids with a pause between batches, and record progress on the job after
+each batch. A job whose worker died is picked up again once its lease
+runs out; since every batch is looked up afresh, re-running a step is
+harmless. Hooks registered by the routes drop deleted documents from
+in-memory indexes and decrement the counters of the documents that stay,
+such as other questions' answer_count; app.db.reconcile repairs whatever
+an interrupted batch leaves off.
+
+    python -m app.db.cascade            # run queued jobs until none are left
+    python -m app.db.cascade --status   # list recent jobs
+"""
+import argparse
+import asyncio
+import inspect
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "deletion-jobs"
+
+
+def plan_steps(kind: str, target: str) -> List[dict]:
+    """The (collection, filter) steps that clean up after one deleted entity"""
+    if kind == "user":
+        return [
+            {"collection": "forum-question", "filter": {"user_id": target},
+             "children": [{"collection": "forum-answer", "key": "question_id"}]},
+            {"collection": "forum-answer", "filter": {"user_id": target}},
+            {"collection": "history", "filter": {"user_id": target}},
+            {"collection": "query", "filter": {"user_id": target}},
+            {"collection": "query-archive", "filter": {"user_id": target}},
+            {"collection": "user-stats", "filter": {"_id": target}},
+            {"collection": "llm-usage", "filter": {"user_id": target}},
+        ]
+    if kind == "question":
+        return [{"collection": "forum-answer", "filter": {"question_id": target}}]
+    raise ValueError(f"Unknown deletion kind: {kind}")
+
+
+DeleteHook = Callable[[List[dict]], Union[None, Awaitable[None]]]
+
+# collection -> (fields the hook needs, hook) run after each deleted batch
+_delete_hooks: Dict[str, List[Tuple[List[str], DeleteHook]]] = {}
+
+
+def register_delete_hook(collection: str, fields: List[str], hook: DeleteHook):
+    """Call `hook` (plain or async) with the deleted documents (only `fields`)
+    of every batch, e.g. to drop them from an in-memory index"""
+    _delete_hooks.setdefault(collection, []).append((fields, hook))
+
+
+class CascadeWorker:
+    def __init__(self, batch_size: int, pause: float, lease_seconds: float):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lease = timedelta(seconds=lease_seconds)
+        self._wake = asyncio.Event()
+
+    async def enqueue(self, database, kind: str, target: str, requested_by: Optional[str] = None) -> str:
+        now = datetime.utcnow()
+        job = {
+            "kind": kind,
+            "target": target,
+            "requested_by": requested_by,
+            "steps": plan_steps(kind, target),
+            "step": 0,
+            "deleted": {},
+            "status": "pending",
+            "lease_until": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        result = await database[JOBS_COLLECTION].insert_one(job)
+        self._wake.set()
+        return str(result.inserted_id)
+
+    async def _claim(self, database) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await database[JOBS_COLLECTION].find_one_and_update(
+            {
+                "status": {"$in": ["pending", "running"]},
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+            },
+            {"$set": {"status": "running", "lease_until": now + self.lease, "updated_at": now}},
+            sort=[("_id", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _delete_batches(self, database, collection: str, query: dict,
+                              children: List[dict]) -> AsyncIterator[Tuple[str, int]]:
+        hooks = _delete_hooks.get(collection, [])
+        projection = {"_id": 1}
+        for fields, _ in hooks:
+            projection.update({field: 1 for field in fields})
+        for child in children:
+            projection[child["key"]] = 1
+
+        while True:
+            docs = await database[collection].find(query, projection).limit(self.batch_size).to_list(self.batch_size)
+            if not docs:
+                return
+            for child in children:
+                keys = [doc[child["key"]] for doc in docs if child["key"] in doc]
+                async for progress in self._delete_batches(
+                        database, child["collection"], {child["key"]: {"$in": keys}}, child.get("children", [])):
+                    yield progress
+
+            result = await database[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            for _, hook in hooks:
+                try:
+                    pending = hook(docs)
+                    if inspect.isawaitable(pending):
+                        await pending
+                except Exception as e:
+                    logger.error("Delete hook for %s failed: %s", collection, e)
+            yield collection, result.deleted_count
+            if self.pause:
+                await asyncio.sleep(self.pause)
+
+    async def run_job(self, database, job: dict):
+        jobs = database[JOBS_COLLECTION]
+        for index in range(job["step"], len(job["steps"])):
+            step = job["steps"][index]
+            async for collection, count in self._delete_batches(
+                    database, step["collection"], step["filter"], step.get("children", [])):
+                now = datetime.utcnow()
+                await jobs.update_one(
+                    {"_id": job["_id"]},
+                    {"$inc": {f"deleted.{collection}": count},
+                     "$set": {"lease_until": now + self.lease, "updated_at": now}}
+                )
+            await jobs.update_one({"_id": job["_id"]}, {"$set": {"step": index + 1}})
+
+        now = datetime.utcnow()
+        await jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "done", "lease_until": None, "updated_at": now, "finished_at": now}}
+        )
+        logger.info("Deletion job %s (%s %s) finished", job["_id"], job["kind"], job["target"])
+
+    async def drain(self, database) -> int:
+        """Run claimable jobs until there are none; returns how many ran"""
+        count = 0
+        while True:
+            job = await self._claim(database)
+            if job is None:
+                return count
+            try:
+                await self.run_job(database, job)
+            except Exception as e:
+                logger.error("Deletion job %s failed, will retry after its lease: %s", job["_id"], e)
+                await database[JOBS_COLLECTION].update_one(
+                    {"_id": job["_id"]}, {"$set": {"error": str(e), "updated_at": datetime.utcnow()}}
+                )
+                return count
+            count += 1
+
+    async def run_forever(self, database, poll_interval: float):
+        """Background task used by the app lifespan"""
+        while True:
+            try:
+                await self.drain(database)
+            except Exception as e:
+                logger.error("Cascade deletion worker failed: %s", e)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+cascade_worker = CascadeWorker(
+    batch_size=settings.cascade_batch_size,
+    pause=settings.cascade_pause_seconds,
+    lease_seconds=settings.cascade_lease_seconds
+)
+
+
+def to_job_response(job: dict) -> dict:
+    return {
+        "id": str(job["_id"]),
+        "kind": job["kind"],
+        "target": job["target"],
+        "status": job["status"],
+        "steps_done": job["step"],
+        "steps_total": len(job["steps"]),
+        "deleted": job.get("deleted", {}),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job.get("finished_at"),
+    }
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run or inspect cascade deletion jobs")
+    parser.add_argument("--status", action="store_true", help="list the 20 most recent jobs")
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+    # Registers the hooks that keep counters in step with deleted answers
+    import app.api.routes.forum  # noqa: F401
+
+    if args.status:
+        async for job in database[JOBS_COLLECTION].find().sort("_id", -1).limit(20):
+            print(to_job_response(job))
+        return
+    print(f"Ran {await cascade_worker.drain(database)} deletion jobs")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
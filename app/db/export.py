@@ -0,0 +1,185 @@
+"""Export everything stored for one user as gzip-compressed JSON lines.
+
+Covers the user document (without the password hash), histories, forum
+questions, forum answers and queries, including queries moved to the
+archive (app.db.archive). Each line is
+
+    {"collection": ..., "cursor": ..., "doc": {...}}
+
+and `cursor` resumes the export right after that document. Collections
+are read one Motor cursor at a time in _id order, so memory stays at one
+batch however much the user has. GET /user/export streams the current
+user's data; for support requests:
+
+    python -m app.db.export --user-id <id> --output user.jsonl.gz
+
+The CLI appends one gzip member per batch and checkpoints after it, so
+an interrupted export started again with the same --output continues
+(repeating at most the batch written just before the interruption).
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import zlib
+from typing import AsyncIterator, Optional, Tuple
+
+from bson import ObjectId, json_util
+
+from app.core.config import settings
+from app.core.streaming import json_default
+from app.db.archive import INDEX_COLLECTION, archive
+
+logger = logging.getLogger(__name__)
+
+GZIP_MEDIA_TYPE = "application/gzip"
+
+# Never exported
+PRIVATE_FIELDS = {"hashed_password"}
+
+
+def _owned_by(user_id: str) -> dict:
+    return {"user_id": user_id}
+
+
+def _user_doc(user_id: str) -> dict:
+    return {"_id": ObjectId(user_id)} if ObjectId.is_valid(user_id) else {"id": user_id}
+
+
+async def _archived_query(entry: dict) -> Optional[dict]:
+    docs = await asyncio.to_thread(archive.read_block, entry["segment"], entry["offset"], entry["length"])
+    return next((doc for doc in docs if doc.get("query_id") == entry["_id"]), None)
+
+
+# (exported as, collection read, filter for a user, loader turning a read document into the exported one)
+SOURCES: list = [
+    ("user", "user", _user_doc, None),
+    ("history", "history", _owned_by, None),
+    ("forum-question", "forum-question", _owned_by, None),
+    ("forum-answer", "forum-answer", _owned_by, None),
+    ("query", "query", _owned_by, None),
+    ("query", INDEX_COLLECTION, _owned_by, _archived_query),
+]
+
+
+def encode_export_cursor(source: int, last_id) -> str:
+    raw = json_util.dumps([source, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_export_cursor(cursor: str) -> Tuple[int, object]:
+    """(source index, last _id); raises ValueError for anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        source, last_id = json_util.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("Invalid export cursor") from e
+    if not isinstance(source, int) or not 0 <= source < len(SOURCES):
+        raise ValueError("Invalid export cursor")
+    return source, last_id
+
+
+def to_export_doc(doc: dict) -> dict:
+    return {field: value for field, value in doc.items() if field not in PRIVATE_FIELDS}
+
+
+async def export_records(database, user_id: str, cursor: Optional[str] = None,
+                         batch_size: Optional[int] = None) -> AsyncIterator[Tuple[str, str, dict]]:
+    """(collection, cursor, document) for everything the user owns, after `cursor`"""
+    batch_size = batch_size or settings.stream_batch_size
+    start, last_id = decode_export_cursor(cursor) if cursor else (0, None)
+
+    for index in range(start, len(SOURCES)):
+        name, collection, build_filter, load = SOURCES[index]
+        query = build_filter(user_id)
+        if index == start and last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        docs = database[collection].find(query).sort("_id", 1).batch_size(batch_size)
+        async for doc in docs:
+            exported = await load(doc) if load else doc
+            if exported is not None:
+                yield name, encode_export_cursor(index, doc["_id"]), to_export_doc(exported)
+
+
+def to_line(name: str, cursor: str, doc: dict) -> bytes:
+    record = {"collection": name, "cursor": cursor, "doc": doc}
+    return json.dumps(record, default=json_default, ensure_ascii=False).encode() + b"\n"
+
+
+async def gzip_lines(records: AsyncIterator[Tuple[str, str, dict]], flush_every: int) -> AsyncIterator[bytes]:
+    """One gzip stream; flushed every `flush_every` lines so a cut-off download
+    still decompresses up to its last complete batch"""
+    compressor = zlib.compressobj(wbits=31)
+    count = 0
+    async for name, cursor, doc in records:
+        chunk = compressor.compress(to_line(name, cursor, doc))
+        count += 1
+        if count % flush_every == 0:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def _read_checkpoint(output: str) -> Optional[dict]:
+    try:
+        with open(output + ".checkpoint", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(output: str, state: dict):
+    path = output + ".checkpoint"
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+async def export_to_file(database, user_id: str, output: str, batch_size: Optional[int] = None) -> dict:
+    batch_size = batch_size or settings.stream_batch_size
+    state = _read_checkpoint(output) or {"user_id": user_id, "cursor": None, "exported": 0}
+    if state["user_id"] != user_id:
+        raise ValueError(f"{output} holds an export of another user")
+    batch = []
+
+    def flush():
+        # Each batch is a complete gzip member; concatenated members are one valid .gz file
+        with open(output, "ab") as f:
+            f.write(zlib.compress(b"".join(to_line(*record) for record in batch), wbits=31))
+            f.flush()
+            os.fsync(f.fileno())
+        state["cursor"] = batch[-1][1]
+        state["exported"] += len(batch)
+        _write_checkpoint(output, state)
+        logger.info("Exported %d documents", state["exported"])
+        batch.clear()
+
+    async for record in export_records(database, user_id, state["cursor"], batch_size):
+        batch.append(record)
+        if len(batch) == batch_size:
+            flush()
+    if batch:
+        flush()
+    return state
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export all of a user's documents as gzip JSON lines")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--batch-size", type=int, default=settings.stream_batch_size)
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+
+    state = await export_to_file(database, args.user_id, args.output, args.batch_size)
+    print(f"Exported {state['exported']} documents into {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
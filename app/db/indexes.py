@@ -0,0 +1,215 @@
+"""Index declarations for every collection, plus a COLLSCAN audit.
+
+Indexes are created idempotently at startup. They can also be managed from
+the command line:
+
+    python -m app.db.indexes            # create missing indexes
+    python -m app.db.indexes --audit    # create, then explain() the route queries
+    python -m app.db.indexes --audit --no-create
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+_SINCE = {"$gte": datetime(2000, 1, 1)}
+
+
+class MissingIndexError(RuntimeError):
+    """A unique index that guards data integrity could not be created"""
+
+
+# Unique indexes that are the only guard against duplicates (register_user
+# does not pre-check), so the app must not serve without them
+REQUIRED_INDEXES: Dict[str, List[str]] = {
+    "user": ["username_1", "email_1"],
+}
+
+
+# Collection name -> indexes the routes rely on
+INDEXES: Dict[str, List[IndexModel]] = {
+    "user": [
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "history": [
+        IndexModel([("history_id", ASCENDING)], unique=True),
+        # user_id lookups and keyset pages ordered by _id
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        # delete_query looks up the history holding a query id
+        IndexModel([("query_set", ASCENDING)]),
+    ],
+    "forum-question": [
+        IndexModel([("question_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        # since/until on my-questions
+        IndexModel([("user_id", ASCENDING), ("creation_date", DESCENDING)]),
+        # since/until on the question feed
+        IndexModel([("creation_date", DESCENDING)]),
+        # get_all_questions?sort=activity
+        IndexModel([("last_activity_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "forum-answer": [
+        IndexModel([("answer_id", ASCENDING)], unique=True),
+        IndexModel([("question_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("creation_date", DESCENDING)]),
+    ],
+    "query": [
+        IndexModel([("query_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("creation_date", DESCENDING)]),
+        # python -m app.db.archive picks queries older than a cutoff
+        IndexModel([("creation_date", ASCENDING)]),
+    ],
+    "llm-usage": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        # cascade deletion of a user's usage windows
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "query-archive": [
+        # cascade deletion of a user's archived queries
+        IndexModel([("user_id", ASCENDING)]),
+        # compaction reads one segment's entries in block order
+        IndexModel([("segment", ASCENDING), ("offset", ASCENDING)]),
+    ],
+    "deletion-jobs": [
+        # workers claim the oldest pending or expired job
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+        # GET /user/deletion-jobs
+        IndexModel([("requested_by", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "model-rollup": [
+        # One bucket per model and hour; also serves the analytics range scans
+        IndexModel([("model", ASCENDING), ("hour", ASCENDING)], unique=True),
+        IndexModel([("hour", ASCENDING)]),
+    ],
+}
+
+
+# (collection, filter, where it comes from) for every lookup a route issues
+AUDIT_QUERIES = [
+    ("user", {"username": "audit"}, "login_for_access_token, add_username_to_doc"),
+    ("user", {"email": "audit"}, "reset_password, update_user"),
+    ("user", {"id": "audit"}, "add_username_to_doc"),
+    ("history", {"history_id": "audit"}, "history routes, create_query"),
+    ("history", {"user_id": "audit"}, "get_user_histories"),
+    ("history", {"query_set": "audit"}, "delete_query"),
+    ("forum-question", {"question_id": "audit"}, "question routes, create_answer"),
+    ("forum-question", {"user_id": "audit"}, "get_user_questions"),
+    ("forum-answer", {"answer_id": "audit"}, "get_answer, delete_answer"),
+    ("forum-answer", {"question_id": "audit"}, "get_question_answers, get_question_thread"),
+    ("forum-answer", {"user_id": "audit"}, "get_user_answers"),
+    ("query", {"query_id": "audit"}, "query routes"),
+    ("query", {"user_id": "audit"}, "get_my_queries"),
+    ("forum-question", {"creation_date": _SINCE}, "get_all_questions?since="),
+    ("forum-question", {"user_id": "audit", "creation_date": _SINCE}, "get_user_questions?since="),
+    ("forum-answer", {"user_id": "audit", "creation_date": _SINCE}, "get_user_answers?since="),
+    ("query", {"user_id": "audit", "creation_date": _SINCE}, "get_my_queries?since="),
+    ("deletion-jobs", {"requested_by": "audit"}, "get_deletion_jobs"),
+    ("llm-usage", {"user_id": "audit"}, "cascade deletion of a user"),
+    ("query-archive", {"user_id": "audit"}, "cascade deletion of a user"),
+    ("query", {"creation_date": _SINCE}, "python -m app.db.archive"),
+    ("query-archive", {"segment": "audit"}, "python -m app.db.archive (compaction)"),
+]
+
+# (collection, filtered fields) audited but allowed to scan: the legacy-id
+# fallback in add_username_to_doc only runs for ids that aren't ObjectIds
+EXPECTED_SCANS = {
+    ("user", ("id",)),
+}
+
+
+async def ensure_indexes(database) -> List[str]:
+    """Create every declared index that is missing and return their names.
+
+    create_indexes is a no-op for indexes that already exist with the same
+    spec, so this is safe to run on every startup. A failing index (for
+    example a unique index over existing duplicates) is logged and skipped,
+    unless it is in REQUIRED_INDEXES: then MissingIndexError is raised
+    after the others have been created.
+    """
+    created = []
+    missing = []
+    for collection_name, models in INDEXES.items():
+        collection = database[collection_name]
+        for model in models:
+            try:
+                created.extend(await collection.create_indexes([model]))
+            except PyMongoError as e:
+                logger.error("Could not create index %s on %s: %s",
+                             model.document["name"], collection_name, e)
+                if model.document["name"] in REQUIRED_INDEXES.get(collection_name, []):
+                    missing.append(f"{collection_name}.{model.document['name']}")
+    if missing:
+        raise MissingIndexError(f"Required unique indexes are missing: {', '.join(missing)}")
+    return created
+
+
+def _plan_stages(plan) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def audit_queries(database) -> List[dict]:
+    """explain() every route query and report which ones scan the collection"""
+    report = []
+    for collection_name, query, source in AUDIT_QUERIES:
+        explanation = await database[collection_name].find(query).explain()
+        stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "collection": collection_name,
+            "filter": query,
+            "source": source,
+            "collscan": "COLLSCAN" in stages,
+            "expected": (collection_name, tuple(sorted(query))) in EXPECTED_SCANS,
+            "stages": stages,
+        })
+    return report
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and audit MongoDB indexes")
+    parser.add_argument("--audit", action="store_true",
+                        help="explain() the route queries and flag COLLSCANs")
+    parser.add_argument("--no-create", action="store_true",
+                        help="skip index creation")
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+
+    if not args.no_create:
+        created = await ensure_indexes(database)
+        print(f"Ensured {len(created)} indexes: {', '.join(created)}")
+
+    if args.audit:
+        collscans = 0
+        for entry in await audit_queries(database):
+            flag = "ok"
+            if entry["collscan"]:
+                flag = "expected" if entry["expected"] else "COLLSCAN"
+            collscans += entry["collscan"] and not entry["expected"]
+            print(f"[{flag:>8}] {entry['collection']} {entry['filter']} ({entry['source']})")
+        print(f"{collscans} of {len(AUDIT_QUERIES)} route queries unexpectedly scan their collection")
+        return 1 if collscans else 0
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,112 @@
+"""Convert string creation_date values to BSON dates.
+
+Queries, questions and answers used to store creation_date as an ISO
+string: forum posts in UTC, queries in the server's local time. This
+rewrites them as BSON dates in UTC, in _id order and in bounded batches:
+
+    python -m app.db.migrate_dates [--collection query] [--batch-size 1000] [--restart]
+
+Progress is checkpointed per collection in the "migrations" collection, so
+an interrupted run picks up where it stopped. Each update is conditional
+on the stored string, so it is safe to run while the app is serving.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ["query", "forum-question", "forum-answer"]
+
+MIGRATIONS_COLLECTION = "migrations"
+
+BATCH_SIZE = 1000
+
+# Local-time strings are recognised by their offset from the _id timestamp
+_OFFSET_STEP = timedelta(minutes=15)
+_MAX_OFFSET = timedelta(hours=14)
+_TOLERANCE = timedelta(minutes=5)
+
+
+def parse_stored_date(value: str, oid: ObjectId) -> datetime:
+    """Turn a stored ISO string into a naive UTC datetime with BSON precision.
+
+    Naive strings that sit a whole number of quarter hours away from the
+    document's _id time were written in local time and are shifted back;
+    anything unparseable falls back to the _id time.
+    """
+    created = oid.generation_time.replace(tzinfo=None)
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        logger.warning("Unparseable creation_date %r on %s, using the _id time", value, oid)
+        return created
+
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    else:
+        drift = parsed - created
+        offset = _OFFSET_STEP * round(drift / _OFFSET_STEP)
+        if abs(offset) <= _MAX_OFFSET and abs(drift - offset) <= _TOLERANCE:
+            parsed -= offset
+    return parsed.replace(microsecond=parsed.microsecond // 1000 * 1000)
+
+
+async def migrate_collection(database, name: str, batch_size: int = BATCH_SIZE, restart: bool = False) -> dict:
+    checkpoints = database[MIGRATIONS_COLLECTION]
+    checkpoint_id = f"creation_date:{name}"
+    state = None if restart else await checkpoints.find_one({"_id": checkpoint_id})
+    last_id: Optional[ObjectId] = state["last_id"] if state else None
+    converted = state["converted"] if state else 0
+
+    while True:
+        query = {"creation_date": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs: List[dict] = await database[name].find(
+            query, {"creation_date": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        operations = [
+            UpdateOne(
+                {"_id": doc["_id"], "creation_date": doc["creation_date"]},
+                {"$set": {"creation_date": parse_stored_date(doc["creation_date"], doc["_id"])}}
+            )
+            for doc in docs
+        ]
+        result = await database[name].bulk_write(operations, ordered=False)
+        converted += result.modified_count
+        last_id = docs[-1]["_id"]
+        await checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "converted": converted, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info("%s: converted %d documents (up to %s)", name, converted, last_id)
+
+    return {"converted": converted, "last_id": str(last_id) if last_id else None}
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store creation_date as a BSON date")
+    parser.add_argument("--collection", action="append", choices=COLLECTIONS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+
+    for name in args.collection or COLLECTIONS:
+        print(name, await migrate_collection(database, name, args.batch_size, args.restart))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
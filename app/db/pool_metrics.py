@@ -0,0 +1,136 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+from pymongo import monitoring
+
+# Upper bounds (in milliseconds) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class _PoolStats:
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = defaultdict(int)
+        self.wait_buckets: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.pool_clears = 0
+
+    def observe_wait(self, duration):
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self.wait_sum_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                self.wait_buckets[i] += 1
+                return
+        self.wait_buckets[-1] += 1
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener that records checkout wait times per server.
+
+    PyMongo calls listeners from its own threads, so updates hold a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _PoolStats] = defaultdict(_PoolStats)
+
+    def _stats(self, event) -> _PoolStats:
+        host, port = event.address
+        return self._pools[f"{host}:{port}"]
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._stats(event).pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._stats(event).open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._stats(event).open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            stats = self._stats(event)
+            stats.checkout_failures[str(event.reason)] += 1
+            stats.observe_wait(getattr(event, "duration", None))
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            stats = self._stats(event)
+            stats.checkouts += 1
+            stats.checked_out += 1
+            stats.observe_wait(getattr(event, "duration", None))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._stats(event).checked_out -= 1
+
+    def snapshot(self) -> dict:
+        """Return the current counters keyed by server address"""
+        with self._lock:
+            return {
+                address: {
+                    "open_connections": stats.open_connections,
+                    "checked_out": stats.checked_out,
+                    "checkouts": stats.checkouts,
+                    "checkout_failures": dict(stats.checkout_failures),
+                    "pool_clears": stats.pool_clears,
+                    "wait_ms": {
+                        "sum": round(stats.wait_sum_ms, 3),
+                        "max": round(stats.wait_max_ms, 3),
+                        "buckets": dict(zip([str(b) for b in WAIT_BUCKETS_MS] + ["+Inf"],
+                                            stats.wait_buckets)),
+                    },
+                }
+                for address, stats in self._pools.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Render the counters in the Prometheus text exposition format"""
+        lines = [
+            "# TYPE mongo_pool_open_connections gauge",
+            "# TYPE mongo_pool_checked_out gauge",
+            "# TYPE mongo_pool_checkout_failures_total counter",
+            "# TYPE mongo_pool_checkout_wait_ms histogram",
+        ]
+        for address, stats in self.snapshot().items():
+            label = f'address="{address}"'
+            lines.append(f"mongo_pool_open_connections{{{label}}} {stats['open_connections']}")
+            lines.append(f"mongo_pool_checked_out{{{label}}} {stats['checked_out']}")
+            for reason, count in stats["checkout_failures"].items():
+                lines.append(f'mongo_pool_checkout_failures_total{{{label},reason="{reason}"}} {count}')
+            cumulative = 0
+            for bound, count in stats["wait_ms"]["buckets"].items():
+                cumulative += count
+                lines.append(f'mongo_pool_checkout_wait_ms_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"mongo_pool_checkout_wait_ms_sum{{{label}}} {stats['wait_ms']['sum']}")
+            lines.append(f"mongo_pool_checkout_wait_ms_count{{{label}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+pool_metrics = PoolMetrics()
@@ -0,0 +1,199 @@
+"""Repair drift in materialized counters.
+
+Route handlers keep counters such as a question's answer_count or a user's
+question_count (app.db.user_stats) up to date with atomic $inc updates, but
+a crash between two writes (or a write made before the counter existed)
+leaves them off. The reconcilers below recompute them from the source
+collections in bounded batches and only rewrite the documents that differ.
+
+    python -m app.db.reconcile
+
+They also run periodically in the app when RECONCILE_INTERVAL_SECONDS > 0.
+Whatever the interval, each reconciler runs once at the first startup
+after it is added (recorded in "migrations"), so counters introduced for
+existing data, such as user-stats, are backfilled without waiting for a
+manual run.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import List
+
+from pymongo import UpdateOne
+
+from app.core.dates import as_datetime
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+MIGRATIONS_COLLECTION = "migrations"
+
+
+async def _repair_question_batch(database, batch: List[dict]) -> int:
+    question_ids = [q["question_id"] for q in batch]
+    pipeline = [
+        {"$match": {"question_id": {"$in": question_ids}}},
+        {"$group": {
+            "_id": "$question_id",
+            "count": {"$sum": 1},
+            "last": {"$max": "$creation_date"},
+        }},
+    ]
+    actual = {}
+    async for group in database["forum-answer"].aggregate(pipeline):
+        actual[group["_id"]] = group
+
+    operations = []
+    for question in batch:
+        group = actual.get(question["question_id"])
+        last_answer_at = as_datetime(group["last"]) if group else None
+        created_at = as_datetime(question.get("creation_date")) or question["_id"].generation_time.replace(tzinfo=None)
+        expected = {
+            "answer_count": group["count"] if group else 0,
+            "last_answer_at": last_answer_at,
+            "last_activity_at": max(created_at, last_answer_at) if last_answer_at else created_at,
+        }
+        if any(question.get(field) != value for field, value in expected.items()):
+            operations.append(UpdateOne({"_id": question["_id"]}, {"$set": expected}))
+
+    if operations:
+        await database["forum-question"].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def reconcile_question_activity(database, batch_size: int = BATCH_SIZE) -> dict:
+    """Recompute answer_count, last_answer_at and last_activity_at of every question"""
+    checked = repaired = 0
+    batch = []
+    cursor = database["forum-question"].find(
+        {},
+        {"question_id": 1, "creation_date": 1, "answer_count": 1, "last_answer_at": 1, "last_activity_at": 1}
+    ).sort("_id", 1).batch_size(batch_size)
+
+    async for question in cursor:
+        batch.append(question)
+        if len(batch) == batch_size:
+            repaired += await _repair_question_batch(database, batch)
+            checked += len(batch)
+            batch = []
+    if batch:
+        repaired += await _repair_question_batch(database, batch)
+        checked += len(batch)
+
+    return {"checked": checked, "repaired": repaired}
+
+
+# Authored collection -> user-stats counter
+USER_STATS_SOURCES = {
+    "forum-question": "question_count",
+    "forum-answer": "answer_count",
+    "query": "query_count",
+}
+
+
+async def _repair_user_stats_batch(database, batch: List[dict]) -> int:
+    user_ids = [str(user["_id"]) for user in batch]
+    expected = {
+        user_id: {**{field: 0 for field in USER_STATS_SOURCES.values()}, "last_activity_at": None}
+        for user_id in user_ids
+    }
+    for collection, field in USER_STATS_SOURCES.items():
+        pipeline = [
+            {"$match": {"user_id": {"$in": user_ids}}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}, "last": {"$max": "$creation_date"}}},
+        ]
+        async for group in database[collection].aggregate(pipeline):
+            stats = expected[group["_id"]]
+            stats[field] = group["count"]
+            last = as_datetime(group["last"])
+            if last and (stats["last_activity_at"] is None or last > stats["last_activity_at"]):
+                stats["last_activity_at"] = last
+
+    for user in batch:
+        expected[str(user["_id"])]["join_date"] = (
+            as_datetime(user.get("created_at")) or user["_id"].generation_time.replace(tzinfo=None)
+        )
+
+    current = {}
+    async for doc in database["user-stats"].find({"_id": {"$in": user_ids}}):
+        current[doc["_id"]] = doc
+
+    operations = []
+    for user_id, stats in expected.items():
+        doc = current.get(user_id, {})
+        if any(doc.get(field) != value for field, value in stats.items()):
+            operations.append(UpdateOne({"_id": user_id}, {"$set": stats}, upsert=True))
+
+    if operations:
+        await database["user-stats"].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def reconcile_user_stats(database, batch_size: int = BATCH_SIZE) -> dict:
+    """Recompute every user's question, answer and query counts, last activity and join date"""
+    checked = repaired = 0
+    batch = []
+    cursor = database["user"].find({}, {"created_at": 1}).sort("_id", 1).batch_size(batch_size)
+
+    async for user in cursor:
+        batch.append(user)
+        if len(batch) == batch_size:
+            repaired += await _repair_user_stats_batch(database, batch)
+            checked += len(batch)
+            batch = []
+    if batch:
+        repaired += await _repair_user_stats_batch(database, batch)
+        checked += len(batch)
+
+    return {"checked": checked, "repaired": repaired}
+
+
+# Every reconciler, run in order by reconcile_all
+RECONCILERS = {
+    "question_activity": reconcile_question_activity,
+    "user_stats": reconcile_user_stats,
+}
+
+
+async def reconcile_all(database) -> dict:
+    results = {}
+    for name, reconciler in RECONCILERS.items():
+        results[name] = await reconciler(database)
+        logger.info("Reconciled %s: %s", name, results[name])
+    return results
+
+
+async def backfill_once(database) -> dict:
+    """Run every reconciler that has never completed on this database"""
+    results = {}
+    migrations = database[MIGRATIONS_COLLECTION]
+    for name, reconciler in RECONCILERS.items():
+        marker = f"reconcile:{name}"
+        if await migrations.find_one({"_id": marker}):
+            continue
+        results[name] = await reconciler(database)
+        await migrations.update_one(
+            {"_id": marker},
+            {"$set": {**results[name], "finished_at": datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info("Backfilled %s: %s", name, results[name])
+    return results
+
+
+async def reconcile_forever(database, interval: float):
+    """Background task used by the app lifespan"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile_all(database)
+        except Exception as e:
+            logger.error("Reconciliation failed: %s", e)
+
+
+if __name__ == "__main__":
+    from app.db.database import database
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(reconcile_all(database)))
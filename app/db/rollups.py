@@ -0,0 +1,242 @@
+"""Per-model, per-hour rollups of query traffic and user ratings.
+
+Each document in "model-rollup" covers one model alias and one hour of
+query creation time:
+
+    {"model", "hour", "query_count", "latency_ms_sum", "latency_ms_max",
+     "rating_count", "rating_sum", "rating_histogram": {"0".."5": n},
+     "feedback_count"}
+
+create_query, update_query and delete_query keep them current with $inc.
+A rating is filed under the hour its query was created, so a bucket can
+always be recomputed from the query collection. To rebuild the buckets
+from stored queries (e.g. the ones made before rollups existed):
+
+    python -m app.db.rollups [--since 2025-01-01] [--until 2025-02-01]
+
+Only the hours covered by the scan are rewritten; buckets in that range
+whose queries are all gone are deleted. Ratings made while it runs may
+be lost for those hours; run it again to pick them up.
+"""
+import argparse
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+
+from app.db.database import model_rollup_collection
+from app.core.dates import as_datetime
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "model-rollup"
+
+# Queries stored before the model name was recorded
+UNKNOWN_MODEL = "unknown"
+
+RATING_BINS = [str(rating) for rating in range(6)]
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+BATCH_SIZE = 1000
+
+
+def bucket_hour(creation_date) -> datetime:
+    created = as_datetime(creation_date) or datetime.utcnow()
+    return created.replace(minute=0, second=0, microsecond=0)
+
+
+def rating_bin(rating: float) -> str:
+    return RATING_BINS[min(max(int(math.floor(rating)), 0), len(RATING_BINS) - 1)]
+
+
+def _rating_inc(rating: Optional[float], sign: int) -> dict:
+    if rating is None:
+        return {}
+    return {
+        "rating_count": sign,
+        "rating_sum": sign * rating,
+        f"rating_histogram.{rating_bin(rating)}": sign,
+    }
+
+
+def _merge_inc(*parts: dict) -> dict:
+    merged: Dict[str, float] = {}
+    for part in parts:
+        for field, value in part.items():
+            merged[field] = merged.get(field, 0) + value
+    return {field: value for field, value in merged.items() if value != 0}
+
+
+def _bucket_filter(doc: dict) -> dict:
+    return {"model": doc.get("model_name") or UNKNOWN_MODEL, "hour": bucket_hour(doc.get("creation_date"))}
+
+
+async def record_query(doc: dict):
+    """Count a newly created query"""
+    latency = doc.get("latency_ms") or 0
+    await model_rollup_collection.update_one(
+        _bucket_filter(doc),
+        {"$inc": {"query_count": 1, "latency_ms_sum": latency}, "$max": {"latency_ms_max": latency}},
+        upsert=True
+    )
+
+
+async def record_rating(doc: dict, update: dict):
+    """Apply an update_query change of user_rating/user_feedback to the query's bucket"""
+    increments = {}
+    if "user_rating" in update and update["user_rating"] != doc.get("user_rating"):
+        increments = _merge_inc(_rating_inc(doc.get("user_rating"), -1), _rating_inc(update["user_rating"], 1))
+    if "user_feedback" in update and bool(update["user_feedback"]) != bool(doc.get("user_feedback")):
+        increments["feedback_count"] = 1 if update["user_feedback"] else -1
+    if increments:
+        await model_rollup_collection.update_one(_bucket_filter(doc), {"$inc": increments}, upsert=True)
+
+
+async def remove_query(doc: dict):
+    """Take a deleted query back out of its bucket (latency_ms_max is kept)"""
+    increments = _merge_inc(
+        {"query_count": -1, "latency_ms_sum": -(doc.get("latency_ms") or 0)},
+        _rating_inc(doc.get("user_rating"), -1),
+        {"feedback_count": -1} if doc.get("user_feedback") else {},
+    )
+    await model_rollup_collection.update_one(_bucket_filter(doc), {"$inc": increments})
+
+
+def rollup_pipeline(model: Optional[str], since: datetime, until: datetime, granularity: str) -> list:
+    """Aggregate hourly buckets into periods of the given granularity"""
+    match = {"hour": {"$gte": since, "$lt": until}}
+    if model:
+        match["model"] = model
+    period = "$hour" if granularity == "hour" else {"$dateTrunc": {"date": "$hour", "unit": granularity}}
+
+    group = {
+        "_id": {"model": "$model", "period": period},
+        "query_count": {"$sum": "$query_count"},
+        "latency_ms_sum": {"$sum": "$latency_ms_sum"},
+        "latency_ms_max": {"$max": "$latency_ms_max"},
+        "rating_count": {"$sum": "$rating_count"},
+        "rating_sum": {"$sum": "$rating_sum"},
+        "feedback_count": {"$sum": "$feedback_count"},
+    }
+    for rating in RATING_BINS:
+        group[f"rating_{rating}"] = {"$sum": f"$rating_histogram.{rating}"}
+
+    return [
+        {"$match": match},
+        {"$group": group},
+        {"$sort": {"_id.model": 1, "_id.period": 1}},
+    ]
+
+
+def to_period_doc(group: dict) -> dict:
+    query_count = group["query_count"]
+    rating_count = group["rating_count"]
+    return {
+        "model": group["_id"]["model"],
+        "period_start": group["_id"]["period"],
+        "query_count": query_count,
+        "avg_latency_ms": group["latency_ms_sum"] / query_count if query_count else None,
+        "max_latency_ms": group.get("latency_ms_max"),
+        "rating_count": rating_count,
+        "avg_rating": group["rating_sum"] / rating_count if rating_count else None,
+        "rating_histogram": {rating: group[f"rating_{rating}"] for rating in RATING_BINS},
+        "feedback_count": group["feedback_count"],
+    }
+
+
+def _add_to_bucket(buckets: Dict[Tuple[str, datetime], dict], doc: dict):
+    key = tuple(_bucket_filter(doc).values())
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = buckets[key] = {
+            "query_count": 0, "latency_ms_sum": 0, "latency_ms_max": 0,
+            "rating_count": 0, "rating_sum": 0, "feedback_count": 0,
+            "rating_histogram": {rating: 0 for rating in RATING_BINS},
+        }
+    latency = doc.get("latency_ms") or 0
+    bucket["query_count"] += 1
+    bucket["latency_ms_sum"] += latency
+    bucket["latency_ms_max"] = max(bucket["latency_ms_max"], latency)
+    rating = doc.get("user_rating")
+    if rating is not None:
+        bucket["rating_count"] += 1
+        bucket["rating_sum"] += rating
+        bucket["rating_histogram"][rating_bin(rating)] += 1
+    if doc.get("user_feedback"):
+        bucket["feedback_count"] += 1
+
+
+async def backfill(database, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                   batch_size: int = BATCH_SIZE) -> dict:
+    """Recompute the buckets of every query created in [since, until).
+
+    Queries are streamed in batches; only the buckets (models x hours, a
+    few thousand per year) are held in memory.
+    """
+    buckets: Dict[Tuple[str, datetime], dict] = {}
+    scanned = 0
+
+    # _id times are UTC while older creation dates are local time; a day
+    # of slack keeps the _id range from cutting off queries near the edges
+    id_range = {}
+    if since:
+        id_range["$gte"] = ObjectId.from_datetime(since - timedelta(days=1))
+    if until:
+        id_range["$lt"] = ObjectId.from_datetime(until + timedelta(days=1))
+
+    cursor = database["query"].find(
+        {"_id": id_range} if id_range else {},
+        {"_id": 0, "model_name": 1, "creation_date": 1, "latency_ms": 1, "user_rating": 1, "user_feedback": 1}
+    ).batch_size(batch_size)
+
+    async for doc in cursor:
+        scanned += 1
+        hour = bucket_hour(doc.get("creation_date"))
+        if (since and hour < since) or (until and hour >= until):
+            continue
+        _add_to_bucket(buckets, doc)
+        if scanned % batch_size == 0:
+            logger.info("Backfill scanned %d queries, %d buckets", scanned, len(buckets))
+
+    # Buckets in the range that no scanned query falls into any more
+    hour_range = {}
+    if since:
+        hour_range["$gte"] = since
+    if until:
+        hour_range["$lt"] = until
+    stale = []
+    async for doc in database[ROLLUP_COLLECTION].find({"hour": hour_range} if hour_range else {},
+                                                      {"model": 1, "hour": 1}):
+        if (doc.get("model"), doc.get("hour")) not in buckets:
+            stale.append(DeleteOne({"_id": doc["_id"]}))
+
+    operations = stale + [
+        UpdateOne({"model": model, "hour": hour}, {"$set": bucket}, upsert=True)
+        for (model, hour), bucket in buckets.items()
+    ]
+    for start in range(0, len(operations), batch_size):
+        await database[ROLLUP_COLLECTION].bulk_write(operations[start:start + batch_size], ordered=False)
+
+    return {"scanned": scanned, "buckets": len(buckets), "deleted": len(stale)}
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild model-rollup buckets from stored queries")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.db.database import database
+
+    print(await backfill(database, args.since, args.until, args.batch_size))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
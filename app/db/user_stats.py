@@ -0,0 +1,47 @@
+"""Per-user activity counters behind GET /user/stats.
+
+One document per user in the "user-stats" collection, keyed by the user
+id, so a profile view is a single _id lookup:
+
+    {"_id": user_id, "question_count", "answer_count", "query_count",
+     "last_activity_at", "join_date"}
+
+Create/delete handlers adjust the counts with $inc. Deletes leave
+last_activity_at as is, and join_date is filled in by
+app.db.reconcile.reconcile_user_stats, which also repairs any drift.
+"""
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+
+from app.db.database import user_stats_collection
+
+async def record_created(user_id: str, field: str, at: Optional[datetime] = None):
+    """Count a new question, answer or query for its author"""
+    at = at or datetime.utcnow()
+    await user_stats_collection.update_one(
+        {"_id": user_id},
+        {"$inc": {field: 1}, "$max": {"last_activity_at": at.replace(microsecond=at.microsecond // 1000 * 1000)}},
+        upsert=True
+    )
+
+
+async def record_deleted(user_id: str, field: str, count: int = 1):
+    # Never below zero; the reconciler repairs a counter that was missing
+    await user_stats_collection.update_one({"_id": user_id, field: {"$gte": count}}, {"$inc": {field: -count}})
+
+
+def to_stats_response(user_id: str, doc: Optional[dict]) -> dict:
+    doc = doc or {}
+    join_date = doc.get("join_date")
+    if join_date is None and ObjectId.is_valid(user_id):
+        # User ids are generated at registration
+        join_date = ObjectId(user_id).generation_time.replace(tzinfo=None)
+    return {
+        "total_questions": doc.get("question_count", 0),
+        "total_answers": doc.get("answer_count", 0),
+        "total_queries": doc.get("query_count", 0),
+        "most_recent_activity": doc.get("last_activity_at"),
+        "join_date": join_date,
+    }
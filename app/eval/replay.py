@@ -0,0 +1,263 @@
+"""Replay stored queries against candidate models and report on the results.
+
+Streams documents from the query collection, sends each prompt to every
+model given with --model (an alias from MODEL_ALIASES or any Ollama model
+tag) over a pool of Ollama backends, and appends one JSON line per
+(query, model) to the output file (gzip-compressed if it ends in .gz):
+
+    python -m app.eval.replay --model socialNorm --model socialNorm:candidate \\
+        --backend http://gpu1:11434 --backend http://gpu2:11434 \\
+        --concurrency 4 --source-model socialNorm --limit 2000 \\
+        --output replay.jsonl.gz
+
+Results are written and checkpointed one batch at a time, so an
+interrupted run started again with the same --output picks up after the
+last completed batch. When the run finishes, or with --report-only, a
+report is printed with throughput, latency percentiles and how far each
+model's answers drift from the stored responses and from each other.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+DEFAULT_BACKEND = "http://localhost:11434"
+
+# Answers less similar than this to the stored response are listed in the report
+DIFF_THRESHOLD = 0.5
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+def similarity(first: Optional[str], second: Optional[str]) -> Optional[float]:
+    if first is None or second is None:
+        return None
+    return round(SequenceMatcher(None, first, second, autojunk=False).ratio(), 4)
+
+
+def resolve_model(model: str) -> str:
+    from app.api.routes.query import MODEL_ALIASES
+    return MODEL_ALIASES.get(model, model)
+
+
+def open_output(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def checkpoint_path(output: str) -> str:
+    return output + ".checkpoint"
+
+
+def read_checkpoint(output: str) -> Optional[dict]:
+    try:
+        with open(checkpoint_path(output), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(output: str, state: dict):
+    path = checkpoint_path(output)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+class BackendPool:
+    """Ollama clients with a fixed number of in-flight requests each.
+
+    A request takes whichever backend has a free slot first, so a slow
+    backend gets fewer requests instead of holding the others back.
+    """
+
+    def __init__(self, hosts: List[str], concurrency: int, client_factory: Optional[Callable] = None):
+        if client_factory is None:
+            from ollama import AsyncClient
+            client_factory = AsyncClient
+        self._slots: asyncio.Queue = asyncio.Queue()
+        for host in hosts:
+            client = client_factory(host=host)
+            for _ in range(concurrency):
+                self._slots.put_nowait((host, client))
+
+    async def generate(self, model: str, prompt: str) -> dict:
+        host, client = await self._slots.get()
+        started = time.time()
+        try:
+            response = await client.generate(model=model, prompt=prompt)
+            text, error = (response.get("response") or "").strip(), None
+        except Exception as e:
+            text, error = None, str(e)
+        finally:
+            self._slots.put_nowait((host, client))
+        finished = time.time()
+        return {
+            "backend": host,
+            "started_at": started,
+            "latency_ms": round((finished - started) * 1000, 1),
+            "response": text,
+            "error": error,
+        }
+
+
+async def stored_queries(database, after: Optional[str] = None, source_model: Optional[str] = None,
+                         batch_size: int = BATCH_SIZE) -> AsyncIterator[dict]:
+    """Stored queries in _id order, starting after the given _id"""
+    query = {}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    if source_model:
+        query["model_name"] = source_model
+    cursor = database["query"].find(
+        query, {"query_id": 1, "query": 1, "response": 1, "model_name": 1, "latency_ms": 1}
+    ).sort("_id", 1).batch_size(batch_size)
+    async for doc in cursor:
+        yield doc
+
+
+async def _replay_batch(pool: BackendPool, models: List[str], batch: List[dict]) -> List[dict]:
+    async def run(doc, model):
+        result = await pool.generate(resolve_model(model), doc["query"])
+        return {
+            "query_id": doc.get("query_id"),
+            "model": model,
+            **result,
+            "stored_model": doc.get("model_name"),
+            "stored_latency_ms": doc.get("latency_ms"),
+            "stored_similarity": similarity(doc.get("response"), result["response"]),
+            "stored_response": doc.get("response"),
+        }
+
+    return await asyncio.gather(*(run(doc, model) for doc in batch for model in models))
+
+
+async def replay(source: AsyncIterator[dict], pool: BackendPool, models: List[str], output: str,
+                 limit: Optional[int] = None, batch_size: int = BATCH_SIZE) -> dict:
+    """Replay queries from `source` and append the results to `output`.
+
+    `source` should already start after the checkpoint (see stored_queries).
+    Returns the checkpoint state after the last batch.
+    """
+    state = read_checkpoint(output) or {"last_id": None, "replayed": 0}
+    batch: List[dict] = []
+
+    async def flush():
+        results = await _replay_batch(pool, models, batch)
+        with open_output(output, "a") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        state["last_id"] = str(batch[-1]["_id"])
+        state["replayed"] += len(batch)
+        write_checkpoint(output, state)
+        logger.info("Replayed %d queries", state["replayed"])
+        batch.clear()
+
+    async for doc in source:
+        if limit is not None and state["replayed"] + len(batch) >= limit:
+            break
+        batch.append(doc)
+        if len(batch) == batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return state
+
+
+def build_report(output: str, diff_examples: int = 5) -> dict:
+    """Summarize a results file: per-model throughput, latency, errors and answer drift"""
+    by_model: Dict[str, List[dict]] = defaultdict(list)
+    responses: Dict[str, Dict[str, str]] = defaultdict(dict)
+    with open_output(output, "r") as f:
+        for line in f:
+            result = json.loads(line)
+            by_model[result["model"]].append(result)
+            if result["response"] is not None:
+                responses[result["query_id"]][result["model"]] = result["response"]
+
+    models = {}
+    for model, results in sorted(by_model.items()):
+        ok = [r for r in results if r["error"] is None]
+        latencies = sorted(r["latency_ms"] for r in ok)
+        span = max(r["started_at"] + r["latency_ms"] / 1000 for r in results) - min(r["started_at"] for r in results)
+        similarities = [r["stored_similarity"] for r in ok if r["stored_similarity"] is not None]
+        stored_latencies = sorted(r["stored_latency_ms"] for r in ok if r.get("stored_latency_ms") is not None)
+        drifted = sorted(
+            (r for r in ok if r["stored_similarity"] is not None and r["stored_similarity"] < DIFF_THRESHOLD),
+            key=lambda r: r["stored_similarity"]
+        )
+        models[model] = {
+            "requests": len(results),
+            "errors": len(results) - len(ok),
+            "throughput_rps": round(len(results) / span, 2) if span > 0 else None,
+            "latency_ms": {f"p{p}": percentile(latencies, p) for p in (50, 90, 99)},
+            "stored_latency_ms": {f"p{p}": percentile(stored_latencies, p) for p in (50, 90, 99)},
+            "mean_stored_similarity": round(sum(similarities) / len(similarities), 4) if similarities else None,
+            "drifted": len(drifted),
+            "drift_examples": [
+                {"query_id": r["query_id"], "similarity": r["stored_similarity"],
+                 "stored": r["stored_response"][:200], "replayed": r["response"][:200]}
+                for r in drifted[:diff_examples]
+            ],
+        }
+
+    pairs = {}
+    for first, second in combinations(sorted(by_model), 2):
+        scores = [
+            similarity(answers[first], answers[second])
+            for answers in responses.values() if first in answers and second in answers
+        ]
+        pairs[f"{first} vs {second}"] = {
+            "compared": len(scores),
+            "mean_similarity": round(sum(scores) / len(scores), 4) if scores else None,
+        }
+
+    return {"models": models, "model_pairs": pairs}
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay stored queries against candidate models")
+    parser.add_argument("--model", action="append", required=True, help="model alias or Ollama tag (repeatable)")
+    parser.add_argument("--backend", action="append", help=f"Ollama host (repeatable, default {DEFAULT_BACKEND})")
+    parser.add_argument("--concurrency", type=int, default=2, help="in-flight requests per backend")
+    parser.add_argument("--source-model", help="only replay queries originally sent to this model")
+    parser.add_argument("--limit", type=int, help="stop after this many queries in total")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--report-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.report_only:
+        from app.db.database import database
+
+        checkpoint = read_checkpoint(args.output) or {}
+        pool = BackendPool(args.backend or [DEFAULT_BACKEND], args.concurrency)
+        source = stored_queries(database, checkpoint.get("last_id"), args.source_model, args.batch_size)
+        state = await replay(source, pool, args.model, args.output, args.limit, args.batch_size)
+        print(f"Replayed {state['replayed']} queries into {args.output}")
+
+    print(json.dumps(build_report(args.output), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,17 +1,69 @@
 import asyncio
-from app.db.database import test_connection
+from contextlib import asynccontextmanager
+from app.db.database import database, test_connection, create_indexes, get_client, close_client
+from app.db.reconcile import backfill_once, reconcile_forever
+from app.core.search import rebuild_forever as rebuild_search_forever
+from app.core.dedup import build_duplicate_index
+from app.core.trending import trending_forever
+from app.core.quota import flush_quota_forever, quota_tracker
+from app.db.cascade import cascade_worker
+from app.core.config import settings
+from app.db.pool_metrics import pool_metrics
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.etag import ETAG_HEADER
 #from app.database import register_user
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 #from app.api.routes import history
 from app.api.routes.history import router as history_router
 from app.api.routes.forum import router as forum_router
 from app.api.routes.user import router as user_router
 from app.api.routes.auth import router as auth_router
 from app.api.routes.query import router as query_router
+from app.api.routes.events import router as events_router
+from app.api.routes.analytics import router as analytics_router
 from fastapi.middleware.cors import CORSMiddleware
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the MongoDB pool when the worker starts, not when it is imported
+    get_client()
+    await test_connection()
+    await create_indexes()
+
+    background_tasks = [
+        asyncio.create_task(rebuild_search_forever(database, settings.search_rebuild_interval_seconds)),
+        asyncio.create_task(build_duplicate_index(database)),
+        asyncio.create_task(trending_forever(database, settings.trending_persist_interval_seconds)),
+        asyncio.create_task(flush_quota_forever(database, settings.quota_flush_interval_seconds)),
+        asyncio.create_task(cascade_worker.run_forever(database, settings.cascade_poll_interval_seconds)),
+    ]
+    background_tasks.append(asyncio.create_task(backfill_reconcilers()))
+    if settings.reconcile_interval_seconds > 0:
+        background_tasks.append(asyncio.create_task(
+            reconcile_forever(database, settings.reconcile_interval_seconds)
+        ))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    try:
+        await quota_tracker.flush(database)
+    except Exception as e:
+        print(f"Could not save LLM usage: {e}")
+    close_client()
+
+
+async def backfill_reconcilers():
+    try:
+        await backfill_once(database)
+    except Exception as e:
+        print(f"Could not backfill counters: {e}")
+
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,6 +72,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # This allows all methods
     allow_headers=["*"],  # This allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],  # Keyset pagination cursor, conditional GETs
 )
 
 # Include your history router
@@ -28,6 +81,8 @@ app.include_router(forum_router)
 app.include_router(user_router, prefix="/user")
 app.include_router(auth_router, prefix="/auth")
 app.include_router(query_router, prefix="/query")
+app.include_router(events_router)
+app.include_router(analytics_router, prefix="/analytics")
 
 print("🚀 Main.py yüklendi")
 @app.get("/")
@@ -35,6 +90,7 @@ def root():
     return {"message": "API ayakta ✅"}
 
 
-@app.on_event("startup")
-async def startup_event():
-    await test_connection()
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """MongoDB connection pool metrics in Prometheus text format"""
+    return pool_metrics.render_prometheus()
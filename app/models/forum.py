@@ -23,7 +23,12 @@ class ForumQuestion(BaseModel):
     user_id: str
     question_header: str
     question: str
-    creation_date: str
+    creation_date: datetime
+    # Maintained by create_answer/delete_answer, repaired by app.db.reconcile
+    answer_count: int = 0
+    last_answer_at: Optional[datetime] = None
+    # Creation time or latest answer time, whichever is newer; the activity sort key
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         json_encoders = {ObjectId: str}
@@ -46,7 +51,7 @@ class ForumAnswer(BaseModel):
     question_id: str
     user_id: str
     answer: str
-    creation_date: str
+    creation_date: datetime
 
     class Config:
         json_encoders = {ObjectId: str}
@@ -25,7 +25,7 @@ class Query(BaseModel):
     model_name: str  # Added model name field
     user_rating: Optional[float] = None
     user_feedback: Optional[str] = None
-    creation_date: str
+    creation_date: datetime
     history_id: str
 
     class Config:
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 
@@ -26,6 +26,35 @@ class UserResponse(UserBase):
     created_at: datetime
 
 
+class UserUpdateResponse(UserResponse):
+    # Set when the username changed: the old token carries the old name and is revoked
+    access_token: Optional[str] = None
+    token_type: Optional[str] = None
+    expires_at: Optional[int] = None
+
+
+class UserStats(BaseModel):
+    total_questions: int = 0
+    total_answers: int = 0
+    total_queries: int = 0
+    most_recent_activity: Optional[datetime] = None
+    join_date: Optional[datetime] = None
+
+
+class DeletionJob(BaseModel):
+    id: str
+    kind: str
+    target: str
+    status: str
+    steps_done: int
+    steps_total: int
+    deleted: Dict[str, int] = {}
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -36,6 +65,9 @@ class UserUpdate(BaseModel):
 
 class TokenData(BaseModel):
     user_id: str
+    username: Optional[str] = None
+    token_version: int = 0
+    tier: Optional[str] = None
     exp: Optional[datetime] = None
 
 
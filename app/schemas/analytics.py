@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class ModelRollupPeriod(BaseModel):
+    model: str
+    period_start: datetime
+    query_count: int = 0
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+    rating_count: int = 0
+    avg_rating: Optional[float] = None
+    rating_histogram: Dict[str, int] = {}
+    feedback_count: int = 0
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "model": "socialNorm",
+                "period_start": "2025-05-12T00:00:00",
+                "query_count": 412,
+                "avg_latency_ms": 1830.4,
+                "max_latency_ms": 9120.0,
+                "rating_count": 57,
+                "avg_rating": 4.1,
+                "rating_histogram": {"0": 0, "1": 2, "2": 3, "3": 8, "4": 19, "5": 25},
+                "feedback_count": 11
+            }
+        }
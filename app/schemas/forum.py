@@ -25,7 +25,11 @@ class ForumQuestionResponse(BaseModel):
     user_id: str
     question_header: str
     question: str
-    creation_date: str
+    creation_date: datetime
+    username: Optional[str] = None
+    answer_count: int = 0
+    last_answer_at: Optional[datetime] = None
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         schema_extra = {
@@ -35,11 +39,30 @@ class ForumQuestionResponse(BaseModel):
                 "user_id": "60d21b4667d0d63dc98fc3aa",
                 "question_header": "How to interpret non-verbal cues?",
                 "question": "I struggle with understanding non-verbal communication. Can anyone share tips on how to recognize and interpret common social cues?",
-                "creation_date": "2025-05-14T12:34:56.789Z"
+                "creation_date": "2025-05-14T12:34:56.789Z",
+                "answer_count": 1,
+                "last_answer_at": "2025-05-14T12:45:56.789Z",
+                "last_activity_at": "2025-05-14T12:45:56.789Z"
             }
         }
 
 
+class ForumTrendingQuestion(ForumQuestionResponse):
+    # Decayed activity score at request time; only comparable within one response
+    trending_score: float
+
+
+class ForumDuplicateHint(BaseModel):
+    question_id: str
+    question_header: str
+    similarity: float
+
+
+class ForumQuestionCreateResponse(ForumQuestionResponse):
+    # Existing questions that look like near-duplicates of the new one
+    possible_duplicates: List[ForumDuplicateHint] = []
+
+
 class ForumAnswerCreate(BaseModel):
     answer_id: Optional[str] = None
     question_id: str
@@ -61,7 +84,8 @@ class ForumAnswerResponse(BaseModel):
     question_id: str
     user_id: str
     answer: str
-    creation_date: str
+    creation_date: datetime
+    username: Optional[str] = None
 
     class Config:
         schema_extra = {
@@ -73,4 +97,17 @@ class ForumAnswerResponse(BaseModel):
                 "answer": "One effective strategy is to focus on facial expressions. Start by learning to recognize basic emotions like happiness, sadness, anger, surprise, fear and disgust through facial expressions.",
                 "creation_date": "2025-05-14T12:45:56.789Z"
             }
-        }
\ No newline at end of file
+        }
+
+
+class ForumThreadResponse(BaseModel):
+    question: ForumQuestionResponse
+    answers: List[ForumAnswerResponse]
+    next_cursor: Optional[str] = None
+
+
+class ForumSearchHit(BaseModel):
+    type: str  # "question" or "answer"
+    score: float
+    question: Optional[ForumQuestionResponse] = None
+    answer: Optional[ForumAnswerResponse] = None
@@ -1,7 +1,10 @@
 # === schemas/history.py ===
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+# Query ids accepted by one bulk history request
+MAX_BULK_QUERY_IDS = 1000
+
 class HistoryCreate(BaseModel):
     #user_id: str
     history_id: Optional[str] = None
@@ -10,6 +13,19 @@ class HistoryCreate(BaseModel):
 class HistoryUpdate(BaseModel):
     query_id: str  # used to append to query_set
 
+class HistoryBulkUpdate(BaseModel):
+    query_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_QUERY_IDS)
+
+class HistoryMove(BaseModel):
+    source_history_id: str
+    target_history_id: str
+    query_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_QUERY_IDS)
+
+class HistoryBulkResult(BaseModel):
+    message: str
+    added: int = 0
+    removed: int = 0
+
 class HistoryResponse(BaseModel):
     id: str
     user_id: str
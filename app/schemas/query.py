@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, List
+from datetime import datetime
 
 class QueryCreate(BaseModel):
     query_id: Optional[str] = None  # Made optional, will be generated if not provided
@@ -13,10 +14,12 @@ class QueryResponse(BaseModel):
     user_id: str
     query: str
     response: str
-    creation_date: str
+    creation_date: datetime
     history_id: str
     user_rating: Optional[float] = None
     user_feedback: Optional[str] = None
+    model_name: Optional[str] = None
+    latency_ms: Optional[float] = None
 
     class Config:
         from_attributes = True
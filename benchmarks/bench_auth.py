@@ -0,0 +1,56 @@
+"""Microbenchmarks for the per-request cost of the auth dependencies.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_auth
+
+The token version of the benchmark user is pre-seeded, so no MongoDB
+connection is needed and only the JWT handling is measured.
+"""
+import asyncio
+import time
+import timeit
+
+from bson import ObjectId
+
+from app.core import auth
+from app.core.security import JWTBearer
+
+ITERATIONS = 20000
+
+
+def bench(label, fn, iterations=ITERATIONS):
+    seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+    print(f"{label:<48} {seconds / iterations * 1e6:8.2f} us/request")
+
+
+def main():
+    user_id = str(ObjectId())
+    token, _ = auth.create_access_token(
+        data=auth.build_token_claims({"id": user_id, "username": "bench_user", "token_version": 0})
+    )
+    auth.remember_token_version(user_id, 0)
+    auth.TOKEN_VERSION_TTL_SECONDS = 10 ** 9
+
+    loop = asyncio.new_event_loop()
+    bearer = JWTBearer()
+
+    def claims_dependency():
+        loop.run_until_complete(auth.get_current_user_claims(token))
+
+    for cached in (False, True):
+        auth.token_cache.clear()
+        auth.token_cache.maxsize = 4096 if cached else 0
+        suffix = "with cache" if cached else "without cache"
+        bench(f"decode_access_token ({suffix})", lambda: auth.decode_access_token(token))
+        bench(f"JWTBearer.verify_jwt ({suffix})", lambda: bearer.verify_jwt(token))
+        bench(f"get_current_user_claims ({suffix})", claims_dependency)
+
+    print(f"cache hits={auth.token_cache.hits} misses={auth.token_cache.misses}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    print(f"total {time.perf_counter() - start:.1f}s")
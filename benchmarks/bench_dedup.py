@@ -0,0 +1,78 @@
+"""Benchmarks for the in-process near-duplicate question index.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dedup                 # 100k questions
+    python -m benchmarks.bench_dedup --sizes 10000 100000
+
+Questions are synthetic: words drawn from a Zipf-like vocabulary, 10-80
+words each. Reports build time, resident memory growth and find_similar
+latency for 48- and 200-word questions.
+"""
+import argparse
+import itertools
+import random
+import resource
+import statistics
+import time
+
+from app.core.dedup import DuplicateIndex
+
+VOCABULARY_SIZE = 50000
+
+
+def make_vocabulary(rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(VOCABULARY_SIZE)]
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(latencies, share):
+    return latencies[max(int(len(latencies) * share) - 1, 0)]
+
+
+def bench(size, rng, vocabulary, cum_weights):
+    questions = [
+        {"question_id": f"q{i}", "question_header": "",
+         "question": " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(10, 80)))}
+        for i in range(size)
+    ]
+    rss_before = max_rss_mb()
+    index = DuplicateIndex()
+    start = time.perf_counter()
+    for question in questions:
+        index.add(question)
+    build_seconds = time.perf_counter() - start
+    rss_growth = max_rss_mb() - rss_before
+
+    print(f"{size:>9} questions: build {build_seconds:6.1f}s ({build_seconds * 1e6 / size:5.0f} us/add), "
+          f"rss +{rss_growth:7.1f} MB")
+    for words in (48, 200):
+        texts = [" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words)) for _ in range(200)]
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            index.find_similar(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(f"    {words:>3}-word lookup p50 {statistics.median(latencies):6.3f} ms, "
+              f"p99 {percentile(latencies, 0.99):6.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    for size in args.sizes:
+        bench(size, rng, vocabulary, cum_weights)
+
+
+if __name__ == "__main__":
+    main()
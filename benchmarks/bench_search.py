@@ -0,0 +1,74 @@
+"""Benchmarks for the in-process forum search index.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search                # 100k and 1M posts
+    python -m benchmarks.bench_search --sizes 100000
+
+Posts are synthetic: words drawn from a Zipf-like vocabulary, 10-80 words
+per post. Reports build time, resident memory growth and query latency.
+"""
+import argparse
+import itertools
+import random
+import resource
+import statistics
+import time
+
+from app.core.search import SearchIndex
+
+VOCABULARY_SIZE = 50000
+
+
+def make_vocabulary(rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(VOCABULARY_SIZE)]
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench(size, rng, vocabulary, cum_weights):
+    rss_before = max_rss_mb()
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(size):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(10, 80))
+        index.add(f"q:{i}", " ".join(words))
+    build_seconds = time.perf_counter() - start
+    rss_growth = max_rss_mb() - rss_before
+
+    # Queries mix a common word with rarer ones, like real searches
+    queries = [
+        " ".join([vocabulary[rng.randint(0, 50)]] + rng.sample(vocabulary[100:5000], rng.randint(1, 3)))
+        for _ in range(200)
+    ]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, 20)
+        if hits:
+            index.search(query, 20, after=(hits[-1][1], hits[-1][0]))
+        latencies.append((time.perf_counter() - start) * 1000 / 2)
+
+    latencies.sort()
+    print(f"{size:>9} posts: build {build_seconds:6.1f}s, rss +{rss_growth:7.1f} MB, "
+          f"query p50 {statistics.median(latencies):6.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    for size in args.sizes:
+        bench(size, rng, vocabulary, cum_weights)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Helpers for the tests that run against a live server on BASE_URL"""
+import uuid
+
+BASE_URL = "http://127.0.0.1:8000"
+
+
+async def register_and_login(client, password="secret123"):
+    username = f"user_{uuid.uuid4().hex[:8]}"
+    await client.post(f"{BASE_URL}/auth/register", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "name": "Test User",
+        "password": password
+    })
+    response = await client.post(f"{BASE_URL}/auth/login", data={
+        "username": username,
+        "password": password
+    })
+    return username, response.json()["access_token"]
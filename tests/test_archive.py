@@ -0,0 +1,248 @@
+import asyncio
+import gzip
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.db.archive import Archive
+
+
+def make_query(n):
+    return {
+        "_id": ObjectId(),
+        "query_id": f"qry_u1_{n}",
+        "user_id": "u1",
+        "query": f"question {n}",
+        "response": "answer " * 50,
+        "creation_date": datetime(2024, 1, 1, 12, n),
+    }
+
+
+def test_blocks_round_trip_by_offset(tmp_path):
+    archive = Archive(str(tmp_path), segment_max_bytes=1 << 20)
+    first = [make_query(n) for n in range(3)]
+    second = [make_query(n) for n in range(3, 5)]
+
+    offset1, length1 = archive.append_block("seg.jsonl.gz", first)
+    offset2, length2 = archive.append_block("seg.jsonl.gz", second)
+    assert offset1 == 0 and offset2 == length1
+
+    assert archive.read_block("seg.jsonl.gz", offset2, length2) == second
+    assert archive.read_block("seg.jsonl.gz", offset1, length1) == first
+
+
+def test_segment_is_one_readable_gzip_file(tmp_path):
+    archive = Archive(str(tmp_path), segment_max_bytes=1 << 20)
+    archive.append_block("seg.jsonl.gz", [make_query(0)])
+    archive.append_block("seg.jsonl.gz", [make_query(1)])
+
+    with gzip.open(tmp_path / "seg.jsonl.gz", "rt") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2
+    assert archive.segment_size("seg.jsonl.gz") > 0
+    assert archive.segment_size("missing.jsonl.gz") == 0
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if isinstance(condition, dict):
+            if "$in" in condition and doc.get(field) not in condition["$in"]:
+                return False
+            if "$nin" in condition and doc.get(field) in condition["$nin"]:
+                return False
+            if "$lt" in condition and not doc.get(field) < condition["$lt"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class _Collection:
+    """Just enough of a Motor collection for archive_older_than"""
+
+    def __init__(self, docs=(), on_write=None):
+        self.docs = [dict(doc) for doc in docs]
+        self.on_write = on_write
+
+    def find(self, query, projection=None):
+        docs = sorted((doc for doc in self.docs if _matches(doc, query)), key=lambda doc: doc["_id"])
+
+        class Cursor:
+            def sort(self, *args):
+                return self
+
+            def limit(self, n):
+                del docs[n:]
+                return self
+
+            async def to_list(self, n):
+                return [dict(doc) for doc in docs]
+
+            async def __aiter__(self):
+                for doc in docs:
+                    yield dict(doc)
+        return Cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.on_write:
+            self.on_write()
+        deleted = 0
+        for operation in operations:
+            if hasattr(operation, "_doc"):
+                await self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+            else:
+                before = len(self.docs)
+                self.docs = [doc for doc in self.docs if not _matches(doc, operation._filter)]
+                deleted += before - len(self.docs)
+        return type("Result", (), {"deleted_count": deleted})()
+
+    async def delete_many(self, query):
+        self.docs = [doc for doc in self.docs if not _matches(doc, query)]
+
+    async def find_one(self, query):
+        return next((dict(doc) for doc in self.docs if _matches(doc, query)), None)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((doc for doc in self.docs if _matches(doc, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+    def aggregate(self, pipeline):
+        # Only the {"$group": {"_id": "$field", "count": {"$sum": 1}}} the compaction uses
+        field = pipeline[0]["$group"]["_id"][1:]
+        counts = {}
+        for doc in self.docs:
+            counts[doc[field]] = counts.get(doc[field], 0) + 1
+
+        async def cursor():
+            for value, count in counts.items():
+                yield {"_id": value, "count": count}
+        return cursor()
+
+    async def delete_one(self, query):
+        before = len(self.docs)
+        await self.delete_many(query)
+        return type("Result", (), {"deleted_count": before - len(self.docs)})()
+
+
+def test_query_rated_while_being_archived_keeps_its_rating(tmp_path):
+    archive = Archive(str(tmp_path), segment_max_bytes=1 << 20)
+    queries = _Collection([make_query(n) for n in range(3)])
+    rated = queries.docs[1]
+
+    def rate_once():
+        # update_query lands between the archive read and the delete
+        if rated.get("user_rating") is None:
+            rated["user_rating"] = 5.0
+    database = {"query": queries, "query-archive": _Collection(on_write=rate_once),
+                "query-archive-segments": _Collection()}
+
+    result = asyncio.run(archive.archive_older_than(database, datetime(2025, 1, 1), batch_size=10))
+
+    assert result == {"archived": 3, "segments": 1, "left_hot": 0}
+    assert queries.docs == []
+    entries = database["query-archive"].docs
+    assert len(entries) == 3
+    archived = asyncio.run(archive.find_query(_FindOne(entries), rated["query_id"]))
+    assert archived["user_rating"] == 5.0
+
+
+class _FindOne:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __getitem__(self, name):
+        return self
+
+    async def find_one(self, query):
+        return next(entry for entry in self.entries if entry["_id"] == query["_id"])
+
+
+class _HotQueries:
+    """The hot query collection, empty until a query is restored into it"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if _matches(doc, query)), None)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((doc for doc in self.docs if _matches(doc, query)), None)
+        if doc is None and upsert:
+            self.docs.append(dict(update["$setOnInsert"]))
+        elif doc is not None:
+            doc.update(update.get("$set", {}))
+
+
+class _ArchiveDatabase:
+    def __init__(self, entries, hot):
+        self.collections = {"query-archive": _Collection(entries), "query": hot}
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def test_archived_query_can_be_read_twice_and_then_updated(tmp_path, monkeypatch):
+    from fastapi import Response
+    from starlette.requests import Request
+
+    from app.api.routes import query as query_routes
+    from app.schemas.query import QueryUpdate
+
+    archive = Archive(str(tmp_path), segment_max_bytes=1 << 20)
+    stored = make_query(0)
+    offset, length = archive.append_block("seg.jsonl.gz", [stored])
+    entry = {"_id": stored["query_id"], "user_id": "u1", "segment": "seg.jsonl.gz", "offset": offset, "length": length}
+    hot = _HotQueries()
+
+    async def record_rating(doc, update):
+        pass
+
+    monkeypatch.setattr(query_routes, "archive", archive)
+    monkeypatch.setattr(query_routes, "database", _ArchiveDatabase([entry], hot))
+    monkeypatch.setattr(query_routes, "query_collection", hot)
+    monkeypatch.setattr(query_routes, "record_rating", record_rating)
+    user = {"id": "u1"}
+
+    async def get():
+        request = Request({"type": "http", "method": "GET", "headers": []})
+        return await query_routes.get_query(stored["query_id"], request, Response(), None, user)
+
+    first, second = asyncio.run(get()), asyncio.run(get())
+    assert first["id"] == second["id"] == str(stored["_id"])
+
+    updated = asyncio.run(query_routes.update_query(stored["query_id"], QueryUpdate(user_rating=4.0), user))
+    assert updated["user_rating"] == 4.0
+    assert hot.docs[0]["_id"] == stored["_id"]
+
+
+def test_compaction_purges_deleted_queries_from_segments(tmp_path):
+    archive = Archive(str(tmp_path), segment_max_bytes=1 << 20)
+    queries = _Collection([make_query(n) for n in range(4)])
+    deleted = queries.docs[1]["query_id"]
+    database = {"query": queries, "query-archive": _Collection(), "query-archive-segments": _Collection()}
+    asyncio.run(archive.archive_older_than(database, datetime(2025, 1, 1), batch_size=2))
+    old_segments = archive.segment_files()
+
+    # delete_query on an archived query, or the cascade of an account deletion
+    assert asyncio.run(archive.forget(database, deleted))
+    assert asyncio.run(archive.compact(database)) == {"compacted": 1, "kept": 3}
+
+    assert not set(old_segments) & set(archive.segment_files())
+    for segment in archive.segment_files():
+        with gzip.open(tmp_path / segment, "rt") as f:
+            assert deleted not in f.read()
+    entries = database["query-archive"].docs
+    assert len(entries) == 3
+    for entry in entries:
+        found = asyncio.run(archive.find_query(_FindOne(entries), entry["_id"]))
+        assert found["query_id"] == entry["_id"]
+    # Nothing left to purge
+    assert asyncio.run(archive.compact(database)) == {"compacted": 0, "kept": 0}
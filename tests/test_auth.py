@@ -0,0 +1,28 @@
+import pytest
+import httpx
+
+from live_client import BASE_URL, register_and_login
+
+
+@pytest.mark.asyncio
+async def test_change_password_revokes_old_token():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.post(f"{BASE_URL}/auth/change-password", headers=headers, json={
+            "current_password": "secret123",
+            "new_password": "secret456"
+        })
+        assert response.status_code == 200
+        new_token = response.json()["access_token"]
+
+        # Claims-only route rejects the revoked token
+        response = await client.get(f"{BASE_URL}/auth/verify-token", headers=headers)
+        assert response.status_code == 401
+
+        response = await client.get(
+            f"{BASE_URL}/auth/verify-token",
+            headers={"Authorization": f"Bearer {new_token}"}
+        )
+        assert response.status_code == 200
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app.db import cascade
+from app.db.cascade import plan_steps
+
+
+def test_user_plan_removes_answers_to_their_questions_first():
+    steps = plan_steps("user", "u1")
+    assert steps[0]["collection"] == "forum-question"
+    assert steps[0]["children"] == [{"collection": "forum-answer", "key": "question_id"}]
+    assert {step["collection"] for step in steps} == {
+        "forum-question", "forum-answer", "history", "query", "query-archive", "user-stats", "llm-usage"
+    }
+    assert all("u1" in step["filter"].values() for step in steps)
+
+
+def test_question_plan_and_unknown_kinds():
+    assert plan_steps("question", "q1") == [{"collection": "forum-answer", "filter": {"question_id": "q1"}}]
+    with pytest.raises(ValueError):
+        plan_steps("planet", "p1")
+
+
+class _Collection:
+    """Just enough of a Motor collection for _delete_batches"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        docs = [doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())]
+
+        class Cursor:
+            def limit(self, n):
+                self.n = n
+                return self
+
+            async def to_list(self, n):
+                return [{field: doc[field] for field in projection if field in doc} for doc in docs[:n]]
+        return Cursor()
+
+    async def delete_many(self, query):
+        ids = set(query["_id"]["$in"])
+        before = len(self.docs)
+        self.docs[:] = [doc for doc in self.docs if doc["_id"] not in ids]
+        return type("Result", (), {"deleted_count": before - len(self.docs)})()
+
+
+def test_async_delete_hooks_get_every_batch(monkeypatch):
+    batches = []
+
+    async def hook(docs):
+        batches.append(sorted(doc["user_id"] for doc in docs))
+
+    monkeypatch.setattr(cascade, "_delete_hooks", {})
+    cascade.register_delete_hook("forum-answer", ["user_id"], hook)
+    answers = [{"_id": i, "question_id": "q1", "user_id": f"u{i % 2}"} for i in range(3)]
+    database = {"forum-answer": _Collection(answers)}
+    worker = cascade.CascadeWorker(batch_size=2, pause=0, lease_seconds=60)
+
+    async def run():
+        return [progress async for progress in worker._delete_batches(
+            database, "forum-answer", {"question_id": "q1"}, [])]
+
+    assert asyncio.run(run()) == [("forum-answer", 2), ("forum-answer", 1)]
+    assert batches == [["u0", "u1"], ["u0"]]
+    assert answers == []
+
+
+def test_deleted_answers_come_off_question_and_author_counters(monkeypatch):
+    from app.api.routes import forum
+
+    questions = {"q1": {"answer_count": 3}, "q2": {"answer_count": 1}}
+    deleted = []
+
+    class Questions:
+        async def find_one_and_update(self, query, update, projection=None, return_document=None):
+            question = questions[query["question_id"]]
+            if question["answer_count"] < query["answer_count"]["$gte"]:
+                return None
+            question["answer_count"] += update["$inc"]["answer_count"]
+            return dict(question)
+
+    async def record_deleted(user_id, field, count=1):
+        deleted.append((user_id, field, count))
+
+    monkeypatch.setattr(forum, "forum_question_collection", Questions())
+    monkeypatch.setattr(forum, "record_deleted", record_deleted)
+    docs = [{"question_id": "q1", "user_id": "u1"}, {"question_id": "q1", "user_id": "u2"},
+            {"question_id": "q2", "user_id": "u1"}]
+
+    asyncio.run(forum._count_deleted_answers(docs))
+
+    assert questions == {"q1": {"answer_count": 1}, "q2": {"answer_count": 0}}
+    assert sorted(deleted) == [("u1", "answer_count", 2), ("u2", "answer_count", 1)]
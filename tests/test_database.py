@@ -0,0 +1,9 @@
+import pytest
+
+from app.db.database import test_connection
+
+
+# to test mongodb connection
+@pytest.mark.asyncio
+async def test_mongo_connection():
+    await test_connection()
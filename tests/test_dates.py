@@ -0,0 +1,9 @@
+from datetime import datetime
+
+from app.core.dates import as_datetime
+
+
+def test_as_datetime_normalizes_strings_and_offsets():
+    assert as_datetime("2025-05-14T15:00:00+03:00") == datetime(2025, 5, 14, 12, 0)
+    assert as_datetime(datetime(2025, 5, 14, 12, 0, 0, 999999)) == datetime(2025, 5, 14, 12, 0, 0, 999000)
+    assert as_datetime(None) is None
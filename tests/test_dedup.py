@@ -0,0 +1,29 @@
+from app.core.dedup import NUM_PERMUTATIONS, DuplicateIndex, shingles, signature, similarity
+
+
+def test_find_similar_questions():
+    index = DuplicateIndex()
+    index.add({"question_id": "q1", "question_header": "How to read body language",
+               "question": "I find it hard to read body language of people at work"})
+    index.add({"question_id": "q2", "question_header": "Small talk at parties",
+               "question": "Any tips for starting small talk with strangers?"})
+
+    hits = index.find_similar("How can I read body language? It's hard to read body language of people at work")
+    assert [hit["question_id"] for hit in hits] == ["q1"]
+
+    index.remove("q1")
+    assert index.find_similar("How to read body language at work") == []
+
+
+def test_signature_estimates_jaccard_similarity():
+    words = [f"word{i}" for i in range(60)]
+    text = " ".join(words)
+    assert len(signature("short question")) == NUM_PERMUTATIONS
+    assert similarity(signature(text), signature(text)) == 1.0
+    assert similarity(signature(text), signature(" ".join(f"other{i}" for i in range(60)))) < 0.1
+
+    # Half the words changed: the shingle sets overlap about 0.2
+    edited = " ".join(word if i % 2 else f"edit{i}" for i, word in enumerate(words))
+    first, second = shingles(text), shingles(edited)
+    jaccard = len(first & second) / len(first | second)
+    assert abs(similarity(signature(text), signature(edited)) - jaccard) < 0.15
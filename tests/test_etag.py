@@ -0,0 +1,39 @@
+from bson import ObjectId
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.core.etag import check_etag, compute_etag
+
+DOC = {"_id": ObjectId(), "history_id": "h1", "query_set": ["q1"], "query_number": 1}
+
+app = FastAPI()
+
+
+@app.get("/doc")
+def read_doc(request: Request, response: Response):
+    not_modified = check_etag(request, response, compute_etag([DOC]))
+    if not_modified:
+        return not_modified
+    return {"history_id": DOC["history_id"]}
+
+
+def test_compute_etag_ignores_volatile_fields():
+    etag = compute_etag([DOC])
+    assert etag == compute_etag([{**DOC, "trending_score": 123.4}])
+    assert etag != compute_etag([{**DOC, "query_number": 2}])
+    assert etag != compute_etag([DOC], "next-cursor")
+
+
+def test_conditional_get_returns_304():
+    client = TestClient(app)
+    first = client.get("/doc")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/doc", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+    assert client.get("/doc", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/doc", headers={"If-None-Match": '"other"'}).status_code == 200
@@ -0,0 +1,39 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.db.export import SOURCES, decode_export_cursor, encode_export_cursor, gzip_lines, to_export_doc
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    assert decode_export_cursor(encode_export_cursor(0, oid)) == (0, oid)
+    assert decode_export_cursor(encode_export_cursor(len(SOURCES) - 1, "qry_u1_1")) == (len(SOURCES) - 1, "qry_u1_1")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_export_cursor(99, "x"), "e30"])
+def test_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_export_cursor(cursor)
+
+
+def test_password_hash_is_never_exported():
+    assert to_export_doc({"username": "u", "hashed_password": "x"}) == {"username": "u"}
+
+
+def test_gzip_lines_stream_decompresses_to_json_lines():
+    async def records():
+        for n in range(5):
+            yield "query", f"c{n}", {"_id": ObjectId(), "creation_date": datetime(2025, 1, 1), "n": n}
+
+    async def collect():
+        return b"".join([chunk async for chunk in gzip_lines(records(), flush_every=2)])
+
+    lines = gzip.decompress(asyncio.run(collect())).decode().splitlines()
+    assert [json.loads(line)["doc"]["n"] for line in lines] == list(range(5))
+    assert json.loads(lines[0])["collection"] == "query"
+    assert json.loads(lines[4])["cursor"] == "c4"
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.core.feed_cache import FeedCache
+
+
+def make_feed(count):
+    # Newest first, like the question feed
+    oids = sorted((ObjectId() for _ in range(count)), reverse=True)
+    return [{"_id": oid, "question_id": f"q{i}"} for i, oid in enumerate(oids)]
+
+
+@pytest.mark.asyncio
+async def test_feed_cache_pages_and_incremental_updates():
+    feed = make_feed(5)
+    loads = []
+
+    async def loader(count):
+        loads.append(count)
+        return [dict(doc) for doc in feed[:count]]
+
+    cache = FeedCache(max_items=10)
+    docs, next_cursor = await cache.get_page(3, None, loader)
+    assert [d["question_id"] for d in docs] == ["q0", "q1", "q2"]
+
+    docs, next_cursor = await cache.get_page(3, next_cursor, loader)
+    assert [d["question_id"] for d in docs] == ["q3", "q4"]
+    assert next_cursor is None
+
+    cache.add(ObjectId(), {"question_id": "new"})
+    cache.remove("question_id", "q1")
+    docs, _ = await cache.get_page(3, None, loader)
+    assert [d["question_id"] for d in docs] == ["new", "q0", "q2"]
+    assert loads == [11]
+
+
+@pytest.mark.asyncio
+async def test_feed_cache_falls_back_past_window():
+    feed = make_feed(5)
+
+    async def loader(count):
+        return [dict(doc) for doc in feed[:count]]
+
+    cache = FeedCache(max_items=3)
+    assert await cache.get_page(5, None, loader) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_cold_requests_share_one_load():
+    feed = make_feed(5)
+    loads = []
+
+    async def loader(count):
+        loads.append(count)
+        await asyncio.sleep(0.01)
+        return [dict(doc) for doc in feed[:count]]
+
+    cache = FeedCache(max_items=10)
+    pages = await asyncio.gather(*(cache.get_page(2, None, loader) for _ in range(20)))
+    assert all([d["question_id"] for d in docs] == ["q0", "q1"] for docs, _ in pages)
+    assert len(loads) == 1
+
+
+@pytest.mark.asyncio
+async def test_write_racing_a_load_leaves_the_cache_stale_not_expired():
+    feed = make_feed(5)
+    cache = FeedCache(max_items=10, ttl=30, max_stale=300)
+    loads = []
+
+    async def loader(count):
+        loads.append(count)
+        # Answer activity lands while the feed is being read
+        cache.update("question_id", "q0", {"answer_count": 1})
+        return [dict(doc) for doc in feed[:count]]
+
+    await cache.get_page(2, None, loader)
+    assert len(loads) == 1
+
+    # Served from memory while one reload runs in the background
+    docs, _ = await cache.get_page(2, None, loader)
+    assert [d["question_id"] for d in docs] == ["q0", "q1"]
+    await cache._refresh_task
+    assert len(loads) == 2
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException, Response
+
+from app.core.fields import fields_projection, parse_fields, sparse_dump, sparse_response, wants_field
+from app.schemas.query import QueryResponse
+
+QUERY = {
+    "id": "665f1c2e9b1e8a0012345678",
+    "query_id": "qry_u1_1",
+    "user_id": "u1",
+    "query": "How do I start a conversation?",
+    "response": "A long model answer " * 100,
+    "creation_date": datetime(2025, 5, 14, 12, 0),
+    "history_id": "hist_u1_default",
+}
+
+
+def test_parse_fields_always_includes_id_and_rejects_unknown_names():
+    assert parse_fields(None, QueryResponse) is None
+    assert parse_fields("query_id, creation_date,", QueryResponse) == {"id", "query_id", "creation_date"}
+    with pytest.raises(HTTPException) as error:
+        parse_fields("query_id,password", QueryResponse)
+    assert error.value.status_code == 400
+
+
+def test_projection_adds_fields_the_route_needs():
+    selected = parse_fields("query_id", QueryResponse)
+    assert fields_projection(selected, ["user_id"]) == {"query_id": 1, "user_id": 1}
+    assert fields_projection(None, ["user_id"]) is None
+    assert wants_field(None, "username") and not wants_field(selected, "username")
+
+
+def test_sparse_dump_returns_only_requested_fields():
+    dump = sparse_dump(QueryResponse, parse_fields("query_id,creation_date", QueryResponse))
+    assert dump(QUERY) == {"id": QUERY["id"], "query_id": "qry_u1_1", "creation_date": datetime(2025, 5, 14, 12, 0)}
+
+
+def test_sparse_response_keeps_headers_set_by_the_route():
+    response = Response()
+    response.headers["X-Next-Cursor"] = "abc"
+    result = sparse_response(QueryResponse, [dict(QUERY)], parse_fields("query_id", QueryResponse), response)
+    assert result.headers["X-Next-Cursor"] == "abc"
+    assert json.loads(result.body) == [{"id": QUERY["id"], "query_id": "qry_u1_1"}]
@@ -1,6 +1,9 @@
+import asyncio
 import pytest
 import httpx
 
+from live_client import register_and_login
+
 BASE_URL = "http://127.0.0.1:8000"
 
 # ---------- Question Tests ----------
@@ -60,6 +63,15 @@ async def test_create_forum_answer():
         assert response.status_code == 200
         assert response.json()["answer_id"] == "a_test_01"
 
+@pytest.mark.asyncio
+async def test_get_forum_thread():
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{BASE_URL}/forum/question/q_test_03/thread", params={"limit": 10})
+        assert response.status_code == 200
+        thread = response.json()
+        assert thread["question"]["question_id"] == "q_test_03"
+        assert any(answer["answer_id"] == "a_test_01" for answer in thread["answers"])
+
 @pytest.mark.asyncio
 async def test_get_forum_answer():
     async with httpx.AsyncClient() as client:
@@ -73,3 +85,67 @@ async def test_delete_forum_answer():
         response = await client.delete(f"{BASE_URL}/forum/answer/a_test_01")
         assert response.status_code == 200
         assert response.json()["message"] == "Deleted"
+
+
+@pytest.mark.asyncio
+async def test_questions_posted_in_the_same_second_are_all_stored():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        body = {"question_header": "Same second", "question": "Are both of these stored?"}
+
+        responses = await asyncio.gather(
+            client.post(f"{BASE_URL}/forum/question/", headers=headers, json=body),
+            client.post(f"{BASE_URL}/forum/question/", headers=headers, json=body),
+        )
+        assert [response.status_code for response in responses] == [200, 200]
+        assert responses[0].json()["question_id"] != responses[1].json()["question_id"]
+
+
+@pytest.mark.asyncio
+async def test_reused_client_supplied_question_id_is_a_conflict():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        body = {"question_id": f"q_dup_{token[-8:]}", "question_header": "Dup", "question": "Twice?"}
+
+        first = await client.post(f"{BASE_URL}/forum/question/", headers=headers, json=body)
+        second = await client.post(f"{BASE_URL}/forum/question/", headers=headers, json=body)
+        assert first.status_code == 200
+        assert second.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_question_removes_its_answers_in_the_background():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.post(f"{BASE_URL}/forum/question/", headers=headers, json={
+            "question_header": "Cascade question",
+            "question": "Are my answers deleted with me?"
+        })
+        question_id = response.json()["question_id"]
+        await client.post(f"{BASE_URL}/forum/answer/", headers=headers, json={
+            "question_id": question_id,
+            "answer": "They should be."
+        })
+        stats = (await client.get(f"{BASE_URL}/user/stats", headers=headers)).json()
+        assert stats["total_answers"] == 1
+
+        response = await client.delete(f"{BASE_URL}/forum/question/{question_id}", headers=headers)
+        assert response.status_code in (200, 204)
+
+        for _ in range(50):
+            jobs = (await client.get(f"{BASE_URL}/user/deletion-jobs", headers=headers)).json()
+            if jobs and jobs[0]["status"] == "done":
+                break
+            await asyncio.sleep(0.1)
+        assert jobs[0]["kind"] == "question"
+        assert jobs[0]["target"] == question_id
+        assert jobs[0]["status"] == "done"
+        assert jobs[0]["deleted"] == {"forum-answer": 1}
+
+        # The job takes the deleted answer off its author's counters too
+        stats = (await client.get(f"{BASE_URL}/user/stats", headers=headers)).json()
+        assert stats["total_answers"] == 0
@@ -1,6 +1,8 @@
 import pytest
 import httpx
 
+from live_client import register_and_login
+
 BASE_URL = "http://127.0.0.1:8000"
 
 @pytest.mark.asyncio
@@ -28,3 +30,32 @@ async def test_delete_history():
         response = await client.delete(f"{BASE_URL}/history/hist_test")
         assert response.status_code == 200
         assert response.json()["message"] == "Deleted"
+
+
+@pytest.mark.asyncio
+async def test_bulk_history_add_move_and_remove():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        for history_id in ("hist_bulk_a", "hist_bulk_b"):
+            await client.post(f"{BASE_URL}/history/", headers=headers, json={"history_id": f"{history_id}_{token[-8:]}"})
+        source, target = f"hist_bulk_a_{token[-8:]}", f"hist_bulk_b_{token[-8:]}"
+
+        response = await client.put(f"{BASE_URL}/history/{source}/add-queries", headers=headers,
+                                    json={"query_ids": ["q1", "q2", "q3", "q2"]})
+        assert response.json()["added"] == 3
+
+        response = await client.post(f"{BASE_URL}/history/move-queries", headers=headers, json={
+            "source_history_id": source, "target_history_id": target, "query_ids": ["q1", "q2"]
+        })
+        assert response.status_code == 200
+        assert response.json()["added"] == 2
+
+        response = await client.put(f"{BASE_URL}/history/{source}/remove-queries", headers=headers,
+                                    json={"query_ids": ["q3", "q9"]})
+        assert response.json()["removed"] == 1
+
+        source_doc = (await client.get(f"{BASE_URL}/history/{source}", headers=headers)).json()
+        target_doc = (await client.get(f"{BASE_URL}/history/{target}", headers=headers)).json()
+        assert (source_doc["query_set"], source_doc["query_number"]) == ([], 0)
+        assert (target_doc["query_set"], target_doc["query_number"]) == (["q1", "q2"], 2)
@@ -0,0 +1,12 @@
+from app.api.routes.history import plan_add, plan_remove
+
+
+def test_plan_add_skips_ids_already_in_the_history():
+    assert plan_add(["q1", "q2"], ["q2", "q3", "q3", "q4"]) == ["q3", "q4"]
+    assert plan_add(["q1"], ["q1"]) == []
+
+
+def test_plan_remove_counts_every_occurrence():
+    # Single adds never deduplicated, so an id can appear more than once
+    assert plan_remove(["q1", "q2", "q1", "q3"], ["q1", "q3", "q9"]) == (["q1", "q3"], 3)
+    assert plan_remove(["q1"], ["q9"]) == ([], 0)
@@ -0,0 +1,7 @@
+from app.core.ids import generate_id
+
+
+def test_ids_created_in_the_same_second_differ():
+    ids = {generate_id("q", "u1") for _ in range(1000)}
+    assert len(ids) == 1000
+    assert all(question_id.startswith("q_u1_") for question_id in ids)
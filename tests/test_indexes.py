@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from app.db import indexes
+from app.db.indexes import INDEXES, MissingIndexError, _plan_stages, ensure_indexes
+
+
+def test_plan_stages_finds_nested_collscan():
+    plan = {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}
+    assert _plan_stages(plan) == ["FETCH", "COLLSCAN"]
+
+
+def test_lookup_keys_are_unique():
+    unique_keys = {
+        (collection, tuple(model.document["key"]))
+        for collection, models in INDEXES.items()
+        for model in models
+        if model.document.get("unique")
+    }
+    assert ("user", ("username",)) in unique_keys
+    assert ("user", ("email",)) in unique_keys
+    assert ("query", ("query_id",)) in unique_keys
+
+
+class _Collection:
+    def __init__(self, name, failing):
+        self.name = name
+        self.failing = failing
+
+    async def create_indexes(self, models):
+        name = models[0].document["name"]
+        if (self.name, name) in self.failing:
+            raise OperationFailure("E11000 duplicate key error")
+        return [name]
+
+
+class _Database:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def __getitem__(self, name):
+        return _Collection(name, self.failing)
+
+
+def test_ensure_indexes_skips_optional_failures():
+    created = asyncio.run(ensure_indexes(_Database(failing=[("query", "query_id_1")])))
+    assert "username_1" in created
+    assert "query_id_1" not in created
+
+
+def test_ensure_indexes_refuses_to_run_without_user_unique_indexes():
+    with pytest.raises(MissingIndexError, match="user.email_1"):
+        asyncio.run(ensure_indexes(_Database(failing=[("user", "email_1")])))
+
+
+class _ExplainDatabase:
+    """Plans every audited lookup as an index scan except the given (collection, field)"""
+
+    def __init__(self, scanning):
+        self.scanning = scanning
+
+    def __getitem__(self, name):
+        scanning = self.scanning
+
+        class Collection:
+            def find(self, query):
+                class Cursor:
+                    async def explain(self):
+                        stage = "COLLSCAN" if (name, next(iter(query))) == scanning else "IXSCAN"
+                        return {"queryPlanner": {"winningPlan": {"stage": stage}}}
+                return Cursor()
+        return Collection()
+
+
+@pytest.mark.parametrize("scanning, exit_code", [(("user", "id"), 0), (("history", "history_id"), 1)])
+def test_audit_exit_code_ignores_expected_scans(monkeypatch, scanning, exit_code):
+    import app.db.database
+
+    monkeypatch.setattr(app.db.database, "database", _ExplainDatabase(scanning))
+    assert asyncio.run(indexes.main(["--audit", "--no-create"])) == exit_code
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.db.migrate_dates import parse_stored_date
+
+CREATED = datetime(2025, 5, 14, 12, 0, 0)
+OID = ObjectId.from_datetime(CREATED)
+
+
+def test_utc_strings_are_kept():
+    assert parse_stored_date("2025-05-14T12:00:00.123456", OID) == datetime(2025, 5, 14, 12, 0, 0, 123000)
+    assert parse_stored_date("2025-05-14T15:00:00+03:00", OID) == CREATED
+
+
+def test_local_time_strings_are_shifted_to_utc():
+    # Written with datetime.now() on a UTC+3 server
+    assert parse_stored_date("2025-05-14T15:00:00.500000", OID) == datetime(2025, 5, 14, 12, 0, 0, 500000)
+
+
+def test_unrelated_or_invalid_strings():
+    # Client-supplied dates far from the _id time are taken as UTC
+    assert parse_stored_date("2024-04-19T12:00:00", OID) == datetime(2024, 4, 19, 12, 0, 0)
+    assert parse_stored_date("yesterday", OID) == CREATED
@@ -0,0 +1,55 @@
+import base64
+from datetime import datetime
+
+import bson
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from app.core.pagination import decode_cursor, decode_sort_cursor, encode_cursor, encode_sort_cursor, keyset_filter, sort_spec
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    assert decode_cursor(encode_cursor(oid)) == oid
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_sort_cursor_round_trip():
+    oid = ObjectId()
+    when = datetime(2025, 5, 14, 12, 30, 0, 123000)
+    assert decode_sort_cursor(encode_sort_cursor(when, oid)) == (when, oid)
+    assert decode_sort_cursor(encode_sort_cursor(None, oid)) == (None, oid)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor(ObjectId()),  # a plain _id cursor is not a sort cursor
+    base64.urlsafe_b64encode(bson.encode({"v": 1})).decode(),
+])
+def test_malformed_sort_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_sort_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_filter_on_a_sort_field_breaks_ties_on_id():
+    oid = ObjectId()
+    when = datetime(2025, 5, 14, 12, 30)
+    cursor = encode_sort_cursor(when, oid)
+
+    assert keyset_filter({"user_id": "u1"}, cursor, DESCENDING, "last_activity_at") == {"$and": [
+        {"user_id": "u1"},
+        {"$or": [
+            {"last_activity_at": {"$lt": when}},
+            {"last_activity_at": when, "_id": {"$lt": oid}},
+        ]},
+    ]}
+    assert keyset_filter({}, cursor, ASCENDING, "last_activity_at")["$or"][0] == {"last_activity_at": {"$gt": when}}
+    assert sort_spec(DESCENDING, "last_activity_at") == [("last_activity_at", DESCENDING), ("_id", DESCENDING)]
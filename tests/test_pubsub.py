@@ -0,0 +1,55 @@
+import pytest
+
+from app.core.pubsub import RESYNC_EVENT, PubSub, question_topic
+from app.api.routes.events import resolve_topic
+
+
+@pytest.mark.asyncio
+async def test_pubsub_fans_out_to_topic_subscribers():
+    broker = PubSub()
+    first, second = broker.subscriber(), broker.subscriber()
+    first.subscribe(question_topic("q1"))
+    second.subscribe(question_topic("q2"))
+
+    assert broker.publish(question_topic("q1"), {"type": "answer_created", "answer_id": "a1"}) == 1
+    assert await first.get(0.1) == {"topic": "question:q1", "type": "answer_created", "answer_id": "a1"}
+    assert await second.get(0.01) is None
+
+    first.close()
+    assert broker.subscriber_count(question_topic("q1")) == 0
+    assert broker.publish(question_topic("q1"), {"type": "answer_created"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync_instead_of_unbounded_backlog():
+    broker = PubSub(max_queue=3)
+    subscriber = broker.subscriber()
+    subscriber.subscribe("forum")
+
+    for i in range(10):
+        broker.publish("forum", {"type": "question_created", "n": i})
+
+    events = []
+    while (event := await subscriber.get(0.01)) is not None:
+        events.append(event)
+    assert RESYNC_EVENT in events
+    assert len(events) <= 3
+    assert subscriber.dropped > 0
+
+
+def test_subscriber_topic_limit():
+    broker = PubSub(max_topics=2)
+    subscriber = broker.subscriber()
+    assert subscriber.subscribe("question:a")
+    assert subscriber.subscribe("question:b")
+    assert subscriber.subscribe("question:a")
+    assert not subscriber.subscribe("question:c")
+
+
+def test_resolve_topic_scopes_queries_to_caller():
+    user = {"id": "u1", "username": "alice"}
+    assert resolve_topic("queries", user) == "queries:u1"
+    assert resolve_topic("question:q1", user) == "question:q1"
+    assert resolve_topic("forum", user) == "forum"
+    assert resolve_topic("queries:u2", user) is None
+    assert resolve_topic("question:", user) is None
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.quota import QuotaTracker
+
+TIERS = {"default": {"generations": 3, "tokens": 1000}, "internal": {}}
+
+
+def test_generation_quota_over_rolling_window():
+    tracker = QuotaTracker(window_seconds=100, tiers=TIERS)
+    for _ in range(3):
+        assert tracker.acquire("u1", "default", now=1000) is None
+    # Fourth generation in the same window is refused until the next one
+    assert tracker.acquire("u1", "default", now=1050) == 50
+    # Other users and unlimited tiers are unaffected
+    assert tracker.acquire("u2", None, now=1050) is None
+    assert all(tracker.acquire("u1", "internal", now=1050) is None for _ in range(10))
+
+
+def test_previous_window_decays():
+    tracker = QuotaTracker(window_seconds=100, tiers=TIERS)
+    for _ in range(3):
+        tracker.acquire("u1", "default", now=1090)
+    # Early in the next window most of the previous usage still counts
+    assert tracker.usage("u1", now=1110)["generations"] == 3 * 0.9
+    wait = tracker.acquire("u1", "default", now=1110)
+    assert wait is None
+    # 1 current + 3 * 0.8 previous is over the limit until the overlap drops to 2/3
+    assert tracker.acquire("u1", "default", now=1120) == 14
+    assert tracker.acquire("u1", "default", now=1134) is None
+
+
+def test_token_quota_and_release():
+    tracker = QuotaTracker(window_seconds=100, tiers=TIERS)
+    assert tracker.acquire("u1", "default", now=0) is None
+    tracker.record_tokens("u1", 1000, now=0)
+    assert tracker.acquire("u1", "default", now=10) == 90
+
+    tracker.acquire("u2", "default", now=0)
+    tracker.release("u2", now=0)
+    assert tracker.usage("u2", now=0)["generations"] == 0
+
+
+class _Queries:
+    """Query collection that only counts lookups"""
+
+    def __init__(self, existing=False):
+        self.existing = existing
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return {"_id": 1} if self.existing else None
+
+
+def _create(monkeypatch, tracker, queries):
+    from app.api.routes import query as query_routes
+    from app.schemas.query import QueryCreate
+
+    monkeypatch.setattr(query_routes, "quota_tracker", tracker)
+    monkeypatch.setattr(query_routes, "query_collection", queries)
+    body = QueryCreate(query_id="qry_taken", query="hi", model_name="socialNorm")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(query_routes.create_query(body, {"id": "u1", "tier": "default"}))
+    return raised.value
+
+
+def test_over_quota_with_a_query_id_skips_the_database(monkeypatch):
+    tracker = QuotaTracker(window_seconds=3600, tiers=TIERS)
+    for _ in range(3):
+        tracker.acquire("u1", "default")
+    queries = _Queries(existing=True)
+    assert _create(monkeypatch, tracker, queries).status_code == 429
+    assert queries.lookups == 0
+
+
+def test_taken_query_id_gives_the_generation_back(monkeypatch):
+    tracker = QuotaTracker(window_seconds=3600, tiers={"default": {"generations": 1, "tokens": 1000}})
+    assert _create(monkeypatch, tracker, _Queries(existing=True)).status_code == 409
+    assert tracker.acquire("u1", "default") is None
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.db import reconcile
+from app.db.reconcile import backfill_once, reconcile_question_activity
+
+ASKED = datetime(2025, 5, 1, 9, 0)
+
+
+class _Collection:
+    """Just enough of a Motor collection for the question reconciler"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.writes = []
+
+    def find(self, query, projection=None):
+        docs = self.docs
+
+        class Cursor:
+            def sort(self, *args):
+                return self
+
+            def batch_size(self, size):
+                return self
+
+            async def __aiter__(self):
+                for doc in docs:
+                    yield dict(doc)
+        return Cursor()
+
+    def aggregate(self, pipeline):
+        # $match on question_id $in, then $group count / $max creation_date
+        wanted = set(pipeline[0]["$match"]["question_id"]["$in"])
+        groups = {}
+        for doc in self.docs:
+            if doc["question_id"] in wanted:
+                group = groups.setdefault(doc["question_id"], {"_id": doc["question_id"], "count": 0, "last": None})
+                group["count"] += 1
+                if group["last"] is None or doc["creation_date"] > group["last"]:
+                    group["last"] = doc["creation_date"]
+
+        async def cursor():
+            for group in groups.values():
+                yield group
+        return cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.writes.append((operation._filter, operation._doc["$set"]))
+
+
+def question(question_id, **fields):
+    return {"_id": ObjectId(), "question_id": question_id, "creation_date": ASKED, **fields}
+
+
+def test_answer_count_and_activity_are_repaired():
+    correct = question("q_ok", answer_count=1, last_answer_at=datetime(2025, 5, 1, 10, 0),
+                       last_activity_at=datetime(2025, 5, 1, 10, 0))
+    drifted = question("q_drift", answer_count=5, last_answer_at=None, last_activity_at=ASKED)
+    orphaned = question("q_empty", answer_count=2, last_answer_at=datetime(2025, 5, 2), last_activity_at=datetime(2025, 5, 2))
+    database = {
+        "forum-question": _Collection([correct, drifted, orphaned]),
+        "forum-answer": _Collection([
+            {"question_id": "q_ok", "creation_date": datetime(2025, 5, 1, 10, 0)},
+            {"question_id": "q_drift", "creation_date": datetime(2025, 5, 3, 8, 0)},
+            {"question_id": "q_drift", "creation_date": datetime(2025, 5, 3, 12, 0, 0, 123456)},
+        ]),
+    }
+
+    result = asyncio.run(reconcile_question_activity(database, batch_size=2))
+
+    assert result == {"checked": 3, "repaired": 2}
+    writes = dict((f["_id"], update) for f, update in database["forum-question"].writes)
+    assert writes[drifted["_id"]] == {
+        "answer_count": 2,
+        "last_answer_at": datetime(2025, 5, 3, 12, 0, 0, 123000),
+        "last_activity_at": datetime(2025, 5, 3, 12, 0, 0, 123000),
+    }
+    assert writes[orphaned["_id"]] == {"answer_count": 0, "last_answer_at": None, "last_activity_at": ASKED}
+
+
+class _Migrations:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {}).update(update["$set"])
+
+
+def test_backfill_runs_each_reconciler_once(monkeypatch):
+    runs = []
+
+    async def reconcile_stats(database):
+        runs.append("user_stats")
+        return {"checked": 2, "repaired": 2}
+
+    monkeypatch.setattr(reconcile, "RECONCILERS", {"user_stats": reconcile_stats})
+    database = {"migrations": _Migrations()}
+
+    assert asyncio.run(backfill_once(database)) == {"user_stats": {"checked": 2, "repaired": 2}}
+    assert asyncio.run(backfill_once(database)) == {}
+    assert runs == ["user_stats"]
+    assert database["migrations"].docs["reconcile:user_stats"]["finished_at"]
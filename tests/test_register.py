@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.api.routes import auth
+from app.models.user import UserCreate
+
+USER = UserCreate(username="alice", email="alice@example.com", name="Alice", password="secret123")
+
+
+class _Collection:
+    """Records inserts and deletes; insert_one raises `error` if given"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.inserted = []
+        self.deleted = []
+
+    async def insert_one(self, doc):
+        if self.error:
+            raise self.error
+        self.inserted.append(doc)
+
+    async def delete_one(self, query):
+        self.deleted.append(query)
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    def install(user_error=None, history_error=None):
+        users, histories = _Collection(user_error), _Collection(history_error)
+        monkeypatch.setattr(auth, "user_collection", users)
+        monkeypatch.setattr(auth, "history_collection", histories)
+        monkeypatch.setattr(auth, "get_password_hash", lambda password: "hashed")
+        return users, histories
+    return install
+
+
+def test_register_creates_user_and_default_history(collections):
+    users, histories = collections()
+    created = asyncio.run(auth.register_user(USER))
+    assert users.inserted[0]["username"] == "alice"
+    assert histories.inserted[0]["history_id"] == f"hist_{created['id']}_default"
+    assert users.deleted == histories.deleted == []
+
+
+def test_duplicate_user_rolls_back_the_default_history(collections):
+    error = DuplicateKeyError("E11000 duplicate key error", details={"keyPattern": {"email": 1}})
+    users, histories = collections(user_error=error)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(auth.register_user(USER))
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Email already registered"
+    assert histories.deleted == [{"history_id": histories.inserted[0]["history_id"]}]
+
+
+def test_failed_history_rolls_back_the_user(collections):
+    users, histories = collections(history_error=OperationFailure("write failed"))
+    with pytest.raises(OperationFailure):
+        asyncio.run(auth.register_user(USER))
+    assert users.deleted == [{"_id": users.inserted[0]["_id"]}]
+
+
+class _RacedUsers:
+    """The pre-check finds no one, then a concurrent rename wins the unique index"""
+
+    async def find_one(self, query):
+        return None
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        raise DuplicateKeyError("E11000 duplicate key error", details={"keyPattern": {"username": 1}})
+
+
+def test_rename_losing_the_race_is_a_400(monkeypatch):
+    from app.api.routes import user
+    from app.models.user import UserUpdate
+
+    monkeypatch.setattr(user, "user_collection", _RacedUsers())
+    current_user = {"id": "6650f0c2a1b2c3d4e5f60718", "username": "alice"}
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(user.update_user(UserUpdate(username="bob"), current_user))
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Username already registered"
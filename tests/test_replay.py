@@ -0,0 +1,84 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from bson import ObjectId
+
+from app.eval.replay import BackendPool, build_report, percentile, read_checkpoint, replay
+
+
+class StandInOllama(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama: "echo" repeats the prompt, "shout" upper-cases it"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body["model"] == "broken":
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b'{"error": "model failed"}')
+            return
+        text = body["prompt"].upper() if body["model"] == "shout" else body["prompt"]
+        payload = json.dumps({"model": body["model"], "response": text, "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def stored(count):
+    return [
+        {"_id": ObjectId(), "query_id": f"qry_{i}", "query": f"prompt number {i}",
+         "response": f"prompt number {i}", "model_name": "socialNorm", "latency_ms": 100.0}
+        for i in range(count)
+    ]
+
+
+async def source(docs, after=None):
+    for doc in docs:
+        if after is None or str(doc["_id"]) > after:
+            yield doc
+
+
+def test_percentile():
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile([1, 2, 3, 4], 99) == 4
+    assert percentile([], 50) is None
+
+
+@pytest.mark.asyncio
+async def test_replay_resumes_from_checkpoint_and_reports(stand_in_server, tmp_path):
+    docs = stored(7)
+    output = str(tmp_path / "replay.jsonl.gz")
+    pool = BackendPool([stand_in_server, stand_in_server], concurrency=2)
+
+    state = await replay(source(docs), pool, ["echo", "shout", "broken"], output, limit=4, batch_size=3)
+    assert state["replayed"] == 4
+
+    # A second run continues after the last completed batch
+    checkpoint = read_checkpoint(output)
+    state = await replay(source(docs, checkpoint["last_id"]), pool, ["echo", "shout", "broken"], output, batch_size=3)
+    assert state["replayed"] == 7
+    assert state["last_id"] == str(docs[-1]["_id"])
+
+    report = build_report(output)
+    echo, shout, broken = (report["models"][m] for m in ("echo", "shout", "broken"))
+    assert echo["requests"] == shout["requests"] == 7
+    assert echo["mean_stored_similarity"] == 1.0
+    assert shout["drifted"] == 7 and shout["drift_examples"]
+    assert broken["errors"] == 7
+    assert echo["latency_ms"]["p50"] is not None
+    assert report["model_pairs"]["echo vs shout"]["compared"] == 7
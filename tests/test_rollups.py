@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime
+
+from app.db.rollups import (
+    _add_to_bucket, _merge_inc, _rating_inc, backfill, bucket_hour, rating_bin, to_period_doc
+)
+
+
+def test_rating_bins_and_increments():
+    assert rating_bin(4.7) == "4"
+    assert rating_bin(5.0) == "5"
+    assert rating_bin(-1) == "0"
+    # Changing a rating from 3 to 5 moves it between histogram bins
+    assert _merge_inc(_rating_inc(3.0, -1), _rating_inc(5.0, 1)) == {
+        "rating_sum": 2.0,
+        "rating_histogram.3": -1,
+        "rating_histogram.5": 1,
+    }
+
+
+def test_backfill_buckets_by_model_and_creation_hour():
+    buckets = {}
+    _add_to_bucket(buckets, {"model_name": "socialNorm", "creation_date": "2025-05-14T12:10:00",
+                             "latency_ms": 100, "user_rating": 4})
+    _add_to_bucket(buckets, {"model_name": "socialNorm", "creation_date": "2025-05-14T12:50:00",
+                             "latency_ms": 300, "user_feedback": "too long"})
+    _add_to_bucket(buckets, {"creation_date": "2025-05-14T13:00:00"})
+
+    hour = datetime(2025, 5, 14, 12)
+    assert bucket_hour("2025-05-14T12:50:00") == hour
+    bucket = buckets[("socialNorm", hour)]
+    assert bucket["query_count"] == 2
+    assert bucket["latency_ms_max"] == 300
+    assert bucket["rating_histogram"]["4"] == 1
+    assert bucket["feedback_count"] == 1
+    assert ("unknown", datetime(2025, 5, 14, 13)) in buckets
+
+    group = {"_id": {"model": "socialNorm", "period": hour}, **bucket}
+    group.update({f"rating_{k}": v for k, v in bucket["rating_histogram"].items()})
+    period = to_period_doc(group)
+    assert period["avg_latency_ms"] == 200
+    assert period["avg_rating"] == 4
+
+
+class _Collection:
+    """Just enough of a Motor collection for backfill: find ignores its filter"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        docs = self.docs
+
+        class Cursor:
+            def batch_size(self, size):
+                return self
+
+            async def __aiter__(self):
+                for doc in list(docs):
+                    yield dict(doc)
+        return Cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            if hasattr(operation, "_doc"):
+                self.docs.append({**operation._filter, **operation._doc["$set"]})
+            else:
+                self.docs.remove(next(doc for doc in self.docs if doc["_id"] == operation._filter["_id"]))
+
+
+def test_backfill_deletes_buckets_left_without_queries():
+    since, until = datetime(2025, 5, 14), datetime(2025, 5, 15)
+    database = {
+        "query": _Collection([{"model_name": "socialNorm", "creation_date": "2025-05-14T12:10:00"}]),
+        "model-rollup": _Collection([
+            # Its only query was deleted while rollups weren't being kept
+            {"_id": 1, "model": "socialNorm", "hour": datetime(2025, 5, 14, 9), "query_count": 3},
+        ]),
+    }
+
+    result = asyncio.run(backfill(database, since, until))
+
+    assert result == {"scanned": 1, "buckets": 1, "deleted": 1}
+    assert [(doc["hour"], doc["query_count"]) for doc in database["model-rollup"].docs] == [
+        (datetime(2025, 5, 14, 12), 1)
+    ]
@@ -0,0 +1,41 @@
+from app.core.search import SearchIndex
+
+
+def test_search_ranks_and_pages():
+    index = SearchIndex()
+    index.add("q:1", "How to read body language at work")
+    index.add("q:2", "Body language body language tips")
+    index.add("q:3", "Small talk with coworkers")
+
+    hits = index.search("body language", 1)
+    assert [key for key, _ in hits] == ["q:2"]
+
+    next_hits = index.search("body language", 5, after=(hits[-1][1], hits[-1][0]))
+    assert [key for key, _ in next_hits] == ["q:1"]
+
+
+def test_search_remove_and_compact():
+    index = SearchIndex()
+    for i in range(8):
+        index.add(f"a:{i}", f"answer number {i} about eye contact")
+    for i in range(4):
+        index.remove(f"a:{i}")
+
+    keys = {key for key, _ in index.search("eye contact", 10)}
+    assert keys == {"a:4", "a:5", "a:6", "a:7"}
+
+
+def test_search_keeps_documents_matching_only_common_terms():
+    index = SearchIndex()
+    # "advice" is in every document, so it is a common term for this query
+    for i in range(40):
+        index.add(f"q:{i}", f"advice number {i}")
+    index.add("q:rare", "networking advice")
+    index.add("q:common", "advice advice advice")
+
+    keys = [key for key, _ in index.search("networking advice", 5)]
+    assert keys[0] == "q:rare"
+    assert "q:common" in keys
+
+    everything = {key for key, _ in index.search("networking advice", 100)}
+    assert len(everything) == 42
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from app.core.streaming import stream_ndjson
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.batch = None
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+@pytest.mark.asyncio
+async def test_stream_ndjson_writes_one_object_per_line():
+    cursor = FakeCursor([{"n": 1}, {"n": 2}])
+
+    async def shape(doc):
+        doc["shaped"] = True
+        return doc
+
+    response = stream_ndjson(cursor, shape, batch_size=10)
+    body = b"".join([chunk async for chunk in response.body_iterator])
+
+    assert cursor.batch == 10
+    assert response.media_type == "application/x-ndjson"
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"n": 1, "shaped": True},
+        {"n": 2, "shaped": True},
+    ]
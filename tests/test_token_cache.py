@@ -0,0 +1,26 @@
+import time
+
+from app.core.token_cache import TokenCache
+
+
+def test_token_cache_hit_and_expiry():
+    cache = TokenCache(maxsize=2)
+    cache.put("live", {"sub": "u1", "exp": time.time() + 60})
+    cache.put("expired", {"sub": "u2", "exp": time.time() - 1})
+
+    assert cache.get("live")["sub"] == "u1"
+    assert cache.get("expired") is None
+    assert cache.get("unknown") is None
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.put("a", {"exp": exp})
+    cache.put("b", {"exp": exp})
+    cache.get("a")
+    cache.put("c", {"exp": exp})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
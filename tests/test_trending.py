@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.trending import TrendingIndex
+
+NOW = datetime(2025, 5, 14, 12, 0, 0)
+HOUR = timedelta(hours=1)
+
+
+def test_recent_activity_outranks_older_activity():
+    index = TrendingIndex(half_life_seconds=3600, max_items=100)
+    # Four events two half-lives ago weigh the same as one event now
+    for _ in range(4):
+        index.record("old", 1.0, NOW - 2 * HOUR)
+    index.record("new", 1.0, NOW)
+    index.record("new", 1.0, NOW)
+
+    assert [qid for qid, _ in index.top(2, NOW)] == ["new", "old"]
+    assert index.score("old", NOW) == pytest.approx(1.0)
+    assert index.score("new", NOW) == pytest.approx(2.0)
+    # Decay doesn't change the order
+    assert index.score("new", NOW + HOUR) == pytest.approx(1.0)
+
+
+def test_ranking_is_capped_and_drops_the_coldest():
+    index = TrendingIndex(half_life_seconds=3600, max_items=3)
+    for minutes, qid in enumerate(["a", "b", "c", "d"]):
+        index.record(qid, 1.0, NOW + timedelta(minutes=minutes))
+    assert len(index) == 3
+    assert [qid for qid, _ in index.top(10, NOW)] == ["d", "c", "b"]
+
+    # Colder than everything kept: ignored
+    index.record("e", 1.0, NOW - HOUR)
+    assert index.score("e", NOW) == 0.0
+
+    index.remove("c")
+    assert [qid for qid, _ in index.top(10, NOW)] == ["d", "b"]
+
+
+def test_dirty_scores_are_tracked_for_persistence():
+    index = TrendingIndex(half_life_seconds=3600, max_items=10)
+    index.record("a", 1.0, NOW)
+    index.record("b", 1.0, NOW)
+    index.remove("b")
+    assert index._dirty == {"a"}
+
+
+class _FailingCursor:
+    """Yields stored questions, recording a live event part-way, then fails"""
+
+    def __init__(self, index, docs, fail_after=None):
+        self.index, self.docs, self.fail_after = index, docs, fail_after
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for position, doc in enumerate(self.docs):
+            if position == 1:
+                self.index.record("live", 1.0, NOW)
+            if position == self.fail_after:
+                raise ConnectionError("lost the primary")
+            yield doc
+
+
+class _Database:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getitem__(self, name):
+        return self
+
+    def find(self, *args):
+        return self.cursor
+
+
+@pytest.mark.asyncio
+async def test_load_keeps_events_recorded_meanwhile_and_can_be_retried():
+    index = TrendingIndex(half_life_seconds=3600, max_items=10)
+    docs = [
+        {"question_id": "a", "trending_score": index._scaled(NOW)},
+        {"question_id": "live", "trending_score": index._scaled(NOW)},
+        {"question_id": "b", "trending_score": index._scaled(NOW - HOUR)},
+    ]
+
+    with pytest.raises(ConnectionError):
+        await index.load(_Database(_FailingCursor(index, docs, fail_after=2)))
+    assert not index.ready
+
+    await index.load(_Database(_FailingCursor(index, docs)))
+    assert index.ready
+    # Loaded once despite the retry; the live event stays dirty for persist()
+    assert index.score("a", NOW) == pytest.approx(1.0)
+    assert index.score("b", NOW) == pytest.approx(0.5)
+    assert index._dirty == {"live"}
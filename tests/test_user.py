@@ -0,0 +1,59 @@
+import pytest
+import httpx
+
+from live_client import BASE_URL, register_and_login
+
+
+@pytest.mark.asyncio
+async def test_rename_revokes_token_and_returns_a_new_one():
+    async with httpx.AsyncClient() as client:
+        username, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.put(f"{BASE_URL}/user/update", headers=headers, json={"username": f"{username}_new"})
+        assert response.status_code == 200
+        assert response.json()["username"] == f"{username}_new"
+        new_token = response.json()["access_token"]
+
+        response = await client.get(f"{BASE_URL}/auth/verify-token", headers=headers)
+        assert response.status_code == 401
+
+        new_headers = {"Authorization": f"Bearer {new_token}"}
+        response = await client.post(f"{BASE_URL}/forum/question/", headers=new_headers, json={
+            "question_header": "Renamed",
+            "question": "Whose name is on this?"
+        })
+        assert response.json()["username"] == f"{username}_new"
+
+
+@pytest.mark.asyncio
+async def test_update_without_rename_keeps_the_token():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.put(f"{BASE_URL}/user/update", headers=headers, json={"name": "Renamed Person"})
+        assert response.status_code == 200
+        assert response.json()["access_token"] is None
+        response = await client.get(f"{BASE_URL}/auth/verify-token", headers=headers)
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_user_stats_follow_new_questions():
+    async with httpx.AsyncClient() as client:
+        _, token = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.get(f"{BASE_URL}/user/stats", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["total_questions"] == 0
+        assert response.json()["join_date"]
+
+        await client.post(f"{BASE_URL}/forum/question/", headers=headers, json={
+            "question_header": "Stats question",
+            "question": "Does this count towards my stats?"
+        })
+        response = await client.get(f"{BASE_URL}/user/stats", headers=headers)
+        assert response.json()["total_questions"] == 1
+        assert response.json()["most_recent_activity"]
@@ -0,0 +1,63 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.api.routes import forum
+
+ALICE = ObjectId()
+BOB = ObjectId()
+
+
+class _Users:
+    """Stand-in user collection counting the queries it receives"""
+
+    def __init__(self):
+        self.finds = 0
+        self.find_ones = 0
+        self.users = [{"_id": ALICE, "username": "alice"}, {"_id": BOB, "username": "bob"}]
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        wanted = set(query["_id"]["$in"])
+
+        async def cursor():
+            for user in self.users:
+                if user["_id"] in wanted:
+                    yield user
+        return cursor()
+
+    async def find_one(self, query, projection=None):
+        self.find_ones += 1
+        return {"username": "legacy"} if query.get("username") == "legacy" else None
+
+
+def test_usernames_are_resolved_with_one_query(monkeypatch):
+    users = _Users()
+    monkeypatch.setattr(forum, "user_collection", users)
+    docs = [{"user_id": str(ALICE)}, {"user_id": str(BOB)}, {"user_id": str(ALICE)}] * 100
+
+    asyncio.run(forum.add_usernames(docs))
+
+    assert [doc["username"] for doc in docs[:3]] == ["alice", "bob", "alice"]
+    assert (users.finds, users.find_ones) == (1, 0)
+
+
+def test_legacy_and_unknown_ids_fall_back(monkeypatch):
+    monkeypatch.setattr(forum, "user_collection", _Users())
+    docs = [{"user_id": "legacy"}, {"user_id": "someone_else"}]
+
+    asyncio.run(forum.add_usernames(docs))
+
+    assert [doc["username"] for doc in docs] == ["legacy", "User someone_"]
+
+
+def test_response_docs_share_one_username_query(monkeypatch):
+    users = _Users()
+    monkeypatch.setattr(forum, "user_collection", users)
+    docs = [{"_id": ObjectId(), "user_id": str(author)} for _ in range(25) for author in (ALICE, BOB)]
+
+    asyncio.run(forum.to_response_docs(docs))
+
+    assert all("_id" not in doc and doc["id"] for doc in docs)
+    assert [doc["username"] for doc in docs[:2]] == ["alice", "bob"]
+    assert (users.finds, users.find_ones) == (1, 0)